@@ -1,33 +1,68 @@
 import sys
 import os
-import shutil
+import time
+import logging
 
 # Add the project root directory to the sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from flask import Flask
-from modules.chatbot import chat_bp
-from flask_session import Session
 
-app = Flask(__name__)
-# Use a fixed secret key for session management.
-app.secret_key = "my_fixed_development_key"
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
-# Configure the session to use the filesystem (server-side)
-app.config["SESSION_TYPE"] = "filesystem"
-app.config["SESSION_FILE_DIR"] = os.path.join(os.getcwd(), "flask_session")
-app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_USE_SIGNER"] = True
+_process_setup_done = False
 
-# Remove any old session files when starting the app.
-if os.path.exists(app.config["SESSION_FILE_DIR"]):
-    shutil.rmtree(app.config["SESSION_FILE_DIR"])
-os.makedirs(app.config["SESSION_FILE_DIR"], exist_ok=True)
 
-# Initialize Flask-Session
-Session(app)
+def setup_process(app):
+    """
+    Process-wide, idempotent setup: bring the database schema up to date.
+    Runs once per process; with a preforking server started with --preload it
+    runs once in the master before workers fork. Sessions live in the session
+    store (see modules.session_store) and are kept, so a new worker never logs
+    out the users of the others.
+    """
+    global _process_setup_done
+    if _process_setup_done:
+        return
+    from modules.cv_parser import ensure_schema
+
+    ensure_schema()
+    _process_setup_done = True
+
+
+def create_app(config=None):
+    """
+    Create and configure the Flask app.
+    config optionally overrides app.config entries. Heavy dependencies (OCR,
+    PDF and Word libraries, the Groq SDK) and the LLM clients are loaded on
+    first use, not here.
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    # Use a fixed secret key for session management.
+    app.secret_key = "my_fixed_development_key"
+
+    if config:
+        app.config.update(config)
+
+    setup_process(app)
+
+    # Keep sessions server-side in compact records; the cookie holds a signed id.
+    from modules.chatbot import chat_bp
+    from modules.session_store import CompactSessionInterface, make_session_store
+
+    app.session_interface = CompactSessionInterface(
+        make_session_store(
+            app.config.get("SESSION_BACKEND"), app.config.get("SESSION_DB_PATH")
+        )
+    )
+    app.register_blueprint(chat_bp)
+
+    app.config["COLD_START_SECONDS"] = time.perf_counter() - started
+    logger.info("App created in %.0f ms.", app.config["COLD_START_SECONDS"] * 1000)
+    return app
 
-app.register_blueprint(chat_bp)
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,52 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import logging
+import tempfile
+
+from benchmarks.cases import build_cases
+from benchmarks.harness import DEFAULT_THRESHOLD, compare, load_results, run_cases, save_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark CV extraction, prompt building and database access."
+    )
+    parser.add_argument(
+        "-k", dest="selected", action="append", help="Only run benchmarks whose name contains this"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="Write the results as a JSON baseline to this file")
+    parser.add_argument("--baseline", help="Compare against this JSON baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown (0.2 = 20%%)"
+    )
+    args = parser.parse_args(argv)
+    # Per-call INFO logging (e.g. prompt statistics) would dominate the timings.
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory(prefix="cv_bench_") as workdir:
+        results = run_cases(build_cases(workdir), args.selected, args.repeat)
+
+    if args.save:
+        save_results(results, args.save)
+        print(f"Saved baseline to {args.save}")
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.threshold)
+        for item in regressions:
+            print(
+                f"REGRESSION {item['name']}: {item['baseline'] * 1000:.2f} ms -> "
+                f"{item['current'] * 1000:.2f} ms (+{item['change']:.0%})"
+            )
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
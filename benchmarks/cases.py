@@ -0,0 +1,196 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import itertools
+import shutil
+from pathlib import Path
+
+from benchmarks.harness import SkipBenchmark, text_accuracy
+from modules import document_processor
+from modules.cv_parser import build_cv_record
+from modules.cv_repository import CVRepository
+from modules.llm_integration import build_aggregated_cv_prompt
+from modules.retrieval import CONTEXT_FIELDS
+from tools.synthetic_cvs import (
+    make_docx,
+    make_scanned_pdf,
+    make_text_pdf,
+    scanned_page_image,
+    synthetic_cv_lines,
+    synthetic_structured_cv,
+)
+
+PAGE_COUNTS = [1, 5, 20]
+OCR_PAGE_COUNTS = [1, 3]
+# Skew (degrees) of the scanned page used by the OCR page benchmarks.
+SCAN_SKEW = 1.5
+PROMPT_SIZES = [10, 100, 1000]
+DB_ROWS = 1000
+
+
+def synthetic_records(count):
+    """CV rows as stored by process_and_save_cv, with ids, for count synthetic CVs."""
+    records = []
+    for n in range(count):
+        structured = synthetic_structured_cv(n)
+        raw_text = "\n".join(itertools.chain.from_iterable(synthetic_cv_lines(n)))
+        record = build_cv_record(structured, f"cv_{n}.pdf", raw_text, f"{n:064x}")
+        records.append({"id": n + 1, **record})
+    return records
+
+
+def _without_ids(records):
+    return [{k: v for k, v in record.items() if k != "id"} for record in records]
+
+
+def _write(workdir, name, data):
+    path = Path(workdir) / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _require_ocr_tools():
+    missing = [tool for tool in ("tesseract", "pdftoppm") if not shutil.which(tool)]
+    if missing:
+        raise SkipBenchmark(f"{', '.join(missing)} not installed")
+
+
+def _require_numpy():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        raise SkipBenchmark("numpy not installed")
+
+
+def _scanned_page():
+    lines = synthetic_cv_lines(7)[0]
+    return scanned_page_image(lines, dpi=300, skew=SCAN_SKEW), "\n".join(lines)
+
+
+def _ocr_page_case(cleanup):
+    """
+    Preprocess and OCR one skewed 300 DPI scan, with or without page cleanup;
+    quality is the character accuracy of the OCR text.
+    """
+
+    def setup():
+        if not shutil.which("tesseract"):
+            raise SkipBenchmark("tesseract not installed")
+        if cleanup:
+            _require_numpy()
+        image, expected = _scanned_page()
+        output = {}
+
+        def run():
+            processed = document_processor.preprocess_image(image, 300, cleanup=cleanup)
+            output["text"] = document_processor.perform_ocr_on_image(processed)
+
+        run.quality = lambda: {"char_accuracy": text_accuracy(expected, output.get("text", ""))}
+        return run
+
+    return setup
+
+
+def _seeded_repository(workdir, rows):
+    repository = CVRepository(str(Path(workdir) / f"read_{rows}.db"))
+    repository.init_schema(drop=True)
+    repository.insert_many(_without_ids(synthetic_records(rows)))
+    return repository
+
+
+def build_cases(workdir):
+    """
+    Return the list of (name, setup) benchmark cases. Each setup writes its
+    inputs under workdir and returns the callable to time.
+    """
+    cases = []
+
+    for pages in PAGE_COUNTS:
+        def text_pdf(pages=pages):
+            path = _write(
+                workdir, f"text_{pages}p.pdf", make_text_pdf(synthetic_cv_lines(pages, pages))
+            )
+            return lambda: document_processor.extract_text_from_pdf(path)
+
+        def word(pages=pages):
+            path = _write(
+                workdir, f"word_{pages}p.docx", make_docx(synthetic_cv_lines(pages, pages))
+            )
+            return lambda: document_processor.extract_text_from_word(path)
+
+        def hybrid(pages=pages):
+            path = _write(
+                workdir, f"hybrid_{pages}p.pdf", make_text_pdf(synthetic_cv_lines(pages, pages))
+            )
+            return lambda: document_processor.extract_pdf_pages(path)
+
+        cases.append((f"extract_text_from_pdf[text,{pages}p]", text_pdf))
+        cases.append((f"extract_text_from_word[{pages}p]", word))
+        cases.append((f"extract_pdf_pages[text,{pages}p]", hybrid))
+
+    for pages in OCR_PAGE_COUNTS:
+        def ocr(pages=pages):
+            _require_ocr_tools()
+            path = _write(
+                workdir, f"scanned_{pages}p.pdf", make_scanned_pdf(synthetic_cv_lines(pages, pages))
+            )
+            return lambda: document_processor.extract_pdf_pages(path)
+
+        cases.append((f"extract_pdf_pages[scanned,{pages}p]", ocr))
+
+    def page_cleanup():
+        _require_numpy()
+        from modules.image_preprocessing import clean_page
+
+        image, _ = _scanned_page()
+        return lambda: clean_page(image, 300)
+
+    cases.append(("clean_page[scanned,300dpi]", page_cleanup))
+    cases.append(("ocr_page[scanned,grayscale]", _ocr_page_case(cleanup=False)))
+    cases.append(("ocr_page[scanned,cleaned]", _ocr_page_case(cleanup=True)))
+
+    for size in PROMPT_SIZES:
+        def prompt(size=size):
+            records = synthetic_records(size)
+            return lambda: build_aggregated_cv_prompt(records)
+
+        cases.append((f"build_aggregated_cv_prompt[{size}]", prompt))
+
+    def db_write():
+        records = _without_ids(synthetic_records(DB_ROWS))
+        paths = (Path(workdir) / f"write_{n}.db" for n in itertools.count())
+
+        def run():
+            repository = CVRepository(str(next(paths)))
+            repository.init_schema(drop=True)
+            repository.insert_many(records)
+            repository.close()
+
+        return run
+
+    def db_get_all():
+        return _seeded_repository(workdir, DB_ROWS).get_all
+
+    def db_iter_context():
+        repository = _seeded_repository(workdir, DB_ROWS)
+        return lambda: sum(1 for _ in repository.iter_records(CONTEXT_FIELDS))
+
+    def db_get_page():
+        repository = _seeded_repository(workdir, DB_ROWS)
+        return lambda: repository.get_page(CONTEXT_FIELDS, after_id=DB_ROWS // 2, limit=100)
+
+    def db_find_candidates():
+        repository = _seeded_repository(workdir, DB_ROWS)
+        return lambda: repository.find_candidate_ids(skills=["Python"], min_experience_years=2)
+
+    cases += [
+        (f"db.insert_many[{DB_ROWS}]", db_write),
+        (f"db.get_all[{DB_ROWS}]", db_get_all),
+        (f"db.iter_records[context,{DB_ROWS}]", db_iter_context),
+        ("db.get_page[100]", db_get_page),
+        (f"db.find_candidate_ids[{DB_ROWS}]", db_find_candidates),
+    ]
+    return cases
@@ -0,0 +1,111 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import difflib
+import platform
+import statistics
+from datetime import datetime, timezone
+
+# A benchmark regresses when its median is this much slower than the baseline.
+DEFAULT_THRESHOLD = 0.20
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark setup when a required tool (e.g. tesseract) is missing."""
+
+
+def measure(fn, repeat=5, warmup=1):
+    """Call fn warmup + repeat times and return timing stats for the measured calls."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "repeat": repeat,
+    }
+
+
+def text_accuracy(expected, actual):
+    """Similarity (0..1) of two texts after collapsing whitespace, e.g. OCR output vs. truth."""
+    expected, actual = " ".join(expected.split()), " ".join(actual.split())
+    return difflib.SequenceMatcher(None, expected, actual, autojunk=False).ratio()
+
+
+def run_cases(cases, selected=None, repeat=5):
+    """
+    Run (name, setup) benchmark cases, where setup() returns the callable to
+    time. Cases whose name does not contain one of selected are left out.
+    A callable with a quality attribute also reports quality(), a dict of
+    output-quality scores (e.g. OCR accuracy), after the timed calls.
+    Returns {name: stats} with {"skipped": reason} for skipped cases.
+    """
+    results = {}
+    for name, setup in cases:
+        if selected and not any(part in name for part in selected):
+            continue
+        try:
+            fn = setup()
+        except SkipBenchmark as e:
+            results[name] = {"skipped": str(e)}
+            print(f"{name:<40} skipped: {e}")
+            continue
+        results[name] = measure(fn, repeat=repeat)
+        line = f"{name:<40} median={results[name]['median'] * 1000:10.2f} ms"
+        if hasattr(fn, "quality"):
+            results[name]["quality"] = fn.quality()
+            line += "".join(f" {key}={value:.3f}" for key, value in results[name]["quality"].items())
+        print(line)
+    return results
+
+
+def save_results(results, path):
+    """Write results to path as a JSON baseline with machine metadata."""
+    payload = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """Read the results of a baseline written by save_results."""
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare medians against a baseline.
+    Returns a list of {"name", "baseline", "current", "change"} dicts for the
+    benchmarks that got slower by more than threshold (a fraction).
+    """
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name, {})
+        if "median" not in stats or not before.get("median"):
+            continue
+        change = stats["median"] / before["median"] - 1
+        if change > threshold:
+            regressions.append(
+                {
+                    "name": name,
+                    "baseline": before["median"],
+                    "current": stats["median"],
+                    "change": change,
+                }
+            )
+    return regressions
@@ -0,0 +1,293 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import io
+import math
+import time
+import zipfile
+from pathlib import Path
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dotenv import load_dotenv
+
+from modules import document_processor
+from modules.cv_parser import (
+    store_uploaded_cv,
+    get_cv_data_by_hash,
+    get_cached_extraction,
+    save_extraction_cache,
+    extract_raw_text,
+    build_cv_record,
+    save_cv_data_batch,
+)
+from modules.cv_chunking import extract_cv_structure
+
+load_dotenv()
+
+# Processes extracting text (PDF parsing, rasterization, OCR) concurrently.
+BATCH_CPU_WORKERS = int(os.getenv("BATCH_CPU_WORKERS", "0")) or os.cpu_count() or 1
+# Extraction processes for a batch uploaded through the web app, which shares
+# the host with the request workers (the CLI uses BATCH_CPU_WORKERS).
+BATCH_HTTP_CPU_WORKERS = int(os.getenv("BATCH_HTTP_CPU_WORKERS", "2"))
+# Concurrent LLM structuring requests.
+BATCH_LLM_WORKERS = int(os.getenv("BATCH_LLM_WORKERS", "4"))
+# Number of CV records written per database transaction.
+BATCH_INSERT_SIZE = int(os.getenv("BATCH_INSERT_SIZE", "50"))
+
+SUPPORTED_EXTENSIONS = {".pdf", ".doc", ".docx"}
+STAGES = ["store", "extract", "llm", "db"]
+
+
+def iter_sources(path):
+    """
+    Yield (name, open_fn) pairs for every CV in a directory tree or a zip archive.
+    open_fn returns a binary file object for the CV's bytes.
+    """
+    path = Path(path)
+    if path.is_dir():
+        for file_path in sorted(path.rglob("*")):
+            if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+                yield file_path.name, (lambda p=file_path: open(p, "rb"))
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in sorted(archive.namelist()):
+                if os.path.splitext(member)[1].lower() in SUPPORTED_EXTENSIONS:
+                    yield os.path.basename(member), (
+                        lambda m=member: io.BytesIO(archive.read(m))
+                    )
+    else:
+        raise ValueError(f"{path} is neither a directory nor a zip archive.")
+
+
+def iter_uploaded_sources(files):
+    """Yield (name, open_fn) pairs for in-memory (filename, bytes) uploads."""
+    for filename, data in files:
+        yield filename, (lambda d=data: io.BytesIO(d))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _init_extract_worker():
+    """Each extraction process OCRs its own document sequentially."""
+    document_processor.OCR_WORKERS = 1
+
+
+def make_extract_pool(workers):
+    """
+    Executor for the extraction stage. Processes are started through
+    document_processor.worker_mp_context, as batches also run from the web
+    app's ingestion threads; a single worker runs in a thread instead.
+    """
+    if workers <= 1:
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=document_processor.worker_mp_context(),
+        initializer=_init_extract_worker,
+    )
+
+
+def _extract(path):
+    start = time.perf_counter()
+    raw_text = extract_raw_text(path)
+    return raw_text, time.perf_counter() - start
+
+
+def _structure(raw_text):
+    start = time.perf_counter()
+    structured_data = extract_cv_structure(raw_text)
+    return structured_data, time.perf_counter() - start
+
+
+class BatchIngestor:
+    """
+    Concurrent bulk ingestion of CV files.
+
+    Text extraction runs on a process pool (cpu_workers) and LLM structuring on
+    a thread pool (llm_workers), so each kind of work has its own concurrency
+    limit. Finished records are inserted in batches of batch_size rows per
+    transaction.
+
+    Runs are resumable: files are content-addressed, extracted text and LLM
+    output are cached per content hash as soon as they exist, and files whose
+    record is already in cv_records are skipped.
+    """
+
+    def __init__(self, cpu_workers=None, llm_workers=None, batch_size=None):
+        self.cpu_workers = cpu_workers or BATCH_CPU_WORKERS
+        self.llm_workers = llm_workers or BATCH_LLM_WORKERS
+        self.batch_size = batch_size or BATCH_INSERT_SIZE
+        self.timings = {stage: [] for stage in STAGES}
+        self.counts = {"inserted": 0, "skipped": 0, "failed": 0}
+        self._buffer = []
+        self._seen = set()
+
+    def run(self, sources):
+        """Ingest every (name, open_fn) source and return the summary dict."""
+        started = time.perf_counter()
+        max_in_flight = 2 * (self.cpu_workers + self.llm_workers)
+        pending = {}
+        sources = iter(sources)
+        exhausted = False
+
+        with make_extract_pool(self.cpu_workers) as cpu_pool, ThreadPoolExecutor(
+            max_workers=self.llm_workers
+        ) as llm_pool:
+            while True:
+                while not exhausted and len(pending) < max_in_flight:
+                    try:
+                        name, open_source = next(sources)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    doc = self._admit(name, open_source)
+                    if doc is None:
+                        continue
+                    if doc["raw_text"] is None:
+                        pending[cpu_pool.submit(_extract, doc["path"])] = ("extract", doc)
+                    elif doc["structured_data"] is None:
+                        pending[llm_pool.submit(_structure, doc["raw_text"])] = ("llm", doc)
+                    else:
+                        self._finish(doc)
+
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, doc = pending.pop(future)
+                    try:
+                        result, seconds = future.result()
+                    except Exception as e:
+                        self._fail(doc["name"], f"{stage} failed: {e}")
+                        continue
+                    self.timings[stage].append(seconds)
+                    if stage == "extract":
+                        doc["raw_text"] = result
+                        save_extraction_cache(doc["hash"], result)
+                        pending[llm_pool.submit(_structure, result)] = ("llm", doc)
+                    elif not result:
+                        self._fail(doc["name"], "LLM returned no structured data")
+                    else:
+                        doc["structured_data"] = result
+                        save_extraction_cache(doc["hash"], doc["raw_text"], result)
+                        self._finish(doc)
+        self._flush()
+        return self.summary(time.perf_counter() - started)
+
+    def _admit(self, name, open_source):
+        """Store a source file and load whatever is already cached for it."""
+        start = time.perf_counter()
+        try:
+            with open_source() as file_obj:
+                path, content_hash = store_uploaded_cv(file_obj, name)
+        except Exception as e:
+            self._fail(name, f"store failed: {e}")
+            return None
+        self.timings["store"].append(time.perf_counter() - start)
+        if content_hash in self._seen or get_cv_data_by_hash(content_hash):
+            self.counts["skipped"] += 1
+            return None
+        self._seen.add(content_hash)
+        cached = get_cached_extraction(content_hash) or {}
+        return {
+            "name": name,
+            "path": path,
+            "hash": content_hash,
+            "raw_text": cached.get("raw_text"),
+            "structured_data": cached.get("structured_data"),
+        }
+
+    def _finish(self, doc):
+        self._buffer.append(
+            build_cv_record(doc["structured_data"], doc["path"], doc["raw_text"], doc["hash"])
+        )
+        if len(self._buffer) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        self.counts["inserted"] += save_cv_data_batch(self._buffer)
+        self.timings["db"].append(time.perf_counter() - start)
+        self._buffer = []
+
+    def _fail(self, name, reason):
+        self.counts["failed"] += 1
+        print(f"Skipping {name}: {reason}")
+
+    def summary(self, elapsed):
+        """Throughput and per-stage p50/p95 latency of the run."""
+        return {
+            **self.counts,
+            "seconds": elapsed,
+            "docs_per_sec": self.counts["inserted"] / elapsed if elapsed else 0.0,
+            "stages": {
+                stage: {
+                    "count": len(values),
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                }
+                for stage, values in self.timings.items()
+            },
+        }
+
+
+def ingest_batch(sources, cpu_workers=None, llm_workers=None, batch_size=None):
+    """Run a BatchIngestor over (name, open_fn) sources and return its summary."""
+    return BatchIngestor(cpu_workers, llm_workers, batch_size).run(sources)
+
+
+def format_summary(summary):
+    """Render a batch summary as a short plain-text report."""
+    lines = [
+        f"Inserted {summary['inserted']} CVs, skipped {summary['skipped']}, "
+        f"failed {summary['failed']} in {summary['seconds']:.1f}s "
+        f"({summary['docs_per_sec']:.2f} docs/sec)",
+    ]
+    for stage, stats in summary["stages"].items():
+        if stats["count"]:
+            lines.append(
+                f"  {stage:<8} n={stats['count']:<6} "
+                f"p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s"
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bulk-ingest CVs from a directory or a zip archive."
+    )
+    parser.add_argument("path", help="Directory or .zip file containing PDF/Word CVs")
+    parser.add_argument("--cpu-workers", type=int, default=None)
+    parser.add_argument("--llm-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    summary = ingest_batch(
+        iter_sources(args.path),
+        cpu_workers=args.cpu_workers,
+        llm_workers=args.llm_workers,
+        batch_size=args.batch_size,
+    )
+    print(format_summary(summary))
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
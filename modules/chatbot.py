@@ -4,17 +4,89 @@ import os
 # Add the project root directory to the sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from flask import Blueprint, render_template, request, jsonify, session
+import json
+import cProfile
+import time
+import uuid
+from flask import (
+    g,
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    render_template,
+    request,
+    session,
+    stream_with_context,
+    url_for,
+)
 from modules.llm_integration import (
     get_llm_response_from_history,
-    build_aggregated_cv_prompt,
+    stream_llm_response_from_history,
 )
-from modules.cv_parser import process_and_save_cv, get_all_cv_data
+from modules.context_cache import build_cv_context_for_query, get_context_version
+from modules.ingestion_queue import get_ingestion_queue, QueueFullError
+from modules import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-chat_bp = Blueprint("chat", __name__)
+# Templates live in the project-level templates/ directory, so the blueprint
+# renders correctly whichever app it is registered on.
+chat_bp = Blueprint("chat", __name__, template_folder="../templates")
+
+# Request header turning on per-request profiling: "timing" adds a
+# Server-Timing header with the request's stage spans, "cprofile" also runs
+# cProfile and writes the stats to PROFILE_DIR (only when that is set).
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests.", ["endpoint", "status"]
+)
+
+
+@chat_bp.before_app_request
+def _start_request_profile():
+    g.request_started = time.perf_counter()
+    mode = request.headers.get(PROFILE_HEADER, "").lower()
+    if mode not in ("timing", "cprofile"):
+        return
+    g.timing_token = metrics.start_request_timing()
+    if mode == "cprofile" and PROFILE_DIR:
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@chat_bp.after_app_request
+def _finish_request_profile(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or "unknown",
+            status=response.status_code,
+        )
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{request.endpoint}-{uuid.uuid4().hex[:8]}.prof")
+        profiler.dump_stats(path)
+        response.headers["X-Profile-File"] = path
+    token = g.pop("timing_token", None)
+    if token is not None:
+        spans = metrics.stop_request_timing(token)
+        if started is not None:
+            spans.append(("total", time.perf_counter() - started))
+        response.headers["Server-Timing"] = metrics.server_timing_header(spans)
+    return response
+
+
+@chat_bp.route("/metrics")
+def metrics_endpoint():
+    """Prometheus metrics of this process."""
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
 
 
 @chat_bp.route("/chatbot")
@@ -22,6 +94,24 @@ def chatbot_interface():
     return render_template("chatbot.html")
 
 
+def prepare_conversation(message):
+    """
+    Select the CV context for a message. The context is kept on the request
+    (g.cv_context) and rebuilt from the shared context cache per message; the
+    session only records the context version it was built from.
+    """
+    # Build the CV context from the cached blocks of the CVs most relevant
+    # to this message.
+    with metrics.span("context_build"):
+        aggregated_prompt = build_cv_context_for_query(message)
+    g.cv_context = aggregated_prompt
+    if aggregated_prompt:
+        session["cv_context_version"] = get_context_version()
+        logger.info("Selected CV context for the message.")
+    else:
+        logger.info("No CV records available; skipping CV context.")
+
+
 @chat_bp.route("/send_message", methods=["POST"])
 def send_message():
     try:
@@ -30,38 +120,7 @@ def send_message():
         if not message:
             return jsonify({"error": "Empty message"}), 400
 
-        # Retrieve conversation history from session or initialize it.
-        conversation_history = session.get(
-            "conversation_history",
-            [
-                {
-                    "role": "system",
-                    "content": "your goal is to help the user about cvs query",
-                }
-            ],
-        )
-
-        # Retrieve all CV records and build aggregated CV context.
-        cv_records = get_all_cv_data()
-        logger.info("Retrieved %d CV records.", len(cv_records))
-        if cv_records:
-            aggregated_prompt = build_aggregated_cv_prompt(cv_records)
-            # Only add the CV context if it hasn't been added already.
-            if not any(
-                msg.get("role") == "system"
-                and msg.get("content", "").startswith("CV Context:")
-                for msg in conversation_history
-            ):
-                conversation_history.append(
-                    {"role": "system", "content": "CV Context: " + aggregated_prompt}
-                )
-                logger.info("Added CV context to conversation history.")
-        else:
-            logger.info("No CV records available; skipping CV context.")
-
-        # Save the updated conversation history back into the session.
-        session["conversation_history"] = conversation_history
-        session.modified = True
+        prepare_conversation(message)
         # Get the LLM response using the updated conversation history.
         answer = get_llm_response_from_history(message)
         return jsonify({"answer": answer})
@@ -70,6 +129,55 @@ def send_message():
         return jsonify({"error": str(e)}), 500
 
 
+def _sse(event, payload):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@chat_bp.route("/send_message_stream", methods=["POST"])
+def send_message_stream():
+    """
+    Streaming variant of /send_message. The answer is sent as Server-Sent
+    Events: "token" events carry pieces of the reply as the LLM produces them,
+    followed by a final "done" (or "error") event.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    message = str(data.get("message") or "").strip()
+    if not message:
+        return jsonify({"error": "Empty message"}), 400
+    try:
+        prepare_conversation(message)
+    except Exception as e:
+        logger.error("Error in send_message_stream: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+    app = current_app._get_current_object()
+    # The cookie can only go out with the headers, before the reply exists:
+    # make sure a new session is not empty so it is saved and its cookie set
+    # on this response.
+    session.setdefault("conversation_history", [])
+
+    def generate():
+        try:
+            for token in stream_llm_response_from_history(message):
+                yield _sse("token", {"token": token})
+            # The response headers are already sent, so persist the session
+            # holding the completed reply explicitly.
+            app.session_interface.save_session(app, session, Response())
+            yield _sse("done", {})
+        except Exception as e:
+            logger.error("Error in send_message_stream: %s", e)
+            yield _sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @chat_bp.route("/upload_cv", methods=["POST"])
 def upload_cv():
     if "file" not in request.files:
@@ -78,9 +186,58 @@ def upload_cv():
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
     try:
-        cv_data = process_and_save_cv(file, file.filename)
-        return jsonify(
-            {"message": "CV uploaded and processed successfully.", "cv_data": cv_data}
+        job_id = get_ingestion_queue().submit(file.read(), file.filename)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return (
+        jsonify(
+            {
+                "message": "CV queued for processing.",
+                "job_id": job_id,
+                "status_url": url_for("chat.job_status", job_id=job_id),
+            }
+        ),
+        202,
+    )
+
+
+@chat_bp.route("/upload_cv_batch", methods=["POST"])
+def upload_cv_batch():
+    files = [f for f in request.files.getlist("files") if f.filename]
+    if not files:
+        return jsonify({"error": "No files uploaded"}), 400
+    try:
+        job_id = get_ingestion_queue().submit_batch(
+            [(f.filename, f.read()) for f in files]
         )
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    return (
+        jsonify(
+            {
+                "message": f"{len(files)} CVs queued for batch processing.",
+                "job_id": job_id,
+                "status_url": url_for("chat.job_status", job_id=job_id),
+            }
+        ),
+        202,
+    )
+
+
+@chat_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_ingestion_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    if job["status"] == "done" and "cache_hit" in job["result"]:
+        cv_data = job["result"]
+        if cv_data.get("cache_hit"):
+            job["message"] = "CV already processed; returned the cached result."
+        else:
+            job["message"] = "CV uploaded and processed successfully."
+        job["cache_hit"] = cv_data.get("cache_hit", False)
+    return jsonify(job)
@@ -0,0 +1,129 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import logging
+import threading
+
+from modules.cv_parser import get_db
+from modules.llm_integration import build_aggregated_cv_prompt, render_cv_body
+from modules.metrics import record_cache_lookup
+from modules.retrieval import CVIndex, CONTEXT_FIELDS, CV_CONTEXT_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class CVContextCache:
+    """
+    In-memory cache of the rendered per-CV context blocks and the retrieval index.
+
+    The cache is keyed by the database version counter (see
+    CVRepository.get_version), which triggers bump on every insert, update or
+    delete of cv_records, including writes made by other processes. A chat turn
+    only reads that counter; when it moved, just the changed rows are fetched
+    from the change log and re-rendered.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.bodies = {}
+        self.index = CVIndex()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.bodies)
+
+    def sync(self, repository=None):
+        """
+        Bring the cache up to date with the database.
+        Returns the number of CV records re-rendered (0 when the cache was current).
+        """
+        repository = repository or get_db()
+        version = repository.get_version()
+        with self._lock:
+            record_cache_lookup("cv_context", version == self.version)
+            if version == self.version:
+                return 0
+            changes = None
+            if self.version is not None:
+                changes = repository.get_changes_since(self.version)
+            if changes is None:
+                return self._reload(repository, version)
+
+            touched = {cv_id for _, cv_id, _ in changes}
+            for cv_id in touched:
+                self._remove(cv_id)
+            records = repository.get_by_ids(touched, fields=CONTEXT_FIELDS)
+            for record in records:
+                self._add(record)
+            self.version = max([version] + [change[0] for change in changes])
+            logger.info(
+                "CV context cache updated to version %s (%d changed records).",
+                self.version,
+                len(touched),
+            )
+            return len(records)
+
+    def _reload(self, repository, version):
+        self.bodies = {}
+        self.index = CVIndex()
+        count = 0
+        for record in repository.iter_records(fields=CONTEXT_FIELDS):
+            self._add(record)
+            count += 1
+        self.version = version
+        logger.info("CV context cache rebuilt at version %s (%d records).", version, count)
+        return count
+
+    def _add(self, record):
+        body = render_cv_body(record)
+        self.bodies[record["id"]] = body
+        self.index.add(record, body=body)
+
+    def _remove(self, cv_id):
+        self.bodies.pop(cv_id, None)
+        self.index.remove(cv_id)
+
+    def select(self, query, k=None, token_budget=None):
+        """Return the cached records most relevant to the query (see CVIndex.select)."""
+        with self._lock:
+            return self.index.select(query, k=k, token_budget=token_budget)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_context_cache(repository=None):
+    """Return the process-wide context cache for the current database."""
+    repository = repository or get_db()
+    with _caches_lock:
+        cache = _caches.get(repository.db_path)
+        if cache is None:
+            cache = _caches[repository.db_path] = CVContextCache()
+        return cache
+
+
+def get_context_version():
+    """Database version the process-wide context cache was last synced to."""
+    return get_context_cache().version
+
+
+def build_cv_context_for_query(query, k=None, token_budget=None):
+    """
+    Return the aggregated CV prompt for a chat message, assembled from the
+    cached per-CV blocks, or None when there are no CVs.
+    """
+    token_budget = token_budget or CV_CONTEXT_TOKEN_BUDGET
+    cache = get_context_cache()
+    cache.sync()
+    records = cache.select(query, k=k, token_budget=token_budget)
+    logger.info("Selected %d relevant CV records.", len(records))
+    if not records:
+        return None
+    return build_aggregated_cv_prompt(
+        records, token_budget=token_budget, rendered_bodies=cache.bodies
+    )
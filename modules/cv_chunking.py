@@ -0,0 +1,257 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from modules.tokens import estimate_tokens
+from modules.text_preprocessing import extract_contact_fields
+from modules.llm_integration import CV_SECTIONS, construct_cv_prompt, retry_llm_response
+from modules import metrics
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# CV texts longer than this (estimated tokens) are extracted in chunks.
+CHUNKED_EXTRACTION_THRESHOLD = int(os.getenv("CHUNKED_EXTRACTION_THRESHOLD", "3000"))
+# Approximate size of the CV text in one chunk request.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "2000"))
+# Chunk requests sent concurrently for one CV (the LLM gateway still applies
+# the process-wide rate and concurrency limits).
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "4"))
+
+NOT_MENTIONED = "not mentioned"
+
+# Lines that start a CV section: a known heading on its own, optionally
+# followed by a colon.
+_HEADING = re.compile(
+    r"^\s*(?:(?:professional|work|employment|career|research|teaching|academic|relevant)\s+)?"
+    r"(?:summary|profile|objective|experience|employment|history|education|"
+    r"qualifications|skills|competencies|certifications?|licenses|languages|"
+    r"publications|presentations|talks|projects|awards|honors|honours|grants|"
+    r"funding|patents|memberships|affiliations|references|interests|volunteering|"
+    r"activities|appointments|positions|supervision|service)"
+    r"(?:\s+(?:and|&)\s+\w+)?\s*:?\s*$",
+    re.IGNORECASE,
+)
+
+CHUNK_REQUESTS = metrics.histogram(
+    "cv_extraction_chunks",
+    "Number of chunks a CV text was extracted in.",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+
+# Fields identifying the same entry across chunks, per list section.
+_ENTRY_KEYS = {
+    "Experience": ("title", "company", "start_date"),
+    "Education": ("degree", "institution", "start_date"),
+    "Certifications": ("name", "issuing_organization"),
+}
+
+
+def split_cv_sections(text):
+    """
+    Split CV text at section headings.
+    Returns [(heading, text)]; the text before the first heading (name and
+    contact details) comes first with heading "".
+    """
+    sections = [["", []]]
+    for line in text.splitlines():
+        if _HEADING.match(line):
+            sections.append([line.strip().rstrip(":"), [line]])
+        else:
+            sections[-1][1].append(line)
+    return [
+        (heading, "\n".join(lines).strip())
+        for heading, lines in sections
+        if "\n".join(lines).strip()
+    ]
+
+
+def _split_section(heading, text, max_tokens):
+    """Cut an oversized section at line boundaries, repeating its heading."""
+    pieces, lines = [], []
+    for line in text.splitlines():
+        if lines and estimate_tokens("\n".join(lines + [line])) > max_tokens:
+            pieces.append("\n".join(lines))
+            lines = [heading] if heading else []
+        lines.append(line)
+    if lines:
+        pieces.append("\n".join(lines))
+    return pieces
+
+
+def chunk_cv_text(text, max_tokens=None):
+    """
+    Pack the sections of a CV into chunks of about max_tokens tokens.
+    Sections are kept whole where they fit; the first chunk always starts
+    with the CV's header (name and contact details).
+    """
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    chunks, current = [], []
+    for heading, section in split_cv_sections(text):
+        for piece in _split_section(heading, section, max_tokens):
+            if current and estimate_tokens("\n\n".join(current + [piece])) > max_tokens:
+                chunks.append("\n\n".join(current))
+                current = []
+            current.append(piece)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _is_empty(value):
+    if isinstance(value, str):
+        return not value.strip() or value.strip().lower() == NOT_MENTIONED
+    return not value
+
+
+def _normalize(value):
+    return " ".join(str(value or "").lower().split())
+
+
+def _merge_entries(parts):
+    """Concatenate entry lists in chunk order, folding duplicates into the first one."""
+    merged, index = [], {}
+    for entries, fields in parts:
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            key = tuple(_normalize(entry.get(field)) for field in fields)
+            if not any(key):
+                key = (_normalize(entry),)
+            existing = index.get(key)
+            if existing is None:
+                index[key] = dict(entry)
+                merged.append(index[key])
+                continue
+            # Fill fields the first occurrence lacks and keep the longer text.
+            for field, value in entry.items():
+                current = existing.get(field)
+                if _is_empty(value):
+                    continue
+                if _is_empty(current) or (
+                    isinstance(value, str)
+                    and isinstance(current, str)
+                    and len(value) > len(current)
+                ):
+                    existing[field] = value
+    return merged
+
+
+def _union(lists):
+    """Union of string lists, keeping first-seen order and spelling."""
+    seen, merged = set(), []
+    for values in lists:
+        for value in values:
+            key = _normalize(value)
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(value)
+    return merged
+
+
+def merge_cv_extractions(parts):
+    """
+    Merge structured CV data extracted from the chunks of one CV, in chunk order.
+
+    Scalar sections take the first value found; contact details are merged per
+    field; Experience, Education and Certifications are concatenated with
+    duplicates (same title/company/start, degree/institution/start or
+    name/issuer) folded together; Skills and Languages are unioned. Sections
+    found in no chunk are "not mentioned". The result does not depend on the
+    order in which the chunk requests completed.
+    """
+    merged = {}
+    for section in CV_SECTIONS:
+        values = [part.get(section) for part in parts if not _is_empty(part.get(section))]
+        if section == "Contact Information":
+            contact = {}
+            for value in values:
+                if isinstance(value, dict):
+                    for field, item in value.items():
+                        if _is_empty(contact.get(field)) and not _is_empty(item):
+                            contact[field] = item
+            merged[section] = contact or NOT_MENTIONED
+        elif section in _ENTRY_KEYS:
+            lists = [value for value in values if isinstance(value, list)]
+            merged[section] = (
+                _merge_entries((value, _ENTRY_KEYS[section]) for value in lists) or NOT_MENTIONED
+            )
+        elif section in ("Skills", "Languages"):
+            lists = [value if isinstance(value, list) else [value] for value in values]
+            merged[section] = _union(lists) or NOT_MENTIONED
+        else:
+            merged[section] = values[0] if values else NOT_MENTIONED
+    # Keys outside the schema keep their first non-empty value.
+    for part in parts:
+        for key, value in part.items():
+            if key not in merged and not _is_empty(value):
+                merged[key] = value
+    return merged
+
+
+def _extract_chunk(chunk, known_contact=None):
+    with metrics.span("prompt_build"):
+        prompt = construct_cv_prompt(chunk, known_contact)
+    with metrics.span("llm_chunk"):
+        return retry_llm_response(prompt, source_text=chunk)
+
+
+def _with_contact(structured_data, known_contact):
+    """
+    Fill Contact Information with the fields found by regex, which take
+    precedence (extract_contact_fields only reports unambiguous matches).
+    """
+    if not structured_data or not known_contact:
+        return structured_data
+    contact = structured_data.get("Contact Information")
+    contact = dict(contact) if isinstance(contact, dict) else {}
+    for field in ("email", "phone"):
+        if field in known_contact:
+            contact[field] = known_contact[field]
+    if "links" in known_contact:
+        contact["links"] = ", ".join(known_contact["links"])
+    structured_data["Contact Information"] = contact
+    return structured_data
+
+
+def extract_cv_structure(raw_text, threshold=None, max_tokens=None, workers=None):
+    """
+    Turn raw CV text into structured CV data (the retry_llm_response format).
+
+    Email, phone and profile links are found with regexes (see
+    text_preprocessing.extract_contact_fields) and only the rest of the
+    contact details is asked of the LLM. Texts up to threshold tokens are
+    sent in one request. Longer ones are cut into section-aware chunks (see
+    chunk_cv_text) that are extracted concurrently and merged with
+    merge_cv_extractions, so the wall-clock time is about that of one chunk.
+    Returns None if any chunk fails.
+    """
+    threshold = threshold or CHUNKED_EXTRACTION_THRESHOLD
+    known_contact = extract_contact_fields(raw_text)
+    if estimate_tokens(raw_text) <= threshold:
+        with metrics.span("prompt_build"):
+            prompt = construct_cv_prompt(raw_text, known_contact)
+        structured_data = retry_llm_response(prompt, source_text=raw_text)
+        return _with_contact(structured_data, known_contact)
+
+    chunks = chunk_cv_text(raw_text, max_tokens)
+    CHUNK_REQUESTS.observe(len(chunks))
+    logger.info("Extracting a long CV in %d chunks.", len(chunks))
+    with ThreadPoolExecutor(max_workers=min(workers or CHUNK_WORKERS, len(chunks))) as pool:
+        parts = list(pool.map(lambda chunk: _extract_chunk(chunk, known_contact), chunks))
+    if any(part is None for part in parts):
+        logger.error(
+            "%d of %d chunks failed to extract.",
+            sum(part is None for part in parts),
+            len(chunks),
+        )
+        return None
+    return _with_contact(merge_cv_extractions(parts), known_contact)
@@ -5,8 +5,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import os
-import shutil
-import sqlite3
+import hashlib
+import time
 import uuid
 import json
 from pathlib import Path
@@ -14,16 +14,16 @@ from pathlib import Path
 # Import functions from document_processor
 from modules.document_processor import (
     identify_file_type,
-    is_scanned_pdf,
-    convert_pdf_to_images,
-    preprocess_image,
-    perform_ocr_on_images,
+    extract_pdf_pages,
     extract_text_from_word,
-    extract_text_from_pdf,
 )
 
-# Import LLM helper functions from llm_integration
-from modules.llm_integration import construct_cv_prompt, retry_llm_response
+from modules.cv_repository import get_repository
+from modules.text_preprocessing import preprocess_cv_pages
+from modules.metrics import record_cache_lookup, span
+
+# Structured extraction through the LLM (chunked for long CVs)
+from modules.cv_chunking import extract_cv_structure
 
 # Define directories and database path
 BASE_DIR = Path(__file__).resolve().parent
@@ -32,159 +32,202 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = BASE_DIR / ".." / "cv_data.db"
 
 
+def store_uploaded_cv(file_obj, filename):
+    """
+    Save the uploaded CV file (PDF or Word) into data/sample_cvs under a
+    content-addressed name (the SHA-256 of its bytes).
+    Re-uploading the same file does not create a second copy.
+    Returns a (saved_path, content_hash) tuple.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    tmp_path = UPLOAD_DIR / f".{uuid.uuid4()}.part"
+    digest = hashlib.sha256()
+    with open(tmp_path, "wb") as f:
+        for chunk in iter(lambda: file_obj.read(1024 * 1024), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    content_hash = digest.hexdigest()
+    save_path = UPLOAD_DIR / f"{content_hash}{ext}"
+    if save_path.exists():
+        os.remove(tmp_path)
+        print(f"File already stored at {save_path}")
+    else:
+        os.replace(tmp_path, save_path)
+        print(f"File saved to {save_path}")
+    return str(save_path), content_hash
+
+
 def save_uploaded_cv(file_obj, filename):
     """
-    Save the uploaded CV file (PDF or Word) into data/sample_cvs,
-    generating a unique filename.
+    Save the uploaded CV file (PDF or Word) into data/sample_cvs.
+    Returns the saved path (see store_uploaded_cv for the naming scheme).
     """
-    ext = os.path.splitext(filename)[1]
-    unique_name = f"{uuid.uuid4()}{ext}"
-    save_path = UPLOAD_DIR / unique_name
-    with open(save_path, "wb") as f:
-        shutil.copyfileobj(file_obj, f)
-    print(f"File saved to {save_path}")
-    return str(save_path)
+    return store_uploaded_cv(file_obj, filename)[0]
 
 
-def extract_raw_text(file_path):
+def extract_raw_pages(file_path):
     """
-    Extract raw text from a CV file.
-    For PDFs, if the file is scanned (i.e. no extractable text),
-    convert pages to images and perform OCR.
-    For Word documents, extract text directly.
+    Extract the text of a CV file page by page.
+    For PDFs, each page's text layer is used when present and only the pages
+    without one are rasterized and OCRed (see extract_pdf_pages).
+    Word documents are returned as a single page.
+    Returns a list of dicts with page, method, text, error and seconds.
     """
-    file_type = identify_file_type(file_path)
+    with span("detect_type"):
+        file_type = identify_file_type(file_path)
     if file_type == "pdf":
-        if is_scanned_pdf(file_path):
-            images = convert_pdf_to_images(file_path)
-            if images:
-                preprocessed_images = [preprocess_image(img) for img in images]
-                ocr_texts = perform_ocr_on_images(preprocessed_images)
-                return "\n".join(ocr_texts)
-            else:
-                return ""
-        else:
-            return extract_text_from_pdf(file_path)
+        pages = extract_pdf_pages(file_path)
+        for page in pages:
+            print(
+                f"Page {page['page']}: {page['method']} in {page['seconds']:.2f}s"
+            )
+        return pages
     elif file_type == "word":
-        return extract_text_from_word(file_path)
+        start = time.perf_counter()
+        with span("docx_text"):
+            text = extract_text_from_word(file_path)
+        return [
+            {
+                "page": 1,
+                "method": "docx",
+                "text": text,
+                "error": None,
+                "seconds": time.perf_counter() - start,
+            }
+        ]
     else:
         raise ValueError("Unsupported file type.")
 
 
+def extract_raw_text(file_path):
+    """
+    Extract raw text from a CV file.
+    For PDFs, text-layer pages are read directly and pages without a text
+    layer are OCRed, so mixed documents lose no pages.
+    For Word documents, extract text directly.
+    The text is then compacted for the LLM (see
+    text_preprocessing.preprocess_cv_pages): headers and footers repeated
+    across pages, hyphenation breaks, OCR noise and extra whitespace are removed.
+    """
+    pages = extract_raw_pages(file_path)
+    result = preprocess_cv_pages([page["text"] for page in pages])
+    print(
+        f"Preprocessing saved ~{result['tokens_saved']} of "
+        f"{result['tokens_before']} tokens."
+    )
+    return result["text"]
+
+
+def get_db():
+    """Return the repository for the current DB_PATH."""
+    return get_repository(DB_PATH)
+
+
 def init_db():
     """Initialize the SQLite database and create the cv_records table.
     For testing purposes, we drop the table if it exists so that the schema is fresh.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Drop table if it exists (for testing only)
-    cursor.execute("DROP TABLE IF EXISTS cv_records")
-    # Create the table with the expected columns.
-    cursor.execute(
-        """
-        CREATE TABLE cv_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_path TEXT,
-            personal_information TEXT,
-            education_history TEXT,
-            work_experience TEXT,
-            skills TEXT,
-            projects TEXT,
-            certifications TEXT,
-            raw_text TEXT
-        )
-    """
-    )
-    conn.commit()
-    conn.close()
+    get_db().init_schema(drop=True)
     print(f"Database initialized at {DB_PATH}")
 
 
+def ensure_schema():
+    """
+    Bring an existing database up to date without dropping data:
+    add the content_hash column to cv_records and create the extraction cache.
+    """
+    get_db().ensure_schema()
+
+
+def get_cached_extraction(content_hash):
+    """
+    Look up the cached raw text and structured LLM output for a content hash.
+    Returns a dict with "raw_text" and "structured_data" (None if not cached yet),
+    or None when the hash has never been seen.
+    """
+    return get_db().get_cached_extraction(content_hash)
+
+
+def save_extraction_cache(content_hash, raw_text, structured_data=None):
+    """Store the raw text (and, once available, the structured LLM output) for a content hash."""
+    get_db().save_extraction_cache(content_hash, raw_text, structured_data)
+
+
 def save_cv_data(cv_data):
-    """Save the extracted structured CV data into the SQLite database."""
+    """
+    Save the extracted structured CV data into the SQLite database.
+    A record whose content_hash is already stored is ignored.
+    Returns the new row id (None if nothing was inserted).
+    """
+    row_id = None
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO cv_records (
-                file_path,
-                personal_information,
-                education_history,
-                work_experience,
-                skills,
-                projects,
-                certifications,
-                raw_text
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-            (
-                cv_data.get("file_path"),
-                cv_data.get("personal_information"),
-                cv_data.get("education_history"),
-                cv_data.get("work_experience"),
-                cv_data.get("skills"),
-                cv_data.get("projects"),
-                cv_data.get("certifications"),
-                cv_data.get("raw_text"),
-            ),
-        )
-        conn.commit()
-        row_id = cursor.lastrowid
-        print(f"CV record saved with id: {row_id}")
+        row_id = get_db().insert(cv_data)
+        if row_id:
+            print(f"CV record saved with id: {row_id}")
+        else:
+            print("CV record already stored; insert skipped.")
     except Exception as e:
         print("Error saving CV data:", e)
-    finally:
-        conn.close()
+    return row_id
+
+
+def save_cv_data_batch(records):
+    """
+    Save many CV records in a single transaction.
+    Records whose content_hash is already stored are ignored.
+    Returns the number of rows inserted.
+    """
+    inserted = get_db().insert_many(records)
+    print(f"Saved {inserted} of {len(records)} CV records in one transaction.")
+    return inserted
 
 
 def get_all_cv_data():
     """Retrieve all CV records from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM cv_records")
-    rows = cursor.fetchall()
-    conn.close()
-    keys = [
-        "id",
-        "file_path",
-        "personal_information",
-        "education_history",
-        "work_experience",
-        "skills",
-        "projects",
-        "certifications",
-        "raw_text",
-    ]
-    records = [dict(zip(keys, row)) for row in rows]
-    return records
-
-
-def process_and_save_cv(file_obj, filename):
+    return get_db().get_all()
+
+
+def iter_cv_data(fields=None, batch_size=None):
     """
-    Process an uploaded CV file by:
-      1. Saving the file.
-      2. Extracting raw text from the file.
-      3. Building an LLM prompt using construct_cv_prompt.
-      4. Calling the LLM (via retry_llm_response) to obtain structured CV data.
-      5. Mapping the LLM output into our desired structure and saving it in the database.
+    Lazily iterate over CV records, loading only the requested fields, e.g.
+    iter_cv_data(fields=["personal_information", "skills"]) never reads raw_text.
+    """
+    return get_db().iter_records(fields=fields, batch_size=batch_size)
+
 
-    Returns the structured CV data as a dict.
+def get_cv_data_page(fields=None, cursor=0, limit=100):
+    """
+    Return (records, next_cursor) for one page of CV records; pass next_cursor
+    back to get the following page (it is None after the last page).
+    """
+    return get_db().get_page(fields=fields, after_id=cursor, limit=limit)
+
+
+def find_cv_candidates(skills=None, min_experience_years=None, company=None, degree=None):
+    """
+    Retrieve the CV records matching all given criteria through the indexed
+    skill/experience/education tables, e.g.
+    find_cv_candidates(skills=["Kubernetes"], min_experience_years=5).
+    """
+    repository = get_db()
+    ids = repository.find_candidate_ids(
+        skills=skills,
+        min_experience_years=min_experience_years,
+        company=company,
+        degree=degree,
+    )
+    return repository.get_by_ids(ids)
+
+
+def get_cv_data_by_hash(content_hash):
+    """Retrieve the CV record stored for a content hash, or None."""
+    return get_db().get_by_hash(content_hash)
+
+
+def build_cv_record(structured_data, saved_path, raw_text, content_hash=None):
+    """
+    Map the LLM's structured CV output into the cv_records row structure.
     """
-    # Step 1: Save the file
-    saved_path = save_uploaded_cv(file_obj, filename)
-    # Step 2: Extract raw text
-    raw_text = extract_raw_text(saved_path)
-    # Step 3: Build a prompt for the LLM
-    prompt = construct_cv_prompt(raw_text)
-    print("LLM Prompt constructed")
-    # Step 4: Call the LLM to get structured data (with retry logic)
-    structured_data = retry_llm_response(prompt)
-    if not structured_data:
-        raise Exception("LLM failed to return structured data after multiple attempts.")
-
-    # Step 5: Map LLM response to our desired structure.
     name = structured_data.get("Name", "not mentioned")
     contact_info = structured_data.get("Contact Information", "not mentioned")
     if isinstance(contact_info, dict):
@@ -212,7 +255,7 @@ def process_and_save_cv(file_obj, filename):
     if not isinstance(projects, str):
         projects = json.dumps(projects)
 
-    cv_data = {
+    return {
         "file_path": saved_path,
         "personal_information": personal_info,
         "education_history": education_history,
@@ -221,8 +264,68 @@ def process_and_save_cv(file_obj, filename):
         "projects": projects,
         "certifications": certifications,
         "raw_text": raw_text,
+        "content_hash": content_hash,
     }
 
-    # Step 6: Save the structured data in the database
+
+def process_and_save_cv(file_obj, filename, progress=None):
+    """
+    Process an uploaded CV file by:
+      1. Saving the file under its content hash.
+      2. Returning the stored record straight away if this content was processed before.
+      3. Extracting raw text from the file (or reusing the cached text).
+      4. Calling the LLM (via extract_cv_structure, which splits long CVs into
+         chunks extracted in parallel) to obtain structured CV data (or
+         reusing the cached output).
+      5. Mapping the LLM output into our desired structure and saving it in the database.
+
+    If given, progress(stage) is called as each stage ("save", "extract",
+    "llm", "db") starts.
+
+    Returns the structured CV data as a dict, with "cache_hit" set when the
+    extraction or the whole record was served from the cache.
+    """
+    progress = progress or (lambda stage: None)
+    # Step 1: Save the file
+    progress("save")
+    with span("save"):
+        saved_path, content_hash = store_uploaded_cv(file_obj, filename)
+
+    # Step 2: Duplicate upload of an already stored CV
+    existing = get_cv_data_by_hash(content_hash)
+    record_cache_lookup("cv_record", existing is not None)
+    if existing:
+        print(f"CV {content_hash} already processed; returning stored record.")
+        existing["cache_hit"] = True
+        return existing
+
+    cached = get_cached_extraction(content_hash) or {}
+    raw_text = cached.get("raw_text")
+    structured_data = cached.get("structured_data")
+    cache_hit = structured_data is not None
+    record_cache_lookup("extraction", cache_hit)
+
+    # Step 3: Extract raw text
+    if raw_text is None:
+        progress("extract")
+        with span("extract"):
+            raw_text = extract_raw_text(saved_path)
+        save_extraction_cache(content_hash, raw_text)
+
+    if structured_data is None:
+        progress("llm")
+        # Step 4: Call the LLM to get structured data (with retry logic)
+        with span("llm"):
+            structured_data = extract_cv_structure(raw_text)
+        if not structured_data:
+            raise Exception(
+                "LLM failed to return structured data after multiple attempts."
+            )
+        save_extraction_cache(content_hash, raw_text, structured_data)
+
+    # Step 5: Map LLM response to our desired structure and save it in the database
+    progress("db")
+    cv_data = build_cv_record(structured_data, saved_path, raw_text, content_hash)
     save_cv_data(cv_data)
+    cv_data["cache_hit"] = cache_hit
     return cv_data
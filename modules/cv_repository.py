@@ -0,0 +1,665 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import re
+import json
+import time
+from datetime import date
+import logging
+import sqlite3
+import threading
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from dotenv import load_dotenv
+
+from modules.metrics import span
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Page cache per connection, in KiB.
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+# Bytes of the database file memory-mapped per connection.
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# How long a writer waits for a competing write lock before failing.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+CV_RECORD_KEYS = [
+    "id",
+    "file_path",
+    "personal_information",
+    "education_history",
+    "work_experience",
+    "skills",
+    "projects",
+    "certifications",
+    "raw_text",
+    "content_hash",
+]
+# Columns written on insert (everything but the autoincrement id).
+CV_INSERT_KEYS = CV_RECORD_KEYS[1:]
+# Rows fetched per query by the streaming read API.
+CV_READ_BATCH_SIZE = int(os.getenv("CV_READ_BATCH_SIZE", "500"))
+
+# SQL is kept as constant strings so sqlite3's per-connection statement cache
+# reuses the compiled statements across calls.
+CREATE_CV_RECORDS_SQL = """
+    CREATE TABLE IF NOT EXISTS cv_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_path TEXT,
+        personal_information TEXT,
+        education_history TEXT,
+        work_experience TEXT,
+        skills TEXT,
+        projects TEXT,
+        certifications TEXT,
+        raw_text TEXT,
+        content_hash TEXT
+    )
+"""
+CREATE_EXTRACTION_CACHE_SQL = """
+    CREATE TABLE IF NOT EXISTS extraction_cache (
+        content_hash TEXT PRIMARY KEY,
+        raw_text TEXT,
+        structured_data TEXT,
+        created_at REAL
+    )
+"""
+# Normalized child tables, filled from the JSON columns of cv_records.
+CREATE_NORMALIZED_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS cv_skills (
+        cv_id INTEGER NOT NULL REFERENCES cv_records (id) ON DELETE CASCADE,
+        name TEXT,
+        normalized_name TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cv_experience (
+        cv_id INTEGER NOT NULL REFERENCES cv_records (id) ON DELETE CASCADE,
+        title TEXT,
+        company TEXT,
+        normalized_company TEXT,
+        start_date TEXT,
+        end_date TEXT,
+        months INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cv_education (
+        cv_id INTEGER NOT NULL REFERENCES cv_records (id) ON DELETE CASCADE,
+        degree TEXT,
+        normalized_degree TEXT,
+        institution TEXT,
+        start_date TEXT,
+        end_date TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cv_stats (
+        cv_id INTEGER PRIMARY KEY REFERENCES cv_records (id) ON DELETE CASCADE,
+        experience_months INTEGER NOT NULL
+    )
+    """,
+]
+CREATE_INDEXES_SQL = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_cv_records_content_hash "
+    "ON cv_records (content_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_skills_name ON cv_skills (normalized_name, cv_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_skills_cv ON cv_skills (cv_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_experience_company "
+    "ON cv_experience (normalized_company, cv_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_experience_dates "
+    "ON cv_experience (start_date, end_date)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_experience_cv ON cv_experience (cv_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_education_degree "
+    "ON cv_education (normalized_degree, cv_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_education_dates ON cv_education (end_date)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_education_cv ON cv_education (cv_id)",
+    "CREATE INDEX IF NOT EXISTS idx_cv_stats_experience "
+    "ON cv_stats (experience_months, cv_id)",
+]
+NORMALIZED_TABLES = ["cv_skills", "cv_experience", "cv_education", "cv_stats"]
+
+# Change log of cv_records. Its highest version is the DB version counter:
+# triggers bump it on every insert, update or delete, so any process can tell
+# whether its cached view of the CVs is stale and which rows changed.
+CV_CHANGES_RETAINED = 10000
+CREATE_CHANGE_LOG_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS cv_changes (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        cv_id INTEGER,
+        op TEXT NOT NULL
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cv_records_insert AFTER INSERT ON cv_records
+    BEGIN
+        INSERT INTO cv_changes (cv_id, op) VALUES (NEW.id, 'insert');
+        DELETE FROM cv_changes WHERE version <= last_insert_rowid() - {CV_CHANGES_RETAINED};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_cv_records_update AFTER UPDATE ON cv_records
+    BEGIN
+        INSERT INTO cv_changes (cv_id, op) VALUES (NEW.id, 'update');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_cv_records_delete AFTER DELETE ON cv_records
+    BEGIN
+        INSERT INTO cv_changes (cv_id, op) VALUES (OLD.id, 'delete');
+    END
+    """,
+]
+SELECT_VERSION_SQL = "SELECT COALESCE(MAX(version), 0) FROM cv_changes"
+SELECT_CHANGES_SQL = (
+    "SELECT version, cv_id, op FROM cv_changes WHERE version > ? ORDER BY version"
+)
+SELECT_OLDEST_CHANGE_SQL = "SELECT MIN(version) FROM cv_changes"
+INSERT_CV_SQL = (
+    f"INSERT OR IGNORE INTO cv_records ({', '.join(CV_INSERT_KEYS)}) "
+    f"VALUES ({', '.join('?' for _ in CV_INSERT_KEYS)})"
+)
+SELECT_CV_BY_HASH_SQL = (
+    f"SELECT {', '.join(CV_RECORD_KEYS)} FROM cv_records WHERE content_hash = ?"
+)
+SELECT_CACHE_SQL = (
+    "SELECT raw_text, structured_data FROM extraction_cache WHERE content_hash = ?"
+)
+INSERT_SKILL_SQL = "INSERT INTO cv_skills (cv_id, name, normalized_name) VALUES (?, ?, ?)"
+INSERT_EXPERIENCE_SQL = """
+    INSERT INTO cv_experience
+        (cv_id, title, company, normalized_company, start_date, end_date, months)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_EDUCATION_SQL = """
+    INSERT INTO cv_education
+        (cv_id, degree, normalized_degree, institution, start_date, end_date)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+INSERT_STATS_SQL = "INSERT OR REPLACE INTO cv_stats (cv_id, experience_months) VALUES (?, ?)"
+SELECT_UNINDEXED_CV_SQL = """
+    SELECT r.id, r.skills, r.work_experience, r.education_history
+    FROM cv_records r LEFT JOIN cv_stats s ON s.cv_id = r.id
+    WHERE s.cv_id IS NULL
+"""
+UPSERT_CACHE_SQL = """
+    INSERT INTO extraction_cache (content_hash, raw_text, structured_data, created_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(content_hash) DO UPDATE SET
+        raw_text = excluded.raw_text,
+        structured_data = COALESCE(excluded.structured_data, structured_data)
+"""
+
+
+@lru_cache(maxsize=None)
+def record_type(fields):
+    """
+    Compact record class for a tuple of column names.
+
+    Records are named tuples (no per-instance dict) that also answer the
+    read-only dict protocol used across the code base: record["skills"],
+    record.get("skills"), record.keys() and dict(record).
+    """
+
+    class CVRecord(namedtuple("CVRecord", fields)):
+        __slots__ = ()
+
+        def __getitem__(self, key):
+            if isinstance(key, str):
+                try:
+                    return getattr(self, key)
+                except AttributeError:
+                    raise KeyError(key) from None
+            return tuple.__getitem__(self, key)
+
+        def __contains__(self, key):
+            return key in self._fields
+
+        def get(self, key, default=None):
+            return getattr(self, key, default) if key in self._fields else default
+
+        def keys(self):
+            return self._fields
+
+    return CVRecord
+
+
+def _projection(fields):
+    """Validate requested columns; "id" is always included and comes first."""
+    if fields is None:
+        return tuple(CV_RECORD_KEYS)
+    unknown = [f for f in fields if f not in CV_RECORD_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown cv_records fields: {', '.join(unknown)}")
+    return ("id",) + tuple(f for f in fields if f != "id")
+
+
+_NON_WORD = re.compile(r"[^\w+#.]+")
+_DATE = re.compile(r"(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?")
+_PRESENT = {"present", "current", "now", "ongoing", "today"}
+
+
+def normalize_name(value):
+    """Lower-case a skill, company or degree name and collapse punctuation/whitespace."""
+    if not isinstance(value, str):
+        return ""
+    return " ".join(_NON_WORD.sub(" ", value.lower()).split())
+
+
+def parse_cv_date(value, today=None):
+    """
+    Parse an LLM-formatted date ("yyyy-mm-dd", "yyyy-mm" or "yyyy") into an ISO date.
+    "Present"-like values map to today; anything else returns None.
+    """
+    if not isinstance(value, str):
+        return None
+    if value.strip().lower() in _PRESENT:
+        return (today or date.today()).isoformat()
+    match = _DATE.search(value)
+    if not match:
+        return None
+    year, month, day = match.group(1), match.group(2) or "1", match.group(3) or "1"
+    try:
+        return date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+def _months_between(start, end):
+    start, end = date.fromisoformat(start), date.fromisoformat(end)
+    return max(0, (end.year - start.year) * 12 + end.month - start.month)
+
+
+def _load_json_list(value):
+    """Decode a JSON array column; "not mentioned" and malformed values give []."""
+    if not value:
+        return []
+    try:
+        items = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return items if isinstance(items, list) else []
+
+
+def experience_months(periods):
+    """Total months covered by (start, end) ISO date pairs, counting overlaps once."""
+    total = 0
+    current_start = current_end = None
+    for start, end in sorted(p for p in periods if p[0] and p[1] and p[0] <= p[1]):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += _months_between(current_start, current_end)
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += _months_between(current_start, current_end)
+    return total
+
+
+class _Connection(sqlite3.Connection):
+    """sqlite3.Connection that can be weakly referenced."""
+
+
+class CVRepository:
+    """
+    Data-access layer for the CV database.
+
+    Each thread gets its own connection (connections are never shared across
+    threads or forked processes), closed when the thread exits. Connections
+    run in WAL mode with tuned pragmas, so readers are not blocked by a
+    concurrent upload insert and writers wait on a busy timeout instead of
+    failing.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        # Weak references only: a thread's connection is held by its
+        # thread-local slot and closed once the thread is gone.
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._schema_checked = False
+
+    def connection(self):
+        """Return this thread's connection, opening and configuring it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=256,
+            isolation_level=None,
+            factory=_Connection,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements in one write transaction on this thread's connection."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def close(self):
+        """Close every connection opened by this repository."""
+        with self._lock:
+            connections, self._connections = list(self._connections), weakref.WeakSet()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    # -- schema ---------------------------------------------------------------
+
+    def init_schema(self, drop=False):
+        """Create the tables and indexes; with drop=True, start cv_records from scratch."""
+        with self.transaction() as conn:
+            if drop:
+                for table in NORMALIZED_TABLES:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute("DROP TABLE IF EXISTS cv_records")
+            self._create_schema(conn)
+            if drop:
+                conn.execute("INSERT INTO cv_changes (cv_id, op) VALUES (NULL, 'reset')")
+        self._schema_checked = True
+
+    def ensure_schema(self):
+        """
+        Bring an existing database up to date without dropping data, including
+        backfilling the normalized tables for records stored before they existed.
+        Runs once per repository.
+        """
+        if self._schema_checked:
+            return
+        with self.transaction() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cv_records)")]
+            if columns and "content_hash" not in columns:
+                conn.execute("ALTER TABLE cv_records ADD COLUMN content_hash TEXT")
+            self._create_schema(conn)
+            backfilled = self._backfill_normalized(conn)
+        if backfilled:
+            logger.info("Backfilled normalized tables for %d CV records.", backfilled)
+        self._schema_checked = True
+
+    def _create_schema(self, conn):
+        conn.execute(CREATE_CV_RECORDS_SQL)
+        conn.execute(CREATE_EXTRACTION_CACHE_SQL)
+        for sql in CREATE_NORMALIZED_SQL:
+            conn.execute(sql)
+        for sql in CREATE_INDEXES_SQL:
+            conn.execute(sql)
+        for sql in CREATE_CHANGE_LOG_SQL:
+            conn.execute(sql)
+
+    def _backfill_normalized(self, conn):
+        """Index every cv_records row that has no cv_stats row yet."""
+        rows = conn.execute(SELECT_UNINDEXED_CV_SQL).fetchall()
+        for cv_id, skills, work_experience, education_history in rows:
+            self._index_record(
+                conn,
+                cv_id,
+                {
+                    "skills": skills,
+                    "work_experience": work_experience,
+                    "education_history": education_history,
+                },
+            )
+        return len(rows)
+
+    @staticmethod
+    def _index_record(conn, cv_id, record):
+        """Fill the normalized skill/experience/education rows for one CV."""
+        skills = [s for s in _load_json_list(record.get("skills")) if isinstance(s, str)]
+        conn.executemany(
+            INSERT_SKILL_SQL,
+            {
+                normalize_name(skill): (cv_id, skill, normalize_name(skill))
+                for skill in skills
+                if normalize_name(skill)
+            }.values(),
+        )
+
+        periods = []
+        for job in _load_json_list(record.get("work_experience")):
+            if not isinstance(job, dict):
+                continue
+            start = parse_cv_date(job.get("start_date"))
+            end = parse_cv_date(job.get("end_date"))
+            months = _months_between(start, end) if start and end and start <= end else None
+            periods.append((start, end))
+            conn.execute(
+                INSERT_EXPERIENCE_SQL,
+                (
+                    cv_id,
+                    job.get("title"),
+                    job.get("company"),
+                    normalize_name(job.get("company")),
+                    start,
+                    end,
+                    months,
+                ),
+            )
+
+        for school in _load_json_list(record.get("education_history")):
+            if not isinstance(school, dict):
+                continue
+            conn.execute(
+                INSERT_EDUCATION_SQL,
+                (
+                    cv_id,
+                    school.get("degree"),
+                    normalize_name(school.get("degree")),
+                    school.get("institution"),
+                    parse_cv_date(school.get("start_date")),
+                    parse_cv_date(school.get("end_date")),
+                ),
+            )
+        conn.execute(INSERT_STATS_SQL, (cv_id, experience_months(periods)))
+
+    # -- cv_records -----------------------------------------------------------
+
+    @staticmethod
+    def _insert_params(record):
+        return tuple(record.get(key) for key in CV_INSERT_KEYS)
+
+    def _insert(self, conn, record):
+        cursor = conn.execute(INSERT_CV_SQL, self._insert_params(record))
+        if not cursor.rowcount:
+            return None
+        self._index_record(conn, cursor.lastrowid, record)
+        return cursor.lastrowid
+
+    def insert(self, record):
+        """
+        Insert one CV record together with its normalized rows.
+        Returns its row id, or None if its content_hash exists.
+        """
+        self.ensure_schema()
+        with span("db_write"), self.transaction() as conn:
+            return self._insert(conn, record)
+
+    def insert_many(self, records):
+        """Insert many CV records in one transaction; returns the number inserted."""
+        self.ensure_schema()
+        with span("db_write"), self.transaction() as conn:
+            return sum(1 for record in records if self._insert(conn, record))
+
+    def get_all(self):
+        """Return every CV record as a dict."""
+        return [record._asdict() for record in self.iter_records()]
+
+    def iter_records(self, fields=None, after_id=0, batch_size=None):
+        """
+        Lazily iterate over CV records in id order, loading only the given fields.
+
+        Rows are read in keyset-paginated batches (WHERE id > last seen id), so
+        at most batch_size rows are in memory and no read transaction is held
+        open between batches. Yields compact records (see record_type).
+        """
+        batch_size = batch_size or CV_READ_BATCH_SIZE
+        while True:
+            records, after_id = self.get_page(fields, after_id, batch_size)
+            yield from records
+            if after_id is None:
+                return
+
+    def get_page(self, fields=None, after_id=0, limit=100):
+        """
+        Return one page of CV records after a keyset cursor.
+        Returns (records, next_cursor); next_cursor is None on the last page.
+        """
+        self.ensure_schema()
+        keys = _projection(fields)
+        rows = self.connection().execute(
+            f"SELECT {', '.join(keys)} FROM cv_records WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit),
+        ).fetchall()
+        make = record_type(keys)._make
+        records = [make(row) for row in rows]
+        next_cursor = records[-1].id if len(records) == limit else None
+        return records, next_cursor
+
+    def get_by_hash(self, content_hash):
+        """Return the CV record stored for a content hash, or None."""
+        self.ensure_schema()
+        row = self.connection().execute(SELECT_CV_BY_HASH_SQL, (content_hash,)).fetchone()
+        return dict(zip(CV_RECORD_KEYS, row)) if row else None
+
+    def find_candidate_ids(self, skills=None, min_experience_years=None, company=None, degree=None):
+        """
+        Return the ids of CVs matching every given criterion, using the
+        normalized tables' indexes:
+          skills: all of these skills (case/punctuation-insensitive)
+          min_experience_years: at least this much non-overlapping experience
+          company: worked at this company
+          degree: holds a degree containing this text (e.g. "computer science")
+        """
+        self.ensure_schema()
+        clauses, params = [], []
+        for skill in skills or []:
+            clauses.append("SELECT cv_id FROM cv_skills WHERE normalized_name = ?")
+            params.append(normalize_name(skill))
+        if min_experience_years is not None:
+            clauses.append("SELECT cv_id FROM cv_stats WHERE experience_months >= ?")
+            params.append(int(min_experience_years * 12))
+        if company:
+            clauses.append("SELECT cv_id FROM cv_experience WHERE normalized_company = ?")
+            params.append(normalize_name(company))
+        if degree:
+            clauses.append(
+                "SELECT cv_id FROM cv_education WHERE normalized_degree LIKE ?"
+            )
+            params.append(f"%{normalize_name(degree)}%")
+        if not clauses:
+            sql = "SELECT id FROM cv_records ORDER BY id"
+        else:
+            sql = " INTERSECT ".join(clauses) + " ORDER BY 1"
+        return [row[0] for row in self.connection().execute(sql, params)]
+
+    def get_by_ids(self, ids, fields=None):
+        """Return the CV records with the given ids as dicts, in id order."""
+        self.ensure_schema()
+        ids = list(ids)
+        if not ids:
+            return []
+        keys = _projection(fields)
+        placeholders = ", ".join("?" for _ in ids)
+        rows = self.connection().execute(
+            f"SELECT {', '.join(keys)} FROM cv_records "
+            f"WHERE id IN ({placeholders}) ORDER BY id",
+            ids,
+        )
+        return [dict(zip(keys, row)) for row in rows]
+
+    # -- change tracking ------------------------------------------------------
+
+    def get_version(self):
+        """Current DB version; it changes whenever a cv_records row is written."""
+        self.ensure_schema()
+        return self.connection().execute(SELECT_VERSION_SQL).fetchone()[0]
+
+    def get_changes_since(self, version):
+        """
+        Return (version, cv_id, op) changes after a version, oldest first.
+        Returns None when the log no longer reaches back that far (or the
+        table was reset), in which case callers must reload everything.
+        """
+        self.ensure_schema()
+        conn = self.connection()
+        oldest = conn.execute(SELECT_OLDEST_CHANGE_SQL).fetchone()[0]
+        if oldest is not None and oldest > version + 1:
+            return None
+        changes = conn.execute(SELECT_CHANGES_SQL, (version,)).fetchall()
+        if any(op == "reset" for _, _, op in changes):
+            return None
+        return changes
+
+    # -- extraction cache -----------------------------------------------------
+
+    def get_cached_extraction(self, content_hash):
+        """Return {"raw_text", "structured_data"} cached for a content hash, or None."""
+        self.ensure_schema()
+        row = self.connection().execute(SELECT_CACHE_SQL, (content_hash,)).fetchone()
+        if row is None:
+            return None
+        structured_data = json.loads(row[1]) if row[1] else None
+        return {"raw_text": row[0], "structured_data": structured_data}
+
+    def save_extraction_cache(self, content_hash, raw_text, structured_data=None):
+        """Store the raw text and (once available) the structured LLM output for a hash."""
+        self.ensure_schema()
+        with self.transaction() as conn:
+            conn.execute(
+                UPSERT_CACHE_SQL,
+                (
+                    content_hash,
+                    raw_text,
+                    json.dumps(structured_data) if structured_data else None,
+                    time.time(),
+                ),
+            )
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(db_path):
+    """Return the shared CVRepository for a database file."""
+    db_path = str(db_path)
+    with _repositories_lock:
+        repository = _repositories.get(db_path)
+        if repository is None:
+            repository = _repositories[db_path] = CVRepository(db_path)
+        return repository
@@ -1,14 +1,52 @@
 import os
-from pdf2image import convert_from_path
-from PIL import Image, ImageFilter
-import PyPDF2
-from docx import Document
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
-import pytesseract
-from PyPDF2 import PdfReader
+
+from modules.metrics import observe_stage, span
 
 load_dotenv()
 
+# Number of worker processes in the process-wide OCR pool, shared by all
+# documents being ingested. Defaults to the CPU count.
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or os.cpu_count() or 1
+# Upper bound on the memory held by page images in flight in the OCR pipeline.
+OCR_MAX_MEMORY_MB = int(os.getenv("OCR_MAX_MEMORY_MB", "512"))
+# A PDF page whose text layer has fewer characters than this is sent to OCR.
+MIN_PAGE_TEXT_CHARS = int(os.getenv("MIN_PAGE_TEXT_CHARS", "20"))
+# Binarize, deskew, crop and rescale pages before OCR (needs NumPy); set
+# OCR_CLEANUP=0 to only convert them to grayscale and filter noise.
+OCR_CLEANUP = os.getenv("OCR_CLEANUP", "1") != "0"
+
+
+# pdf2image, PyPDF2, python-docx, Pillow, NumPy and pytesseract are imported on
+# first use so that importing this module (and the web app) stays fast.
+
+
+def convert_from_path(*args, **kwargs):
+    """pdf2image.convert_from_path, imported on first use."""
+    from pdf2image import convert_from_path as _convert_from_path
+
+    return _convert_from_path(*args, **kwargs)
+
+
+def pdfinfo_from_path(*args, **kwargs):
+    """pdf2image.pdfinfo_from_path, imported on first use."""
+    from pdf2image import pdfinfo_from_path as _pdfinfo_from_path
+
+    return _pdfinfo_from_path(*args, **kwargs)
+
+
+def PdfReader(stream):
+    """Open a PyPDF2.PdfReader, importing PyPDF2 on first use."""
+    from PyPDF2 import PdfReader as _PdfReader
+
+    return _PdfReader(stream)
+
 
 def identify_file_type(file_path):
     """
@@ -30,7 +68,7 @@ def is_scanned_pdf(file_path):
     """
     try:
         with open(file_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
+            reader = PdfReader(f)
             if reader.pages:
                 first_page = reader.pages[0]
                 text = first_page.extract_text() or ""
@@ -58,10 +96,87 @@ def convert_pdf_to_images(file_path, dpi=300):
         return []
 
 
-def preprocess_image(image):
+def get_pdf_page_count(file_path):
+    """
+    Return the number of pages of a PDF using poppler's pdfinfo.
+    """
+    info = pdfinfo_from_path(file_path, poppler_path=os.getenv("POPPLER_PATH"))
+    return int(info["Pages"])
+
+
+def iter_pdf_images(file_path, dpi=300, pages=None):
+    """
+    Rasterize a PDF one page at a time.
+    Yields (page_number, image, error) tuples; only one page image exists at a time
+    unless the caller keeps references to them. Page numbers are 1-based.
+    """
+    poppler_path = os.getenv("POPPLER_PATH")
+    if pages is None:
+        try:
+            pages = range(1, get_pdf_page_count(file_path) + 1)
+        except Exception as e:
+            print(f"Error reading PDF page count: {e}")
+            return
+    for page_number in pages:
+        try:
+            with span("rasterize"):
+                images = convert_from_path(
+                    file_path,
+                    dpi=dpi,
+                    first_page=page_number,
+                    last_page=page_number,
+                    poppler_path=poppler_path,
+                )
+        except Exception as e:
+            print(f"Error converting page {page_number} to an image: {e}")
+            yield page_number, None, str(e)
+            continue
+        if not images:
+            yield page_number, None, "page could not be rasterized"
+            continue
+        yield page_number, images[0], None
+
+
+# False once importing the NumPy page cleanup has failed (warned about once).
+_numpy_available = True
+
+
+def _clean_page():
+    """image_preprocessing.clean_page, or None when NumPy is not installed."""
+    global _numpy_available
+    if not _numpy_available:
+        return None
+    try:
+        from modules.image_preprocessing import clean_page
+    except ImportError:
+        print("Warning: NumPy is not installed; OCR page cleanup is disabled.")
+        _numpy_available = False
+        return None
+    return clean_page
+
+
+def preprocess_image(image, dpi=300, cleanup=None):
     """
-    Preprocess an image: convert to grayscale and apply a median filter to reduce noise.
+    Preprocess a page rasterized at dpi for OCR.
+    With cleanup (default OCR_CLEANUP), the page is binarized, cleared of
+    blank margins, deskewed and resampled to suit its text size (see
+    image_preprocessing.clean_page), and None is returned for a blank page.
+    Otherwise it is converted to grayscale and a median filter reduces noise.
     """
+    from PIL import ImageFilter
+
+    cleanup = OCR_CLEANUP if cleanup is None else cleanup
+    clean_page = _clean_page() if cleanup else None
+    if clean_page is not None:
+        with span("ocr_preprocess"):
+            page, info = clean_page(image, dpi)
+        if page is not None:
+            print(
+                f"Page cleaned: skew {info['skew']:.1f} deg, "
+                f"line height {info['line_height']}px, OCR at {info['dpi']} DPI."
+            )
+        return page
+
     gray_image = image.convert("L")
     cleaned_image = gray_image.filter(ImageFilter.MedianFilter(size=3))
     return cleaned_image
@@ -71,6 +186,8 @@ def extract_text_from_word(file_path):
     """
     Extract text from a Word document.
     """
+    from docx import Document
+
     try:
         doc = Document(file_path)
         full_text = [para.text for para in doc.paragraphs]
@@ -91,22 +208,233 @@ def extract_text_from_pdf(file_path):
     return text
 
 
+def extract_pdf_pages(file_path, dpi=300, max_workers=None, min_text_chars=None):
+    """
+    Hybrid per-page extraction that parses the PDF only once.
+    Every page's text layer is read first; only pages without usable text
+    (fewer than MIN_PAGE_TEXT_CHARS characters) are rasterized and OCRed.
+    Returns a list of dicts (page, method, text, error, seconds) in page order,
+    where method is "text" or "ocr" and seconds covers both attempts.
+    """
+    min_text_chars = MIN_PAGE_TEXT_CHARS if min_text_chars is None else min_text_chars
+    reader = PdfReader(file_path)
+    pages = []
+    for number, page in enumerate(reader.pages, start=1):
+        start = time.perf_counter()
+        error = None
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:
+            text, error = "", str(e)
+        observe_stage("text_layer", time.perf_counter() - start, error is not None)
+        pages.append(
+            {
+                "page": number,
+                "method": "text",
+                "text": text,
+                "error": error,
+                "seconds": time.perf_counter() - start,
+            }
+        )
+
+    ocr_pages = [p["page"] for p in pages if len(p["text"].strip()) < min_text_chars]
+    if ocr_pages:
+        print(f"Pages without a usable text layer, sending to OCR: {ocr_pages}")
+        for result in ocr_pdf_pages(
+            file_path, dpi=dpi, pages=ocr_pages, max_workers=max_workers
+        ):
+            page = pages[result["page"] - 1]
+            page.update(
+                method="ocr",
+                text=result["text"],
+                error=result["error"],
+                seconds=page["seconds"] + result["seconds"],
+            )
+    return pages
+
+
+def worker_mp_context():
+    """
+    Multiprocessing context for worker pools: forkserver (spawn where it is
+    unavailable), so workers are never forked from a multi-threaded process.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+_ocr_pool = None
+_ocr_pool_pid = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """
+    Return the process-wide OCR process pool (OCR_WORKERS processes), creating
+    it on first use. Its workers are started through worker_mp_context, and a
+    pool inherited through fork is not reused.
+    """
+    global _ocr_pool, _ocr_pool_pid
+    with _ocr_pool_lock:
+        if _ocr_pool is None or _ocr_pool_pid != os.getpid():
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS, mp_context=worker_mp_context()
+            )
+            _ocr_pool_pid = os.getpid()
+        return _ocr_pool
+
+
+def _discard_ocr_pool(pool):
+    """Drop a broken OCR pool so the next document starts a fresh one."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is pool:
+            _ocr_pool = None
+    pool.shutdown(wait=False)
+
+
 def perform_ocr_on_image(image):
     """
     Perform OCR on a preprocessed image using pytesseract.
     """
+    import pytesseract
+
     text = pytesseract.image_to_string(image)
     return text
 
 
-def perform_ocr_on_images(images):
+def _ocr_page(args):
     """
-    Perform OCR on a list of images.
-    Returns a list of text strings, one for each image.
+    Worker entry point for the OCR process pool.
+    Returns a (page_index, text, error, seconds) tuple so failures stay attached to their page.
     """
-    ocr_results = []
-    for idx, image in enumerate(images):
+    idx, image = args
+    start = time.perf_counter()
+    try:
         text = perform_ocr_on_image(image)
-        ocr_results.append(text)
-        print(f"OCR on page {idx+1} completed.")
-    return ocr_results
+        return idx, text, None, time.perf_counter() - start
+    except Exception as e:
+        return idx, "", str(e), time.perf_counter() - start
+
+
+def _page_result(result):
+    """
+    Turn an _ocr_page tuple into the per-page result dict and log its outcome.
+    """
+    idx, text, error, seconds = result
+    page = idx + 1
+    # OCR runs in worker processes, so its timing is recorded here in the parent.
+    observe_stage("ocr_page", seconds, error is not None)
+    if error:
+        print(f"OCR on page {page} failed: {error}")
+    else:
+        print(f"OCR on page {page} completed in {seconds:.2f}s.")
+    return {"page": page, "text": text, "error": error, "seconds": seconds}
+
+
+def perform_ocr_on_images_parallel(images, max_workers=None):
+    """
+    Perform OCR on a list of images using the shared OCR process pool
+    (see get_ocr_pool); max_workers=1 runs in this process.
+    Returns a list of dicts (page, text, error, seconds) in page order.
+    A failing page is reported through its "error" field and does not abort the others.
+    """
+    images = list(images)
+    workers = min(max_workers or OCR_WORKERS, len(images))
+    if workers <= 1:
+        results = [_ocr_page(args) for args in enumerate(images)]
+    else:
+        executor = get_ocr_pool()
+        try:
+            results = list(executor.map(_ocr_page, enumerate(images)))
+        except BrokenProcessPool:
+            _discard_ocr_pool(executor)
+            raise
+    return [_page_result(result) for result in results]
+
+
+def _ocr_window(image, workers, max_memory_mb):
+    """
+    Number of pages allowed in flight so that their images fit in max_memory_mb.
+    Each in-flight page is counted three times: the parent copy, the pickled
+    payload and the copy unpickled in the worker.
+    """
+    page_bytes = image.width * image.height * len(image.getbands()) * 3
+    fits = (max_memory_mb * 1024 * 1024) // max(page_bytes, 1)
+    return max(1, min(workers, fits))
+
+
+def _resolve(item):
+    """
+    Return the result tuple of a pending pipeline entry (a future or a ready tuple).
+    """
+    return item if isinstance(item, tuple) else item.result()
+
+
+def ocr_pdf_pages(file_path, dpi=300, pages=None, max_workers=None, max_memory_mb=None):
+    """
+    Streaming OCR pipeline for scanned PDFs.
+    Rasterizes, preprocesses and OCRs pages in a bounded window, yielding the
+    per-page result dicts (page, text, error, seconds) in page order. Pages are
+    OCRed on the shared OCR process pool (see get_ocr_pool), at most
+    max_workers at a time; max_workers=1 runs in this process. The window
+    is sized from OCR_MAX_MEMORY_MB so peak memory does not grow with page count.
+    """
+    workers = max_workers or OCR_WORKERS
+    max_memory_mb = max_memory_mb or OCR_MAX_MEMORY_MB
+    page_images = iter_pdf_images(file_path, dpi=dpi, pages=pages)
+
+    if workers <= 1:
+        for page_number, image, error in page_images:
+            if error:
+                yield _page_result((page_number - 1, "", error, 0.0))
+                continue
+            processed = preprocess_image(image, dpi)
+            del image
+            if processed is None:
+                print(f"Page {page_number} is blank; skipping OCR.")
+                yield _page_result((page_number - 1, "", None, 0.0))
+                continue
+            yield _page_result(_ocr_page((page_number - 1, processed)))
+        return
+
+    window = None
+    pending = deque()
+    executor = get_ocr_pool()
+    try:
+        for page_number, image, error in page_images:
+            processed = None
+            if not error:
+                processed = preprocess_image(image, dpi)
+                del image
+                if processed is None:
+                    print(f"Page {page_number} is blank; skipping OCR.")
+            if processed is None:
+                pending.append((page_number - 1, "", error, 0.0))
+            else:
+                if window is None:
+                    window = _ocr_window(processed, workers, max_memory_mb)
+                pending.append(executor.submit(_ocr_page, (page_number - 1, processed)))
+                del processed
+            while len(pending) >= (window or 1):
+                yield _page_result(_resolve(pending.popleft()))
+        while pending:
+            yield _page_result(_resolve(pending.popleft()))
+    except BrokenProcessPool:
+        _discard_ocr_pool(executor)
+        raise
+    finally:
+        # Pages of an abandoned document do not keep the shared pool busy.
+        for item in pending:
+            if not isinstance(item, tuple):
+                item.cancel()
+
+
+def perform_ocr_on_images(images, max_workers=None):
+    """
+    Perform OCR on a list of images.
+    Pages are processed in parallel (see perform_ocr_on_images_parallel).
+    Returns a list of text strings, one for each image; failed pages yield "".
+    """
+    page_results = perform_ocr_on_images_parallel(images, max_workers=max_workers)
+    return [result["text"] for result in page_results]
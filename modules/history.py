@@ -0,0 +1,128 @@
+import os
+import logging
+from dotenv import load_dotenv
+
+from modules.tokens import estimate_tokens, truncate_to_tokens, message_tokens
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Number of most recent turns (a user message and its replies) kept verbatim
+# after a fold; older turns are folded once there are twice as many.
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+# Approximate token ceiling for the messages sent to the LLM in one request.
+HISTORY_TOKEN_CEILING = int(os.getenv("HISTORY_TOKEN_CEILING", "6500"))
+# Length cap of the running summary of older turns.
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+
+SUMMARY_PREFIX = "Conversation summary: "
+
+
+def is_summary(message):
+    """Whether a message is the running conversation summary."""
+    return message.get("role") == "system" and message.get("content", "").startswith(
+        SUMMARY_PREFIX
+    )
+
+
+def split_history(history):
+    """
+    Split a conversation into (system messages, running summary, turns).
+    Each turn is a list starting with a user message followed by its replies.
+    """
+    system_messages, summary, turns = [], "", []
+    for message in history:
+        if is_summary(message):
+            summary = message["content"][len(SUMMARY_PREFIX):]
+        elif message.get("role") == "system":
+            system_messages.append(message)
+        elif message.get("role") == "user" or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return system_messages, summary, turns
+
+
+def fallback_summary(previous_summary, messages, max_tokens=None):
+    """
+    Extractive summary used when no summarizer is available or it fails:
+    the previous summary followed by the opening sentence of each folded message.
+    """
+    max_tokens = max_tokens or SUMMARY_MAX_TOKENS
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        content = " ".join(message.get("content", "").split())
+        first_sentence = content.split(". ")[0]
+        speaker = "User" if message.get("role") == "user" else "Assistant"
+        lines.append(f"{speaker}: {truncate_to_tokens(first_sentence, 40)}")
+    text = "\n".join(lines)
+    # Keep the most recent part of the summary when it grows too long.
+    while estimate_tokens(text) > max_tokens and "\n" in text:
+        text = text.split("\n", 1)[1]
+    return truncate_to_tokens(text, max_tokens)
+
+
+def _fold(summary, turns, summarizer):
+    messages = [message for turn in turns for message in turn]
+    if summarizer is not None:
+        try:
+            return summarizer(summary, messages)
+        except Exception as e:
+            logger.warning("Summarizer failed, using extractive summary: %s", e)
+    return fallback_summary(summary, messages)
+
+
+def compact_history(history, max_turns=None, token_ceiling=None, summarizer=None):
+    """
+    Bound a conversation before it is sent to the LLM.
+
+    System messages (instructions and CV context) are always kept and recent
+    turns are kept verbatim. Once there are more than 2 * max_turns turns, all
+    but the last max_turns are folded in one batch into a running
+    "Conversation summary:" system message via summarizer(previous summary,
+    messages) -> str, so the summarizer runs once every max_turns turns rather
+    than on every message. If the request would exceed token_ceiling, enough
+    further turns are folded in the same batch, and finally the summary is
+    truncated. The summarizer is called at most once, and the most recent
+    turn is never folded.
+
+    Returns the compacted list of messages.
+    """
+    max_turns = max_turns or HISTORY_MAX_TURNS
+    token_ceiling = token_ceiling or HISTORY_TOKEN_CEILING
+    system_messages, summary, turns = split_history(history)
+
+    def total():
+        messages = system_messages + [m for turn in turns for m in turn]
+        summary_tokens = estimate_tokens(SUMMARY_PREFIX + summary) + 4 if summary else 0
+        return sum(message_tokens(m) for m in messages) + summary_tokens
+
+    fold_count = len(turns) - max_turns if len(turns) > 2 * max_turns else 0
+    # Leading turns to fold so the rest fits the ceiling next to a summary of
+    # at most SUMMARY_MAX_TOKENS, counted up front so that one summarizer
+    # call covers them all.
+    turn_tokens = [sum(message_tokens(m) for m in turn) for turn in turns]
+    budget = token_ceiling - sum(message_tokens(m) for m in system_messages)
+    budget -= estimate_tokens(SUMMARY_PREFIX) + SUMMARY_MAX_TOKENS + 4
+    kept_tokens = sum(turn_tokens[fold_count:])
+    if total() > token_ceiling:
+        while kept_tokens > budget and fold_count < len(turns) - 1:
+            kept_tokens -= turn_tokens[fold_count]
+            fold_count += 1
+
+    if fold_count:
+        folded, turns = turns[:fold_count], turns[fold_count:]
+        summary = _fold(summary, folded, summarizer)
+        logger.info("Folded %d old turns into the conversation summary.", len(folded))
+
+    if summary and total() > token_ceiling:
+        available = token_ceiling - (total() - estimate_tokens(summary))
+        summary = truncate_to_tokens(summary, available) if available > 0 else ""
+
+    compacted = list(system_messages)
+    if summary:
+        compacted.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+    for turn in turns:
+        compacted.extend(turn)
+    return compacted
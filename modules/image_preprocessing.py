@@ -0,0 +1,215 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from PIL import Image
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "otsu" (one global threshold) or "adaptive" (local mean, for uneven lighting).
+OCR_BINARIZATION = os.getenv("OCR_BINARIZATION", "otsu")
+# Side of the adaptive threshold window, in pixels at 300 DPI.
+OCR_ADAPTIVE_BLOCK = int(os.getenv("OCR_ADAPTIVE_BLOCK", "41"))
+# Pages with less than this fraction of dark pixels are treated as blank.
+OCR_BLANK_INK_RATIO = float(os.getenv("OCR_BLANK_INK_RATIO", "0.001"))
+# Pages whose dark and light pixels (Otsu split) differ by less than this many
+# gray levels are treated as blank before binarization, so scanner noise on an
+# empty page is not taken for text.
+OCR_MIN_CONTRAST = float(os.getenv("OCR_MIN_CONTRAST", "48"))
+# White border kept around the text when cropping margins, in pixels at 300 DPI.
+OCR_MARGIN = int(os.getenv("OCR_MARGIN", "24"))
+# Largest skew corrected, in degrees.
+OCR_MAX_SKEW = float(os.getenv("OCR_MAX_SKEW", "5"))
+# Text line height (pixels) the page is scaled to; tesseract reads best around 30-40.
+OCR_TARGET_LINE_HEIGHT = int(os.getenv("OCR_TARGET_LINE_HEIGHT", "34"))
+# Bounds of the effective resolution the page is resampled to.
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "400"))
+
+# Ink pixels sampled for the skew estimate.
+_SKEW_SAMPLES = 20000
+# Minimum rotation worth resampling the page for, in degrees.
+_MIN_SKEW = 0.2
+
+
+def otsu_threshold(gray):
+    """
+    Otsu's global threshold of a uint8 array: the level maximizing the
+    between-class variance of the dark and light pixels.
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight = np.cumsum(hist)
+    mass = np.cumsum(hist * levels)
+    total, total_mass = weight[-1], mass[-1]
+    background = total - weight
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (total_mass * weight - total * mass) ** 2 / (weight * background)
+    variance[~np.isfinite(variance)] = 0
+    return int(np.argmax(variance))
+
+
+def otsu_contrast(gray):
+    """Difference between the mean gray levels of the two Otsu classes of a uint8 array."""
+    level = otsu_threshold(gray)
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    dark, light = hist[:level + 1], hist[level + 1:]
+    if not dark.sum() or not light.sum():
+        return 0.0
+    return float(
+        (light * levels[level + 1:]).sum() / light.sum()
+        - (dark * levels[:level + 1]).sum() / dark.sum()
+    )
+
+
+def adaptive_ink(gray, block, offset=10):
+    """
+    Pixels darker than the mean of their block x block neighbourhood by more
+    than offset, computed with an integral image.
+    """
+    half = block // 2
+    padded = np.pad(gray.astype(np.int64), half + 1, mode="edge")
+    integral = padded.cumsum(0).cumsum(1)
+    h, w = gray.shape
+    window = (
+        integral[block:block + h, block:block + w]
+        - integral[:h, block:block + w]
+        - integral[block:block + h, :w]
+        + integral[:h, :w]
+    )
+    return gray.astype(np.int64) * block * block < window - offset * block * block
+
+
+def ink_mask(gray, method=None, scale=1.0):
+    """Boolean array marking the dark (text) pixels of a grayscale page."""
+    method = method or OCR_BINARIZATION
+    if method == "adaptive":
+        return adaptive_ink(gray, max(3, int(OCR_ADAPTIVE_BLOCK * scale) | 1))
+    if gray.min() == gray.max():
+        return np.zeros(gray.shape, dtype=bool)
+    return gray <= otsu_threshold(gray)
+
+
+def despeckle(ink):
+    """
+    3x3 median filter of a binary mask (a pixel keeps ink when at least five
+    of the nine pixels around it have ink), removing isolated specks.
+    """
+    padded = np.pad(ink, 1).astype(np.uint8)
+    h, w = ink.shape
+    votes = sum(padded[dy:dy + h, dx:dx + w] for dy in range(3) for dx in range(3))
+    return votes >= 5
+
+
+def crop_box(ink, margin):
+    """(left, top, right, bottom) of the inked area grown by margin, or None if blank."""
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if not len(rows):
+        return None
+    h, w = ink.shape
+    return (
+        max(0, cols[0] - margin),
+        max(0, rows[0] - margin),
+        min(w, cols[-1] + 1 + margin),
+        min(h, rows[-1] + 1 + margin),
+    )
+
+
+def estimate_skew(ink, max_angle=None, step=0.1):
+    """
+    Skew of the text lines in degrees (counter-clockwise positive), found by
+    projecting a sample of the ink pixels onto the rows at each candidate
+    angle and keeping the angle whose row profile is sharpest.
+    """
+    max_angle = OCR_MAX_SKEW if max_angle is None else max_angle
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 2:
+        return 0.0
+    stride = max(1, len(ys) // _SKEW_SAMPLES)
+    ys, xs = ys[::stride].astype(np.float64), xs[::stride].astype(np.float64)
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    radians = np.deg2rad(angles)[:, None]
+    rows = np.rint(ys * np.cos(radians) + xs * np.sin(radians)).astype(np.int64)
+    rows -= rows.min(axis=1, keepdims=True)
+    height = int(rows.max()) + 1
+    offsets = np.arange(len(angles))[:, None] * height
+    profiles = np.bincount((rows + offsets).ravel(), minlength=len(angles) * height)
+    scores = (profiles.reshape(len(angles), height).astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[np.argmax(scores)])
+
+
+def line_height(ink):
+    """
+    Median height in pixels of the text lines (runs of rows containing ink),
+    or None when fewer than three lines are found.
+    """
+    inked = np.concatenate(([False], ink.any(axis=1), [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(inked))
+    heights = edges[1::2] - edges[::2]
+    heights = heights[heights >= 3]
+    if len(heights) < 3:
+        return None
+    return float(np.median(heights))
+
+
+def choose_dpi(dpi, height, target=None):
+    """
+    Resolution at which text lines measured height pixels tall at dpi would
+    be target pixels tall, within OCR_MIN_DPI..OCR_MAX_DPI.
+    """
+    target = target or OCR_TARGET_LINE_HEIGHT
+    if not height:
+        return dpi
+    return int(min(OCR_MAX_DPI, max(OCR_MIN_DPI, dpi * target / height)))
+
+
+def clean_page(image, dpi=300, method=None):
+    """
+    OCR preprocessing of a rasterized page: removal of blank pages (too little
+    contrast, or too little ink after binarization), binarization (Otsu or
+    adaptive) and despeckling, cropping of blank
+    margins, deskew, and resampling to the resolution at which the text lines
+    are about OCR_TARGET_LINE_HEIGHT pixels tall (see choose_dpi).
+
+    Returns (image, info) where image is the binarized "L" page, or None for
+    a blank page, and info holds the ink ratio, skew angle, line height and
+    chosen DPI.
+    """
+    scale = dpi / 300
+    gray = np.asarray(image.convert("L"))
+    info = {"ink_ratio": 0.0, "skew": 0.0, "line_height": None, "dpi": dpi}
+    # Both binarizations find "ink" in the noise of an empty page.
+    if otsu_contrast(gray) < OCR_MIN_CONTRAST:
+        return None, info
+    ink = despeckle(ink_mask(gray, method, scale))
+    info["ink_ratio"] = float(ink.mean())
+    if info["ink_ratio"] < OCR_BLANK_INK_RATIO:
+        return None, info
+
+    box = crop_box(ink, int(OCR_MARGIN * scale))
+    ink = ink[box[1]:box[3], box[0]:box[2]]
+    info["skew"] = estimate_skew(ink)
+    if abs(info["skew"]) >= _MIN_SKEW:
+        rotated = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8)).rotate(
+            -info["skew"], resample=Image.BILINEAR, expand=True, fillcolor=255
+        )
+        ink = np.asarray(rotated) < 128
+        box = crop_box(ink, int(OCR_MARGIN * scale))
+        ink = ink[box[1]:box[3], box[0]:box[2]]
+
+    info["line_height"] = line_height(ink)
+    info["dpi"] = choose_dpi(dpi, info["line_height"])
+    page = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+    if abs(info["dpi"] - dpi) > 0.1 * dpi:
+        factor = info["dpi"] / dpi
+        page = page.resize(
+            (max(1, round(page.width * factor)), max(1, round(page.height * factor))),
+            Image.LANCZOS,
+        )
+    return page, info
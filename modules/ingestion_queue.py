@@ -0,0 +1,290 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import io
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from dotenv import load_dotenv
+
+from modules.cv_parser import process_and_save_cv
+from modules.batch_ingest import BATCH_HTTP_CPU_WORKERS, ingest_batch, iter_uploaded_sources
+from modules import metrics
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Number of CVs processed concurrently by the background workers.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+# Maximum number of queued or running jobs before uploads are rejected.
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "32"))
+# Seconds a finished job stays available on /jobs/<id>.
+INGEST_JOB_TTL = int(os.getenv("INGEST_JOB_TTL", "3600"))
+# Where job state is kept: "sqlite" (shared by all workers on the host, so any
+# worker can answer /jobs/<id>) or "memory" (per process; a multi-worker
+# server then needs sticky routing of /jobs/<id> to the uploading worker).
+INGEST_JOB_BACKEND = os.getenv("INGEST_JOB_BACKEND", "sqlite")
+INGEST_JOB_DB_PATH = os.getenv(
+    "INGEST_JOB_DB_PATH", str(Path(__file__).resolve().parent / ".." / "jobs.db")
+)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its maximum depth."""
+
+
+CREATE_JOBS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    finished_at REAL
+)
+"""
+
+
+class MemoryJobStore:
+    """Job snapshots in a per-process dict."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            data = self._jobs.get(job_id)
+        return json.loads(data) if data is not None else None
+
+    def set(self, job):
+        data = json.dumps(job, default=str)
+        with self._lock:
+            self._jobs[job["id"]] = data
+
+    def prune(self, cutoff):
+        with self._lock:
+            for job_id, data in list(self._jobs.items()):
+                finished_at = json.loads(data)["finished_at"]
+                if finished_at is not None and finished_at < cutoff:
+                    del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Job snapshots in a SQLite table, shared by the workers of a host."""
+
+    def __init__(self, db_path=None):
+        self.db_path = str(db_path or INGEST_JOB_DB_PATH)
+        self._local = threading.local()
+
+    def connection(self):
+        """Return this thread's connection, creating the jobs table on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(CREATE_JOBS_TABLE_SQL)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, job_id):
+        row = self.connection().execute(
+            "SELECT data FROM ingestion_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, job):
+        self.connection().execute(
+            "INSERT OR REPLACE INTO ingestion_jobs (id, data, finished_at) VALUES (?, ?, ?)",
+            (job["id"], json.dumps(job, default=str), job["finished_at"]),
+        )
+
+    def prune(self, cutoff):
+        self.connection().execute(
+            "DELETE FROM ingestion_jobs WHERE finished_at < ?", (cutoff,)
+        )
+
+
+def make_job_store(backend=None, db_path=None):
+    """Create the job store selected by INGEST_JOB_BACKEND."""
+    backend = backend or INGEST_JOB_BACKEND
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore(db_path)
+    raise ValueError(f"Unknown INGEST_JOB_BACKEND {backend!r}; use 'sqlite' or 'memory'.")
+
+
+class IngestionQueue:
+    """
+    Background worker pool running process_and_save_cv for uploaded CVs.
+
+    Jobs move through queued -> running -> done/failed. While running, each
+    pipeline stage (save, extract, llm, db) is recorded with its status and
+    duration so clients can follow progress. The jobs of this process are
+    tracked in memory and a snapshot is written to the job store (see
+    make_job_store) on every change, so any worker can report on any job.
+    """
+
+    def __init__(self, max_workers=None, max_queue_depth=None, job_ttl=None, store=None):
+        self.max_workers = max_workers or INGEST_WORKERS
+        self.max_queue_depth = max_queue_depth or INGEST_QUEUE_DEPTH
+        self.job_ttl = INGEST_JOB_TTL if job_ttl is None else job_ttl
+        self.store = store or make_job_store()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="cv-ingest"
+        )
+        # Queued and running jobs of this process.
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def depth(self):
+        """Number of jobs that are queued or running."""
+        with self._lock:
+            return self._pending()
+
+    def _pending(self):
+        """Count queued or running jobs; the caller must hold the lock."""
+        return len(self._jobs)
+
+    def _save(self, job):
+        """Write a job's snapshot to the store; the caller must hold the lock."""
+        self.store.set(job)
+
+    def submit(self, file_bytes, filename):
+        """
+        Queue an uploaded CV for processing and return its job id.
+        Raises QueueFullError when INGEST_QUEUE_DEPTH jobs are already pending.
+        """
+        return self._enqueue(
+            filename,
+            lambda progress: process_and_save_cv(
+                io.BytesIO(file_bytes), filename, progress=progress
+            ),
+        )
+
+    def submit_batch(self, files):
+        """
+        Queue a list of (filename, bytes) uploads as a single batch ingestion job.
+        The job result is the batch summary (see batch_ingest.ingest_batch).
+        """
+        def run(progress):
+            progress("ingest")
+            return ingest_batch(
+                iter_uploaded_sources(files), cpu_workers=BATCH_HTTP_CPU_WORKERS
+            )
+
+        return self._enqueue(f"{len(files)} files", run)
+
+    def _enqueue(self, filename, task):
+        """Register a job and schedule task(progress) on the worker pool."""
+        self._prune()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._pending() >= self.max_queue_depth:
+                raise QueueFullError(
+                    f"Ingestion queue is full ({self.max_queue_depth} jobs pending)."
+                )
+            self._jobs[job_id] = {
+                "id": job_id,
+                "filename": filename,
+                "status": QUEUED,
+                "stage": None,
+                "stages": {},
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self._save(self._jobs[job_id])
+        self._executor.submit(self._run, job_id, task)
+        logger.info("Queued ingestion job %s for %s.", job_id, filename)
+        return job_id
+
+    def get(self, job_id):
+        """Return a snapshot of a job's state, or None if the id is unknown."""
+        return self.store.get(job_id)
+
+    def _progress(self, job_id, stage):
+        """Mark a pipeline stage as started and close the previous one."""
+        now = time.time()
+        with self._lock:
+            job = self._jobs[job_id]
+            self._finish_stage(job, now)
+            job["stage"] = stage
+            job["stages"][stage] = {"status": RUNNING, "started_at": now, "seconds": None}
+            self._save(job)
+
+    @staticmethod
+    def _finish_stage(job, now, status=DONE):
+        """Close the job's current stage with the given status."""
+        stage = job["stages"].get(job["stage"])
+        if stage and stage["status"] == RUNNING:
+            stage["status"] = status
+            stage["seconds"] = now - stage["started_at"]
+
+    def _run(self, job_id, task):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = RUNNING
+            job["started_at"] = time.time()
+            self._save(job)
+        try:
+            result = task(lambda stage: self._progress(job_id, stage))
+        except Exception as e:
+            logger.error("Ingestion job %s failed: %s", job_id, e)
+            with self._lock:
+                now = time.time()
+                self._finish_stage(job, now, status=FAILED)
+                job.update(status=FAILED, error=str(e), finished_at=now)
+                self._save(job)
+                del self._jobs[job_id]
+            return
+        with self._lock:
+            now = time.time()
+            self._finish_stage(job, now)
+            job.update(status=DONE, result=result, finished_at=now)
+            self._save(job)
+            del self._jobs[job_id]
+        logger.info("Ingestion job %s finished.", job_id)
+
+    def shutdown(self, wait=True):
+        """Stop accepting work and, by default, wait for running jobs to finish."""
+        self._executor.shutdown(wait=wait)
+
+    def _prune(self):
+        """Forget finished jobs older than the job TTL."""
+        self.store.prune(time.time() - self.job_ttl)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+QUEUE_DEPTH = metrics.gauge(
+    "ingestion_queue_depth", "Ingestion jobs that are queued or running."
+)
+QUEUE_DEPTH.set_function(lambda: _queue.depth() if _queue is not None else 0)
+
+
+def get_ingestion_queue():
+    """Return the process-wide ingestion queue, creating it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestionQueue()
+        return _queue
@@ -0,0 +1,202 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from dotenv import load_dotenv
+
+from modules.metrics import record_cache_lookup
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BASE_DIR = Path(__file__).resolve().parent
+# Set LLM_CACHE_ENABLED=0 to send every request to the provider.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(BASE_DIR / ".." / "llm_cache.db"))
+# Responses kept in the in-memory LRU tier.
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+# Responses kept in the on-disk tier; least recently used rows are evicted first.
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "10000"))
+# Seconds a cached response stays valid.
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Disk-tier eviction runs once every this many writes.
+_PRUNE_EVERY = 100
+
+CREATE_CACHE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+CREATE_CACHE_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_llm_responses_accessed ON llm_responses(accessed_at)"
+)
+
+
+def cache_key(model, messages, params):
+    """SHA-256 of the model, messages and request parameters in canonical JSON."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM replies: an in-memory LRU in front of a SQLite table.
+
+    Entries expire after ttl seconds. The memory tier holds max_memory_entries
+    replies; the disk tier is trimmed to max_rows least recently used rows.
+    Disk hits are promoted to the memory tier.
+    """
+
+    def __init__(self, db_path=None, max_memory_entries=None, max_rows=None, ttl=None):
+        self.db_path = str(db_path or LLM_CACHE_PATH)
+        self.max_memory_entries = (
+            LLM_CACHE_MEMORY_ENTRIES if max_memory_entries is None else max_memory_entries
+        )
+        self.max_rows = max_rows or LLM_CACHE_MAX_ROWS
+        self.ttl = ttl or LLM_CACHE_TTL
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def connection(self):
+        """Return this thread's connection, creating the cache table on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(CREATE_CACHE_TABLE_SQL)
+        conn.execute(CREATE_CACHE_INDEX_SQL)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.counters[name] += 1
+
+    def _remember(self, key, value, created_at):
+        if not self.max_memory_entries:
+            return
+        with self._lock:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached reply for key, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    record_cache_lookup("llm_response", True)
+                    return entry[0]
+                del self._memory[key]
+        try:
+            conn = self.connection()
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+        except sqlite3.Error as e:
+            logger.warning("LLM cache read failed: %s", e)
+            row = None
+        record_cache_lookup("llm_response", row is not None)
+        if row is None:
+            self._count("misses")
+            return None
+        self._remember(key, row[0], row[1])
+        self._count("hits", "disk_hits")
+        return row[0]
+
+    def set(self, key, value):
+        """Store a reply in both tiers."""
+        now = time.time()
+        self._remember(key, value, now)
+        try:
+            self.connection().execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+        except sqlite3.Error as e:
+            logger.warning("LLM cache write failed: %s", e)
+            return
+        with self._lock:
+            self.counters["stores"] += 1
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Delete expired rows and trim the disk tier to max_rows."""
+        conn = self.connection()
+        conn.execute("DELETE FROM llm_responses WHERE created_at <= ?", (time.time() - self.ttl,))
+        conn.execute(
+            "DELETE FROM llm_responses WHERE key IN ("
+            " SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+    def clear(self):
+        """Drop every cached reply."""
+        with self._lock:
+            self._memory.clear()
+        self.connection().execute("DELETE FROM llm_responses")
+
+    def stats(self):
+        """Hit/miss counters, hit rate and memory tier size."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide LLM response cache (None when disabled)."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache()
+        return _cache
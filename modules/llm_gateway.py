@@ -0,0 +1,344 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+from dotenv import load_dotenv
+
+from modules import metrics
+from modules.tokens import message_tokens
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3-70b-8192")
+# Groq-compatible endpoint to use instead of the Groq API, e.g. the local
+# fake server started with `python -m tools.fake_llm_server`.
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+# Provider quota shared by chat and ingestion. The token quota should cover the
+# largest single request (a chat turn at HISTORY_TOKEN_CEILING plus its
+# completion, about 7000 tokens by default); larger requests are admitted as
+# if they used the whole bucket.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "8000"))
+# Maximum number of LLM requests in flight across all threads and event loops.
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+# Size of the shared HTTP connection pool.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Attempts made when the provider answers 429 Too Many Requests.
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+# Completion tokens assumed for a request that does not set max_tokens.
+DEFAULT_COMPLETION_TOKENS = 512
+
+LLM_REQUESTS = metrics.counter(
+    "llm_requests_total", "LLM provider requests by call type and outcome.", ["call", "outcome"]
+)
+LLM_TOKENS = metrics.counter(
+    "llm_tokens_total", "Tokens reported by the LLM provider.", ["kind"]
+)
+LLM_PROMPT_TOKENS = metrics.histogram(
+    "llm_prompt_tokens",
+    "Estimated prompt size of LLM requests.",
+    ["call"],
+    buckets=metrics.TOKEN_BUCKETS,
+)
+LLM_IN_FLIGHT = metrics.gauge("llm_in_flight_requests", "LLM requests currently in flight.")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    reserve() takes the requested amount immediately (the level may go
+    negative) and returns how long the caller must wait before using it, so
+    waiting callers are served in arrival order without spinning.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.level = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        """Take amount from the bucket; returns the seconds to wait before proceeding."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self.level -= amount
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def adjust(self, amount):
+        """Give back (positive) or take (negative) tokens once the real usage is known."""
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class LLMGateway:
+    """
+    Single entry point to the LLM provider for chat and ingestion.
+
+    Sync and async calls share one pooled HTTP connection pool per client,
+    one bounded in-flight limit and request/token buckets sized to the
+    provider's per-minute quota, and 429 responses are retried with backoff.
+    Clients are created on first use.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        async_client=None,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_in_flight=None,
+        base_url=None,
+    ):
+        self.base_url = base_url or LLM_BASE_URL
+        self._client = client
+        self._async_client = async_client
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._client_lock = threading.Lock()
+        self.requests = TokenBucket(requests_per_minute or LLM_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(tokens_per_minute or LLM_TOKENS_PER_MINUTE)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight or LLM_MAX_IN_FLIGHT)
+
+    # -- clients --------------------------------------------------------------
+
+    def _api_key(self):
+        api_key = os.environ.get("GROQ_API_KEY")
+        if not api_key:
+            if self.base_url:
+                # Local Groq-compatible servers do not check the key.
+                return "unused"
+            raise ValueError("GROQ_API_KEY is not set in the environment.")
+        return api_key
+
+    @staticmethod
+    def _limits():
+        import httpx
+
+        return httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        )
+
+    @property
+    def client(self):
+        """Synchronous Groq client over a shared keep-alive connection pool."""
+        with self._client_lock:
+            if self._client is None:
+                # The Groq SDK is imported with the first client, not at startup.
+                import httpx
+                from groq import Groq
+
+                self._client = Groq(
+                    api_key=self._api_key(),
+                    base_url=self.base_url,
+                    max_retries=0,
+                    http_client=httpx.Client(limits=self._limits(), timeout=LLM_TIMEOUT),
+                )
+            return self._client
+
+    @property
+    def async_client(self):
+        """
+        Async Groq client for the running event loop. httpx async pools are
+        bound to the loop that created them, so there is one client per loop.
+        """
+        if self._async_client is not None:
+            return self._async_client
+        loop = asyncio.get_running_loop()
+        with self._client_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                import httpx
+                from groq import AsyncGroq
+
+                client = self._async_clients[loop] = AsyncGroq(
+                    api_key=self._api_key(),
+                    base_url=self.base_url,
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(
+                        limits=self._limits(), timeout=LLM_TIMEOUT
+                    ),
+                )
+            return client
+
+    # -- admission control ----------------------------------------------------
+
+    def _estimate(self, messages, params, call):
+        """
+        Estimated tokens of a request, capped at the token bucket's capacity
+        so that a request larger than the whole per-minute quota still gets
+        admitted once the bucket is full instead of waiting forever.
+        """
+        prompt_tokens = sum(message_tokens(m) for m in messages)
+        LLM_PROMPT_TOKENS.observe(prompt_tokens, call=call)
+        estimated = prompt_tokens + params.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+        if estimated > self.tokens.capacity:
+            logger.warning(
+                "LLM request of ~%d tokens exceeds LLM_TOKENS_PER_MINUTE (%d); "
+                "admitting it against a full bucket.",
+                estimated,
+                self.tokens.capacity,
+            )
+            return self.tokens.capacity
+        return estimated
+
+    def _reserve(self, estimated_tokens):
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def _settle(self, response, estimated_tokens):
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.tokens.adjust(estimated_tokens - usage.total_tokens)
+            LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+            LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+
+    @staticmethod
+    def _backoff(error, attempt):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        return min(retry_after if retry_after is not None else 2**attempt, 30.0)
+
+    @contextmanager
+    def _slot(self, estimated_tokens):
+        with metrics.span("llm_admission"):
+            self.in_flight.acquire()
+        LLM_IN_FLIGHT.inc()
+        try:
+            delay = self._reserve(estimated_tokens)
+            if delay:
+                logger.info("LLM rate limit: waiting %.2fs.", delay)
+                with metrics.span("llm_rate_limit_wait"):
+                    time.sleep(delay)
+            yield
+        finally:
+            LLM_IN_FLIGHT.inc(-1)
+            self.in_flight.release()
+
+    @asynccontextmanager
+    async def _aslot(self, estimated_tokens):
+        # The semaphore is shared with synchronous callers, so poll it
+        # instead of blocking the event loop.
+        with metrics.span("llm_admission"):
+            while not self.in_flight.acquire(blocking=False):
+                await asyncio.sleep(0.01)
+        LLM_IN_FLIGHT.inc()
+        try:
+            delay = self._reserve(estimated_tokens)
+            if delay:
+                logger.info("LLM rate limit: waiting %.2fs.", delay)
+                with metrics.span("llm_rate_limit_wait"):
+                    await asyncio.sleep(delay)
+            yield
+        finally:
+            LLM_IN_FLIGHT.inc(-1)
+            self.in_flight.release()
+
+    # -- calls ----------------------------------------------------------------
+
+    def complete(self, messages, model=None, **params):
+        """Create a chat completion (blocking) and return the provider response."""
+        from groq import RateLimitError
+
+        params.setdefault("temperature", 0)
+        estimated = self._estimate(messages, params, "complete")
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            try:
+                with self._slot(estimated), metrics.span("llm_request"):
+                    response = self.client.chat.completions.create(
+                        model=model or LLM_MODEL, messages=messages, **params
+                    )
+                self._settle(response, estimated)
+                LLM_REQUESTS.inc(call="complete", outcome="ok")
+                return response
+            except RateLimitError as e:
+                LLM_REQUESTS.inc(call="complete", outcome="rate_limited")
+                if attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+                delay = self._backoff(e, attempt)
+                logger.warning("LLM returned 429; retrying in %.1fs.", delay)
+                time.sleep(delay)
+            except Exception:
+                LLM_REQUESTS.inc(call="complete", outcome="error")
+                raise
+
+    async def acomplete(self, messages, model=None, **params):
+        """Create a chat completion from a coroutine and return the provider response."""
+        from groq import RateLimitError
+
+        params.setdefault("temperature", 0)
+        estimated = self._estimate(messages, params, "acomplete")
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            try:
+                async with self._aslot(estimated):
+                    with metrics.span("llm_request"):
+                        response = await self.async_client.chat.completions.create(
+                            model=model or LLM_MODEL, messages=messages, **params
+                        )
+                self._settle(response, estimated)
+                LLM_REQUESTS.inc(call="acomplete", outcome="ok")
+                return response
+            except RateLimitError as e:
+                LLM_REQUESTS.inc(call="acomplete", outcome="rate_limited")
+                if attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+                delay = self._backoff(e, attempt)
+                logger.warning("LLM returned 429; retrying in %.1fs.", delay)
+                await asyncio.sleep(delay)
+            except Exception:
+                LLM_REQUESTS.inc(call="acomplete", outcome="error")
+                raise
+
+    def stream(self, messages, model=None, **params):
+        """
+        Stream a chat completion, yielding the provider's chunks.
+        The in-flight slot is held until the stream is exhausted or closed.
+        """
+        params.setdefault("temperature", 0)
+        with self._slot(self._estimate(messages, params, "stream")):
+            try:
+                with metrics.span("llm_stream"):
+                    yield from self.client.chat.completions.create(
+                        model=model or LLM_MODEL, messages=messages, stream=True, **params
+                    )
+            except Exception:
+                LLM_REQUESTS.inc(call="stream", outcome="error")
+                raise
+            LLM_REQUESTS.inc(call="stream", outcome="ok")
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Return the process-wide LLM gateway, creating it on first use."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
@@ -1,10 +1,18 @@
 import os
 import json
+import time
+import random
 import logging
-from flask import session
-from groq import Groq
+import threading
+from flask import g, session
 from dotenv import load_dotenv
 
+from modules.tokens import estimate_tokens, truncate_to_tokens
+from modules.history import compact_history, is_summary, SUMMARY_MAX_TOKENS
+from modules.llm_gateway import LLM_MODEL, get_gateway
+from modules.llm_cache import cache_key, get_response_cache
+from modules import metrics
+
 load_dotenv()
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -14,21 +22,58 @@ formatter = logging.Formatter("%(asctime)s %(levelname)s: %(message)s")
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
-# Load the API key from the environment variable.
-groq_api = os.environ.get("GROQ_API_KEY")
-if not groq_api:
-    raise ValueError("GROQ_API_KEY is not set in the environment.")
+# All LLM calls go through the shared gateway (see llm_gateway.LLMGateway),
+# which owns the Groq clients, the connection pool and the rate limits.
+# Deterministic (temperature 0) replies are cached by llm_cache; every entry
+# point takes use_cache=False to go to the provider regardless. JSON replies
+# requested with store=False are only cached by the caller once they validate
+# (see store_LLM_response).
+
+SYSTEM_PROMPT = "your goal is to help the user about cvs query"
+CV_CONTEXT_PREFIX = "CV Context: "
+
 
-# Initialize the Groq client with the API key.
-client = Groq(api_key=groq_api)
+def _cache_lookup(messages, params, use_cache):
+    """Return (cache, key, cached reply) for a request; cache is None if not cacheable."""
+    cache = get_response_cache() if use_cache else None
+    if cache is None or params.get("temperature", 0) != 0:
+        return None, None, None
+    key = cache_key(LLM_MODEL, messages, params)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("Served LLM response from cache.")
+    return cache, key, cached
 
 
-def get_LLM_response(message):
+def _complete(messages, use_cache=True, store=True, **params):
     """
-    Interact with the LLM model and get a response.
-    Access the response using attribute notation.
+    Chat completion through the response cache and the gateway; returns the
+    reply text. With store=False the reply is not written to the cache.
     """
-    messages = [
+    cache, key, cached = _cache_lookup(messages, params, use_cache)
+    if cached is not None:
+        return cached
+    response = get_gateway().complete(messages, **params)
+    content = response.choices[0].message.content
+    if cache is not None and store and content:
+        cache.set(key, content)
+    return content
+
+
+async def _acomplete(messages, use_cache=True, store=True, **params):
+    """Async variant of _complete."""
+    cache, key, cached = _cache_lookup(messages, params, use_cache)
+    if cached is not None:
+        return cached
+    response = await get_gateway().acomplete(messages, **params)
+    content = response.choices[0].message.content
+    if cache is not None and store and content:
+        cache.set(key, content)
+    return content
+
+
+def _json_messages(message):
+    return [
         {
             "role": "system",
             "content": "your response should only be in JSON format without any headers",
@@ -39,35 +84,72 @@ def get_LLM_response(message):
         },
     ]
 
+
+_JSON_PARAMS = {"response_format": {"type": "json_object"}}
+
+
+def get_LLM_response(message, use_cache=True, store=True):
+    """
+    Interact with the LLM model and get a response.
+    Access the response using attribute notation.
+    With store=False the reply is not cached (see store_LLM_response).
+    """
     logger.info("Sending message to LLM.")
 
     try:
-        # Call the Groq client; note we access attributes, not dictionary keys.
-        response = client.chat.completions.create(
-            model="llama3-70b-8192", messages=messages, temperature=0
+        content = _complete(
+            _json_messages(message), use_cache=use_cache, store=store, **_JSON_PARAMS
         )
         logger.info("Received response from LLM.")
-        # Use attribute access to get the content from the first choice.
-        return response.choices[0].message.content
+        return content
     except Exception as e:
         logger.error("Error calling LLM: %s", e)
         raise e
 
 
-def get_llm_response_from_history(message):
+async def aget_LLM_response(message, use_cache=True, store=True):
+    """Async variant of get_LLM_response."""
+    logger.info("Sending message to LLM.")
+
+    try:
+        content = await _acomplete(
+            _json_messages(message), use_cache=use_cache, store=store, **_JSON_PARAMS
+        )
+        logger.info("Received response from LLM.")
+        return content
+    except Exception as e:
+        logger.error("Error calling LLM: %s", e)
+        raise e
+
+
+def store_LLM_response(message, content):
+    """Cache content as the reply to get_LLM_response(message), replacing any entry."""
+    cache = get_response_cache()
+    if cache is not None and content:
+        cache.set(cache_key(LLM_MODEL, _json_messages(message), _JSON_PARAMS), content)
+
+
+def _stored_turns(history):
+    """The part of a conversation kept in the session: the summary and the turns."""
+    return [m for m in history if m.get("role") != "system" or is_summary(m)]
+
+
+def _history_with_message(message):
     """
-    Interact with the LLM model using conversation history stored in the session.
+    Build the messages for a chat request: the system prompt, the CV context
+    selected for this request (g.cv_context, see chatbot.prepare_conversation),
+    the session's summary and turns, and the user's message, compacted (see
+    history.compact_history).
     """
-    # Load conversation history from session or initialize if absent.
-    conversation_history = session.get(
-        "conversation_history",
-        [
-            {
-                "role": "system",
-                "content": "your goal is to help the user about cvs query",
-            }
-        ],
-    )
+    conversation_history = [{"role": "system", "content": SYSTEM_PROMPT}]
+    cv_context = g.get("cv_context")
+    if cv_context:
+        conversation_history.append(
+            {"role": "system", "content": CV_CONTEXT_PREFIX + cv_context}
+        )
+    # The session holds only the summary and turns; system messages stored by
+    # older versions are dropped.
+    conversation_history.extend(_stored_turns(session.get("conversation_history", [])))
 
     # Append the user's message.
     conversation_history.append(
@@ -76,161 +158,515 @@ def get_llm_response_from_history(message):
             "content": message,
         }
     )
+    # Keep the last turns verbatim and fold older ones into a running summary.
+    conversation_history = compact_history(
+        conversation_history, summarizer=summarize_conversation
+    )
 
     logger.info(
-        "Sending message to LLM with history (%d messages).", len(conversation_history)
+        "Sending message to LLM with history (%d messages, ~%d tokens).",
+        len(conversation_history),
+        sum(estimate_tokens(m.get("content", "")) for m in conversation_history),
     )
+    return conversation_history
+
+
+def _save_reply(conversation_history, assistant_reply):
+    """Append the assistant's reply and store the summary and turns in the session."""
+    conversation_history.append(
+        {
+            "role": "assistant",
+            "content": assistant_reply,
+        }
+    )
+    session["conversation_history"] = _stored_turns(conversation_history)
+    session.modified = True
+
+
+def get_llm_response_from_history(message, use_cache=True):
+    """
+    Interact with the LLM model using conversation history stored in the session.
+    """
+    conversation_history = _history_with_message(message)
 
     try:
-        # Call your LLM client using the full conversation history.
-        response = client.chat.completions.create(
-            model="llama3-70b-8192", messages=conversation_history, temperature=0
-        )
+        assistant_reply = _complete(conversation_history, use_cache=use_cache)
         logger.info("Received response from LLM.")
 
-        # Extract the assistant's reply.
-        assistant_reply = response.choices[0].message.content
+        # Save the reply and the updated conversation history to the session.
+        _save_reply(conversation_history, assistant_reply)
+        return assistant_reply
+    except Exception as e:
+        logger.error("Error calling LLM: %s", e)
+        raise e
 
-        # Append the assistant's reply to the conversation history.
-        conversation_history.append(
-            {
-                "role": "assistant",
-                "content": assistant_reply,
-            }
-        )
 
-        # Save the updated conversation history back to the session.
-        session["conversation_history"] = conversation_history
-        session.modified = True
+async def aget_llm_response_from_history(message, use_cache=True):
+    """
+    Async variant of get_llm_response_from_history; must run inside a request
+    context so the session is available.
+    """
+    conversation_history = _history_with_message(message)
+
+    try:
+        assistant_reply = await _acomplete(conversation_history, use_cache=use_cache)
+        logger.info("Received response from LLM.")
+        _save_reply(conversation_history, assistant_reply)
         return assistant_reply
     except Exception as e:
         logger.error("Error calling LLM: %s", e)
         raise e
 
 
-def build_aggregated_cv_prompt(cv_records, additional_instructions=None):
+def stream_llm_response_from_history(message, use_cache=True):
+    """
+    Streaming variant of get_llm_response_from_history.
+    Yields the assistant's reply piece by piece as the LLM produces it; once
+    the stream is complete the full reply is saved to the session history.
+    A cached reply is yielded in one piece.
+    """
+    conversation_history = _history_with_message(message)
+
+    try:
+        cache, key, cached = _cache_lookup(conversation_history, {}, use_cache)
+        if cached is not None:
+            yield cached
+            _save_reply(conversation_history, cached)
+            return
+        parts = []
+        for chunk in get_gateway().stream(conversation_history):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        logger.info("Received streamed response from LLM.")
+        assistant_reply = "".join(parts)
+        if cache is not None and assistant_reply:
+            cache.set(key, assistant_reply)
+        _save_reply(conversation_history, assistant_reply)
+    except Exception as e:
+        logger.error("Error calling LLM: %s", e)
+        raise e
+
+
+def summarize_conversation(previous_summary, messages):
+    """
+    Fold older chat messages into the running conversation summary using the LLM.
+    """
+    transcript = "\n".join(
+        f"{m.get('role', 'user').capitalize()}: {m.get('content', '')}" for m in messages
+    )
+    prompt = (
+        "Update the summary of a conversation between a recruiter and a CV assistant. "
+        f"Keep candidate names, requirements and conclusions; use at most {SUMMARY_MAX_TOKENS // 2} words.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        f"New messages:\n{transcript}\n\n"
+        "Updated summary:"
+    )
+    summary = _complete([{"role": "user", "content": prompt}], max_tokens=SUMMARY_MAX_TOKENS)
+    return truncate_to_tokens(summary.strip(), SUMMARY_MAX_TOKENS)
+
+
+AGGREGATED_PROMPT_HEADER = [
+    "You are an expert data assistant with full access to a CSV file containing detailed information about candidates. The CSV includes fields such as candidate names, skills, education levels, work experiences, industries, and any other relevant job-related attributes.",
+    "",
+    "Your Task:",
+    "Analyze the CSV and answer queries clearly and directly.",
+    "",
+    "Instructions:",
+    "- Parse the CSV to extract candidate details.",
+    "- For skill queries (e.g., 'Who has Python?'), list candidates with and without the skill.",
+    "- For education queries, compare candidates’ education (degrees, institutions, etc.).",
+    "- For industry queries, list candidates with relevant experience.",
+    "- For job matching, identify candidates meeting specified skills, education, and experience.",
+    "",
+    "Response Format:",
+    "- Start with a brief summary.",
+    "- Use bullet points or subheadings for clarity.",
+    "- Keep responses concise and well-structured.",
+    "",
+    "The following are aggregated CV details from various candidates:",
+]
+
+# (label, record key) pairs rendered for each CV, in order.
+CV_BLOCK_FIELDS = [
+    ("Personal", "personal_information"),
+    ("Education", "education_history"),
+    ("Experience", "work_experience"),
+    ("Skills", "skills"),
+    ("Certifications", "certifications"),
+    ("Projects", "projects"),
+]
+_EMPTY_VALUES = {"", "not mentioned", "none", "n/a", "null", "[]", "{}"}
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and value.strip().lower() in _EMPTY_VALUES)
+
+
+def _date_span(item):
+    start = item.get("start_date") or item.get("issue_date")
+    end = item.get("end_date") or item.get("expiration_date")
+    dates = [d[:7] for d in (start, end) if not _is_empty(d)]
+    return f" ({'–'.join(dates)})" if dates else ""
+
+
+def _render_item(item, include_descriptions=True):
+    """Render one JSON entry (a job, degree, certification...) on a single line."""
+    if not isinstance(item, dict):
+        return "" if _is_empty(item) else str(item).strip()
+    head = [
+        item.get(key)
+        for key in ("title", "degree", "name")
+        if not _is_empty(item.get(key))
+    ]
+    place = [
+        item.get(key)
+        for key in ("company", "institution", "issuing_organization")
+        if not _is_empty(item.get(key))
+    ]
+    text = ", ".join(str(part) for part in head)
+    if place:
+        text += (" @ " if text else "") + ", ".join(str(part) for part in place)
+    text += _date_span(item)
+    description = item.get("description")
+    if include_descriptions and not _is_empty(description):
+        text += f": {' '.join(str(description).split())}"
+    return text
+
+
+def render_cv_field(value, include_descriptions=True):
+    """
+    Render a CV record field compactly: lists of strings are comma-separated,
+    lists of entries become "; "-separated one-liners, whitespace is collapsed,
+    and empty or "not mentioned" values give "".
+    """
+    if _is_empty(value):
+        return ""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return " ".join(value.split())
+    if isinstance(value, list):
+        parts = [_render_item(item, include_descriptions) for item in value]
+        separator = "; " if any(isinstance(item, dict) for item in value) else ", "
+        return separator.join(part for part in parts if part)
+    if isinstance(value, dict):
+        return _render_item(value, include_descriptions)
+    return "" if _is_empty(value) else " ".join(str(value).split())
+
+
+def render_cv_body(record, max_field_tokens=None):
+    """
+    Render the fields of one CV as compact "Label: value" lines, dropping empty fields.
+    With max_field_tokens, job/degree descriptions are left out and each
+    field is truncated to that many tokens.
+    """
+    include_descriptions = max_field_tokens is None
+    lines = []
+    for label, key in CV_BLOCK_FIELDS:
+        text = render_cv_field(record.get(key), include_descriptions)
+        if not text:
+            continue
+        if max_field_tokens is not None:
+            text = truncate_to_tokens(text, max_field_tokens)
+        lines.append(f"{label}: {text}")
+    return "\n".join(lines)
+
+
+def render_cv_block(record, number, max_field_tokens=None, body=None):
+    """
+    Render one CV as a compact block headed "--- CV <number> ---".
+    A pre-rendered full body (see render_cv_body) can be passed to skip rendering.
+    """
+    if body is None or max_field_tokens is not None:
+        body = render_cv_body(record, max_field_tokens)
+    return f"--- CV {number} ---\n{body}"
+
+
+def build_cv_context(
+    cv_records, additional_instructions=None, token_budget=None, rendered_bodies=None
+):
+    """
+    Build the aggregated CV prompt and report its token usage.
+
+    The instructions are emitted once, followed by one compact block per CV.
+    With token_budget, CVs whose block exceeds an equal share of the budget
+    are re-rendered without descriptions and with truncated fields.
+    rendered_bodies optionally maps record ids to cached render_cv_body output.
+
+    Returns:
+      tuple: (prompt, stats) where stats has "total_tokens" and "per_cv",
+        a list of {"id", "tokens"} dicts in prompt order.
+    """
+    prompt_lines = list(AGGREGATED_PROMPT_HEADER)
+    header_tokens = estimate_tokens("\n".join(prompt_lines + [additional_instructions or ""]))
+    share = None
+    if token_budget and cv_records:
+        share = max(16, (token_budget - header_tokens) // len(cv_records))
+
+    rendered_bodies = rendered_bodies or {}
+    per_cv = []
+    for idx, record in enumerate(cv_records, start=1):
+        block = render_cv_block(record, idx, body=rendered_bodies.get(record.get("id")))
+        tokens = estimate_tokens(block)
+        if share is not None and tokens > share:
+            fields = max(1, sum(1 for _, key in CV_BLOCK_FIELDS if not _is_empty(record.get(key))))
+            block = render_cv_block(record, idx, max_field_tokens=max(4, share // fields - 2))
+            tokens = estimate_tokens(block)
+        prompt_lines.append(block)
+        per_cv.append({"id": record.get("id"), "tokens": tokens})
+
+    if additional_instructions:
+        prompt_lines.append("")
+        prompt_lines.append(additional_instructions)
+
+    prompt = "\n".join(prompt_lines)
+    stats = {"total_tokens": estimate_tokens(prompt), "per_cv": per_cv}
+    CONTEXT_TOKENS.observe(stats["total_tokens"])
+    logger.info(
+        "Built CV context: %d CVs, ~%d tokens (per CV: %s).",
+        len(per_cv),
+        stats["total_tokens"],
+        ", ".join(str(item["tokens"]) for item in per_cv),
+    )
+    return prompt, stats
+
+
+def build_aggregated_cv_prompt(
+    cv_records, additional_instructions=None, token_budget=None, rendered_bodies=None
+):
     """
     Build a prompt that integrates multiple CV records and instructs the LLM to respond to queries about them.
 
     The prompt includes:
-      - A summary of each CV with key details (personal information, education, work experience, skills, certifications).
-      - Instructions for the LLM to answer queries such as:
+      - Instructions (emitted once) for the LLM to answer queries such as:
           * Finding candidates with specific skills
           * Comparing education levels
           * Searching for experience in specific industries
           * Identifying matching candidates for job requirements
+      - A compact summary of each CV with key details (personal information, education,
+        work experience, skills, certifications), leaving out empty fields.
 
     Parameters:
       cv_records (list of dict): List of CV records, each containing keys like
         'personal_information', 'education_history', 'work_experience', 'skills', 'certifications'.
       additional_instructions (str, optional): Any extra instructions to append to the prompt.
+      token_budget (int, optional): Approximate token limit for the whole prompt
+        (see build_cv_context).
+      rendered_bodies (dict, optional): Cached per-CV bodies keyed by record id.
 
     Returns:
       str: The aggregated prompt.
     """
-    prompt_lines = []
-    prompt_lines.append(
-        "You are an expert data assistant with full access to a CSV file containing detailed information about candidates. The CSV includes fields such as candidate names, skills, education levels, work experiences, industries, and any other relevant job-related attributes."
-    )
-    prompt_lines.append("")
-    prompt_lines.append(
-        "The following are aggregated CV details from various candidates:\n"
+    prompt, _ = build_cv_context(
+        cv_records, additional_instructions, token_budget, rendered_bodies
     )
+    return prompt
 
-    for idx, record in enumerate(cv_records, start=1):
-        prompt_lines.append(f"--- CV {idx} ---")
-        prompt_lines.append(
-            f"Personal Information: {record.get('personal_information', 'not mentioned')}"
-        )
-        prompt_lines.append(
-            f"Education History: {record.get('education_history', 'not mentioned')}"
-        )
-        prompt_lines.append(
-            f"Work Experience: {record.get('work_experience', 'not mentioned')}"
-        )
-        prompt_lines.append(f"Skills: {record.get('skills', 'not mentioned')}")
-        prompt_lines.append(
-            f"Certifications: {record.get('certifications', 'not mentioned')}"
-        )
-        prompt_lines.append("")
 
-        prompt_lines.append("Your Task:")
-        prompt_lines.append("Analyze the CSV and answer queries clearly and directly.")
-        prompt_lines.append("")
-        prompt_lines.append("Instructions:")
-        prompt_lines.append("- Parse the CSV to extract candidate details.")
-        prompt_lines.append(
-            "- For skill queries (e.g., 'Who has Python?'), list candidates with and without the skill."
-        )
-        prompt_lines.append(
-            "- For education queries, compare candidates’ education (degrees, institutions, etc.)."
-        )
-        prompt_lines.append(
-            "- For industry queries, list candidates with relevant experience."
-        )
-        prompt_lines.append(
-            "- For job matching, identify candidates meeting specified skills, education, and experience."
-        )
-        prompt_lines.append("")
-        prompt_lines.append("Response Format:")
-        prompt_lines.append("- Start with a brief summary.")
-        prompt_lines.append("- Use bullet points or subheadings for clarity.")
-        prompt_lines.append("- Keep responses concise and well-structured.")
+# Sections every structured CV must contain, with the shape asked of the LLM.
+CV_SECTIONS = {
+    "Name": "String",
+    "Contact Information": 'Object with keys: "email", "phone", "address"',
+    "Professional Summary": "String",
+    "Experience": 'Array of objects with keys: "title", "company", "start_date", "end_date", "description"',
+    "Education": 'Array of objects with keys: "degree", "institution", "start_date", "end_date", "description"',
+    "Skills": "Array of strings",
+    "Certifications": 'Array of objects with keys: "name", "issuing_organization", "issue_date", "expiration_date"',
+    "Languages": "Array of strings",
+}
+
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+
+# How often each recovery strategy was used and the prompt tokens it saved
+# compared with resending the full prompt.
+_retry_metrics = {
+    strategy: {"count": 0, "tokens_saved": 0, "seconds": 0.0}
+    for strategy in ("salvage", "repair", "full_retry", "backoff")
+}
+_retry_metrics_lock = threading.Lock()
+RETRY_RECOVERIES = metrics.counter(
+    "llm_retry_recoveries_total",
+    "Recovery strategies used by retry_llm_response.",
+    ["strategy"],
+)
+RETRY_TOKENS_SAVED = metrics.counter(
+    "llm_retry_tokens_saved_total",
+    "Prompt tokens saved by each recovery strategy versus resending the full prompt.",
+    ["strategy"],
+)
+CONTEXT_TOKENS = metrics.histogram(
+    "cv_context_prompt_tokens",
+    "Estimated size of the aggregated CV context prompt.",
+    buckets=metrics.TOKEN_BUCKETS,
+)
+
+
+def _record_retry(strategy, tokens_saved=0, seconds=0.0):
+    with _retry_metrics_lock:
+        stats = _retry_metrics[strategy]
+        stats["count"] += 1
+        stats["tokens_saved"] += tokens_saved
+        stats["seconds"] += seconds
+    RETRY_RECOVERIES.inc(strategy=strategy)
+    RETRY_TOKENS_SAVED.inc(tokens_saved, strategy=strategy)
+
+
+def get_retry_metrics():
+    """Return a snapshot of the retry_llm_response recovery counters."""
+    with _retry_metrics_lock:
+        return {strategy: dict(stats) for strategy, stats in _retry_metrics.items()}
+
+
+def transient_llm_errors():
+    """
+    Failures worth waiting out before the next attempt (network, timeouts,
+    5xx, 429). The Groq SDK is imported here rather than at module load.
+    """
+    from groq import APIConnectionError, InternalServerError, RateLimitError
 
-    if additional_instructions:
-        prompt_lines.append("")
-        prompt_lines.append(additional_instructions)
+    return (APIConnectionError, InternalServerError, RateLimitError)
+
+
+def _backoff_delay(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2**attempt))
+
+
+def parse_llm_json(response_text):
+    """
+    Parse an LLM reply as a JSON object.
+    Returns (obj, salvaged) where salvaged is True when the object had to be
+    cut out of surrounding text or code fences; obj is None if nothing parses.
+    """
+    try:
+        obj = json.loads(response_text)
+        return (obj, False) if isinstance(obj, dict) else (None, False)
+    except (TypeError, json.JSONDecodeError):
+        pass
+    text = response_text or ""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None, False
+    try:
+        obj = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return None, False
+    return (obj, True) if isinstance(obj, dict) else (None, False)
 
-    return "\n".join(prompt_lines)
 
+def construct_repair_prompt(text, missing_sections):
+    """
+    Ask only for the CV sections missing from a previous answer.
+    """
+    keys = "\n".join(f'"{key}" ({CV_SECTIONS[key]})' for key in missing_sections)
+    return f"""
+Given the following text extracted from a CV:
 
-def retry_llm_response(prompt, retries=3):
+'{text}'
+
+Return a JSON object containing only the following keys, with the exact names shown.
+Dates use the format 'yyyy-mm-dd'. If a section is not found, return it as 'not mentioned'.
+
+{keys}
+    """
+
+
+def retry_llm_response(prompt, retries=3, source_text=None):
     """
     Retry getting an LLM response up to 'retries' times.
     Returns a valid JSON object if successful, otherwise None.
+
+    Transient provider errors are retried after an exponential backoff with
+    jitter. If a reply is valid JSON but lacks some sections, its sections
+    are kept and the next attempt asks only for the missing ones, quoting
+    source_text (the CV text; the full prompt is quoted if not given).
     """
-    required_sections = [
-        "Name",
-        "Contact Information",
-        "Professional Summary",
-        "Experience",
-        "Education",
-        "Skills",
-        "Certifications",
-        "Languages",
-    ]
+    result = {}
+    missing = list(CV_SECTIONS)
+    full_prompt_tokens = estimate_tokens(prompt)
 
     for attempt in range(retries):
+        request = prompt
+        if result:
+            with metrics.span("prompt_build"):
+                request = construct_repair_prompt(source_text or prompt, missing)
+            _record_retry("repair", full_prompt_tokens - estimate_tokens(request))
+        elif attempt:
+            _record_retry("full_retry")
         try:
             logger.info("Attempt %d to get LLM response.", attempt + 1)
-            response_text = get_LLM_response(prompt)
+            # Only the first attempt reads the cache, and replies are cached
+            # once they validate, so a rejected reply is never replayed.
+            with metrics.span("llm_attempt"):
+                response_text = get_LLM_response(request, use_cache=not attempt, store=False)
             logger.info("LLM response text: %s", response_text)
-            response_json = json.loads(response_text)
-
-            # Validate that all required sections are present
-            if all(section in response_json for section in required_sections):
-                logger.info("LLM response validation passed.")
-                return response_json
-            else:
-                logger.warning(
-                    "Validation failed: Missing sections in attempt %d.", attempt + 1
-                )
-        except json.JSONDecodeError as json_err:
-            logger.error(
-                "Failed to parse LLM response to JSON in attempt %d: %s",
-                attempt + 1,
-                str(json_err),
+        except transient_llm_errors() as e:
+            delay = _backoff_delay(attempt) if attempt + 1 < retries else 0.0
+            logger.warning(
+                "Attempt %d failed (%s); retrying in %.1fs.", attempt + 1, e, delay
             )
+            _record_retry("backoff", seconds=delay)
+            time.sleep(delay)
+            continue
         except Exception as e:
             logger.error("Attempt %d failed: %s", attempt + 1, str(e))
+            continue
+
+        response_json, salvaged = parse_llm_json(response_text)
+        if response_json is None:
+            logger.error("Failed to parse LLM response to JSON in attempt %d.", attempt + 1)
+            continue
+        if salvaged:
+            # The JSON was recovered from the reply instead of asking again.
+            _record_retry("salvage", estimate_tokens(request))
+
+        if result:
+            result.update({key: response_json[key] for key in missing if key in response_json})
+        else:
+            result = response_json
+        missing = [section for section in CV_SECTIONS if section not in result]
+
+        # Validate that all required sections are present
+        if not missing:
+            logger.info("LLM response validation passed.")
+            if request is prompt:
+                # A complete reply to the full prompt (possibly a retry after
+                # a rejected one) becomes its cached reply.
+                store_LLM_response(prompt, response_text)
+            return result
+        logger.warning(
+            "Validation failed: missing %s in attempt %d.", ", ".join(missing), attempt + 1
+        )
 
     return None
 
 
-def construct_cv_prompt(text):
+CONTACT_FIELDS = ("email", "phone", "address")
+
+
+def construct_cv_prompt(text, known_contact=None):
     """
     Construct a prompt for the LLM that includes context from the extracted CV data.
+    Contact fields already found in known_contact (see
+    text_preprocessing.extract_contact_fields) are not asked for.
     """
+    known_contact = known_contact or {}
+    contact_fields = [field for field in CONTACT_FIELDS if field not in known_contact] or ["address"]
+    contact_keys = ", ".join(f'"{field}"' for field in contact_fields)
+    example_contact = {
+        "email": "john.doe@example.com",
+        "phone": "+1 555-1234",
+        "address": "123 Main St, Anytown, USA",
+    }
+    example_contact = ",\n".join(
+        f'    "{field}": "{example_contact[field]}"' for field in contact_fields
+    )
     prompt = f"""
 Given the following text extracted from a CV:
 
@@ -249,7 +685,7 @@ If any section is not found, return it as 'not mentioned'.
 The JSON structure should include the following keys:
 
 "Name" (String)
-"Contact Information" (Object with keys: "email", "phone", "address")
+"Contact Information" (Object with keys: {contact_keys})
 "Professional Summary" (String)
 "Experience" (Array of objects with keys: "title", "company", "start_date", "end_date", "description")
 "Education" (Array of objects with keys: "degree", "institution", "start_date", "end_date", "description")
@@ -261,9 +697,7 @@ Example JSON Structure:
 {{
   "Name": "John Doe",
   "Contact Information": {{
-    "email": "john.doe@example.com",
-    "phone": "+1 555-1234",
-    "address": "123 Main St, Anytown, USA"
+{example_contact}
   }},
   "Professional Summary": "Experienced software engineer with a focus on web development.",
   "Experience": [
@@ -305,7 +739,8 @@ def get_cv_analysis(text):
     Given extracted CV text, construct the prompt and call the LLM using retry logic.
     Returns a tuple: (response JSON or error message, status code).
     """
-    prompt = construct_cv_prompt(text)
+    with metrics.span("prompt_build"):
+        prompt = construct_cv_prompt(text)
     response_json = retry_llm_response(prompt)
 
     if not response_json:
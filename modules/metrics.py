@@ -0,0 +1,310 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import math
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the stage duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Upper bounds of the prompt size histogram buckets, in estimated tokens.
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+# Spans recorded during the current request when per-request timing is on.
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class _Metric:
+    """
+    Base class for metrics in the Prometheus text exposition format.
+    Values are kept per label set; labels are passed as keyword arguments.
+    """
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._function = None
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def set_function(self, fn):
+        """
+        Read the metric from fn() at exposition time instead of stored values.
+        fn returns a number, or a dict mapping label-value tuples to numbers.
+        """
+        self._function = fn
+
+    def samples(self):
+        """Return [(suffix, labels, value)] for the exposition."""
+        if self._function is None:
+            with self._lock:
+                return [("", key, value) for key, value in sorted(self._values.items())]
+        try:
+            value = self._function()
+        except Exception as e:
+            logger.warning("Metric %s callback failed: %s", self.name, e)
+            return []
+        if isinstance(value, dict):
+            return [
+                ("", tuple(zip(self.labelnames, map(str, labels))), v)
+                for labels, v in sorted(value.items())
+            ]
+        return [("", (), value)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets, with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def snapshot(self, **labels):
+        """Return {"sum", "count"} for a label set (zeros if never observed)."""
+        state = self._values.get(self._key(labels))
+        return {"sum": state["sum"], "count": state["count"]} if state else {"sum": 0.0, "count": 0}
+
+    def samples(self):
+        with self._lock:
+            items = sorted(
+                (key, list(state["counts"]), state["sum"], state["count"])
+                for key, state in self._values.items()
+            )
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", key + (("le", _format_value(bound)),), cumulative))
+            samples.append(("_sum", key, total))
+            samples.append(("_count", key, count))
+        return samples
+
+
+class Registry:
+    """Collection of metrics rendered together on /metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric, or return the already registered metric with the same name."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """Render every metric in the Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name, help, labelnames=()):
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=DURATION_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+def render():
+    """Prometheus exposition of the process-wide registry."""
+    return REGISTRY.render()
+
+
+STAGE_SECONDS = histogram(
+    "cv_stage_duration_seconds",
+    "Duration of CV pipeline and chat stages.",
+    ["stage"],
+)
+STAGE_ERRORS = counter(
+    "cv_stage_errors_total",
+    "CV pipeline and chat stages that raised an exception.",
+    ["stage"],
+)
+
+
+CACHE_LOOKUPS = counter(
+    "cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ["cache", "result"],
+)
+CACHE_HIT_RATIO = gauge(
+    "cache_hit_ratio",
+    "Fraction of lookups served from the cache since the process started.",
+    ["cache"],
+)
+
+
+def _cache_hit_ratios():
+    with CACHE_LOOKUPS._lock:
+        totals = {}
+        for labels, value in CACHE_LOOKUPS._values.items():
+            labels = dict(labels)
+            hits, lookups = totals.get(labels["cache"], (0, 0))
+            totals[labels["cache"]] = (
+                hits + (value if labels["result"] == "hit" else 0),
+                lookups + value,
+            )
+    return {(cache,): hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+
+CACHE_HIT_RATIO.set_function(_cache_hit_ratios)
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def observe_stage(stage, seconds, error=False):
+    """Record a stage duration measured elsewhere (e.g. in a worker process)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if error:
+        STAGE_ERRORS.inc(stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a block as one observation of cv_stage_duration_seconds{stage=...}.
+    A generator closed early (GeneratorExit, e.g. a client disconnecting from
+    a stream) counts as a normal end, not an error.
+    """
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except GeneratorExit:
+        raise
+    except BaseException:
+        error = True
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start, error)
+
+
+def start_request_timing():
+    """Collect spans of the current request; returns a token for stop_request_timing."""
+    return _request_spans.set([])
+
+
+def stop_request_timing(token):
+    """Stop collecting spans and return them as [(stage, seconds)] in completion order."""
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
+
+
+def server_timing_header(spans):
+    """Format spans as a Server-Timing header, summing repeated stages."""
+    totals = {}
+    for stage, seconds in spans:
+        count, total = totals.get(stage, (0, 0.0))
+        totals[stage] = (count + 1, total + seconds)
+    return ", ".join(
+        f'{stage};dur={total * 1000:.1f};desc="{count}x"' for stage, (count, total) in totals.items()
+    )
@@ -0,0 +1,154 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import re
+import math
+import logging
+import threading
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+
+from modules.llm_integration import render_cv_block
+from modules.tokens import estimate_tokens
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Maximum number of CVs included in the chat context for one message.
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "10"))
+# Token budget for the CV details included in the chat context.
+CV_CONTEXT_TOKEN_BUDGET = int(os.getenv("CV_CONTEXT_TOKEN_BUDGET", "4000"))
+
+# Fields of a CV record that are indexed and sent to the LLM.
+INDEXED_FIELDS = [
+    "personal_information",
+    "education_history",
+    "work_experience",
+    "skills",
+    "projects",
+    "certifications",
+]
+# Columns loaded for the chat context; raw_text and file paths are never read.
+CONTEXT_FIELDS = ["id"] + INDEXED_FIELDS
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or the to who with "
+    "which what candidate candidates cv cvs any all me show list find".split()
+)
+
+
+def tokenize(text):
+    """Lower-case word tokens used for indexing and querying (stopwords removed)."""
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def record_text(record):
+    """The searchable text of a CV record."""
+    return "\n".join(str(record.get(field) or "") for field in INDEXED_FIELDS)
+
+
+class CVIndex:
+    """
+    In-memory BM25 index over CV records.
+
+    Postings are kept per term, so adding a CV only touches that CV's terms
+    and the index can be updated incrementally on every insert.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.records = {}
+        self.token_counts = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, record, body=None):
+        """
+        Index (or re-index) one CV record; it must carry its "id".
+        body is its pre-rendered render_cv_body output, if already available.
+        """
+        doc_id = record["id"]
+        text = record_text(record)
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            for term, freq in terms.items():
+                self.postings[term][doc_id] = freq
+            self.doc_terms[doc_id] = list(terms)
+            length = sum(terms.values())
+            self.doc_lengths[doc_id] = length
+            self.total_length += length
+            if "raw_text" in record.keys():
+                record = {k: record[k] for k in record.keys() if k != "raw_text"}
+            self.records[doc_id] = record
+            self.token_counts[doc_id] = estimate_tokens(render_cv_block(record, doc_id, body=body))
+
+    def remove(self, doc_id):
+        """Drop a CV from the index if present."""
+        with self._lock:
+            if doc_id not in self.doc_lengths:
+                return
+            for term in self.doc_terms.pop(doc_id):
+                docs = self.postings[term]
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            self.records.pop(doc_id, None)
+            self.token_counts.pop(doc_id, None)
+
+    def search(self, query, k=None):
+        """Return up to k (doc_id, score) pairs ranked by BM25 relevance to the query."""
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs or 1.0
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, freq in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k] if k else ranked
+
+    def select(self, query, k=None, token_budget=None):
+        """
+        Pick the CV records to send to the LLM for a query.
+        Takes the top-k matches that fit within token_budget; if nothing
+        matches (e.g. "summarize everyone"), falls back to CVs in id order.
+        """
+        k = k or RETRIEVAL_TOP_K
+        token_budget = token_budget or CV_CONTEXT_TOKEN_BUDGET
+        with self._lock:
+            candidates = [doc_id for doc_id, _ in self.search(query)]
+            if not candidates:
+                candidates = sorted(self.records)
+            selected, used = [], 0
+            for doc_id in candidates:
+                if len(selected) >= k:
+                    break
+                cost = self.token_counts[doc_id]
+                if used + cost > token_budget:
+                    continue
+                selected.append(self.records[doc_id])
+                used += cost
+        logger.info(
+            "Selected %d of %d CVs (~%d tokens) for the query.", len(selected), len(self), used
+        )
+        return selected
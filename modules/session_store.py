@@ -0,0 +1,259 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import hashlib
+import logging
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+from dotenv import load_dotenv
+
+from modules import metrics
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BASE_DIR = Path(__file__).resolve().parent
+# "sqlite" (shared by all workers on the host) or "memory" (per process).
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", str(BASE_DIR / ".." / "sessions.db"))
+# Seconds of inactivity after which a session expires.
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(24 * 3600)))
+# Largest serialized session; the oldest chat turns are dropped beyond it.
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", "16384"))
+# Sessions kept by the in-memory backend; least recently used ones are evicted.
+SESSION_MEMORY_MAX_ENTRIES = int(os.getenv("SESSION_MEMORY_MAX_ENTRIES", "10000"))
+# Expired rows are deleted once every this many writes.
+_PRUNE_EVERY = 200
+
+SESSION_WRITE_BYTES = metrics.histogram(
+    "session_write_bytes",
+    "Size of session records written to the session store.",
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536),
+)
+SESSION_WRITES = metrics.counter(
+    "session_writes_total", "Session saves by outcome.", ["outcome"]
+)
+
+CREATE_SESSIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+class MemorySessionStore:
+    """Per-process LRU of serialized sessions with expiry and an entry cap."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or SESSION_MEMORY_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return entry[0]
+
+    def set(self, sid, data, expires_at):
+        with self._lock:
+            self._entries[sid] = (data, expires_at)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                self._entries[sid] = (entry[0], expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+class SQLiteSessionStore:
+    """Serialized sessions in a SQLite table, shared by the workers of a host."""
+
+    def __init__(self, db_path=None):
+        self.db_path = str(db_path or SESSION_DB_PATH)
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Return this thread's connection, creating the sessions table on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(CREATE_SESSIONS_TABLE_SQL)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, sid):
+        row = self.connection().execute(
+            "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, sid, data, expires_at):
+        self.connection().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, data, expires_at),
+        )
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+        if prune:
+            self.connection().execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+
+    def touch(self, sid, expires_at):
+        self.connection().execute(
+            "UPDATE sessions SET expires_at = ? WHERE sid = ?", (expires_at, sid)
+        )
+
+    def delete(self, sid):
+        self.connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+
+def make_session_store(backend=None, db_path=None):
+    """Create the session store selected by SESSION_BACKEND."""
+    backend = backend or SESSION_BACKEND
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(db_path)
+    raise ValueError(f"Unknown SESSION_BACKEND {backend!r}; use 'sqlite' or 'memory'.")
+
+
+def serialize_session(data, max_bytes=None):
+    """
+    Encode session data as compact JSON. If it exceeds max_bytes, the oldest
+    entries of conversation_history are dropped until it fits.
+    """
+    max_bytes = max_bytes or SESSION_MAX_BYTES
+    data = dict(data)
+    payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    history = list(data.get("conversation_history") or [])
+    while len(payload) > max_bytes and history:
+        history.pop(0)
+        data["conversation_history"] = history
+        payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return payload
+
+
+class CompactSession(CallbackDict, SessionMixin):
+    """Server-side session; the cookie only carries its signed id."""
+
+    def __init__(self, initial=None, sid=None, new=False, digest=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.digest = digest
+        self.modified = False
+
+
+class CompactSessionInterface(SessionInterface):
+    """
+    Session interface storing small JSON session records server-side.
+
+    The cookie holds a signed random session id. A record is written only
+    when its content changed, otherwise only its expiry is extended, and it
+    is capped at SESSION_MAX_BYTES. Chat sessions hold just the compacted
+    turns and a reference to the shared CV context version (the CV context
+    itself is rebuilt from the process-wide context cache per message).
+    """
+
+    salt = "cv-analysis-session"
+
+    def __init__(self, store=None, ttl=None, max_bytes=None):
+        self.store = store or make_session_store()
+        self.ttl = ttl or SESSION_TTL
+        self.max_bytes = max_bytes or SESSION_MAX_BYTES
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode("utf-8")
+            except BadSignature:
+                sid = None
+            if sid:
+                payload = self.store.get(sid)
+                if payload is not None:
+                    try:
+                        data = json.loads(payload)
+                    except ValueError:
+                        data = {}
+                    return CompactSession(data, sid=sid, digest=hashlib.sha1(payload).digest())
+        return CompactSession(sid=secrets.token_urlsafe(24), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+                SESSION_WRITES.inc(outcome="deleted")
+                if session.modified:
+                    response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        expires_at = time.time() + self.ttl
+        payload = serialize_session(session, self.max_bytes)
+        digest = hashlib.sha1(payload).digest()
+        if digest == session.digest:
+            self.store.touch(session.sid, expires_at)
+            SESSION_WRITES.inc(outcome="unchanged")
+        else:
+            self.store.set(session.sid, payload, expires_at)
+            session.digest = digest
+            SESSION_WRITES.inc(outcome="written")
+            SESSION_WRITE_BYTES.observe(len(payload))
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode("utf-8"),
+                max_age=self.ttl if session.permanent else None,
+                httponly=self.get_cookie_httponly(app),
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+                domain=domain,
+                path=path,
+            )
+            session.new = False
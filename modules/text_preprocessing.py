@@ -0,0 +1,179 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import re
+import unicodedata
+from collections import Counter
+
+from modules.tokens import estimate_tokens
+from modules import metrics
+
+# Lines at the top and bottom of each page checked for repeated headers/footers.
+EDGE_LINES = 3
+
+_SOFT_HYPHEN = "\u00ad"
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b\u3000]+")
+_HYPHEN_BREAK = re.compile(r"(\w)-\n(?=[a-z])")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_PAGE_NUMBER = re.compile(r"^(?:page\s*)?\d{1,3}(?:\s*(?:of|/)\s*\d{1,3})?$", re.IGNORECASE)
+_DIGITS = re.compile(r"\d+")
+_ALNUM = re.compile(r"\w")
+
+EMAIL_RE = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}\b")
+PHONE_RE = re.compile(r"(?<![\w+(])[+(]?\d[\d\s().-]{7,}\d(?!\w)")
+# A phone match is only trusted with context: a leading "+", a label just
+# before it, or a common national grouping. Dates and year lists are rejected.
+_PHONE_LABEL = re.compile(
+    r"\b(?:phone|tel|telephone|mobile|cell|mob|ph)\b\.?(?:\s*(?:no\.?|number))?\s*[:.]?\s*$",
+    re.IGNORECASE,
+)
+_PHONE_GROUPING = re.compile(r"\(?\d{3}\)?[\s.-]?\d{3}[\s.-]\d{4}|0\d{9,10}")
+_YEAR = re.compile(r"(?:19|20)\d{2}")
+URL_RE = re.compile(
+    r"\b(?:https?://)?(?:www\.)?(?:linkedin\.com|github\.com)/[\w\-./%]+", re.IGNORECASE
+)
+PREPROCESS_TOKENS_SAVED = metrics.histogram(
+    "cv_preprocess_tokens_saved",
+    "Estimated tokens removed from a CV text before it is sent to the LLM.",
+    buckets=(0, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096),
+)
+
+
+def normalize_text(text):
+    """
+    Normalize extracted text: Unicode compatibility forms (ligatures, full-width
+    characters), soft hyphens, runs of spaces, words hyphenated across line
+    breaks, lines without any letters or digits (OCR noise, lone bullets),
+    consecutive duplicate lines and runs of blank lines.
+    """
+    text = unicodedata.normalize("NFKC", text or "").replace(_SOFT_HYPHEN, "")
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    text = _HYPHEN_BREAK.sub(r"\1", text)
+    lines, previous = [], None
+    for line in text.split("\n"):
+        if line and not _ALNUM.search(line):
+            continue
+        if line and line == previous:
+            continue
+        lines.append(line)
+        previous = line
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _boilerplate_key(line):
+    return _DIGITS.sub("#", line.lower())
+
+
+def strip_repeated_lines(pages, edge_lines=EDGE_LINES):
+    """
+    Drop page headers and footers: lines among the first (or last) edge_lines
+    lines of a page that recur at the top (or bottom) of at least half of the
+    pages, digits ignored so "Page 2 of 5" matches. Page numbers among them are
+    dropped everywhere; of the other lines the first occurrence is kept, so a
+    header carrying the candidate's name and contact details still appears
+    once. Needs two or more pages.
+    Returns the page texts without the repeats.
+    """
+    if len(pages) < 2:
+        return list(pages)
+    page_lines = [[line for line in page.split("\n") if line.strip()] for page in pages]
+    counts = Counter()
+    for lines in page_lines:
+        counts.update({("top", _boilerplate_key(line)) for line in lines[:edge_lines]})
+        counts.update({("bottom", _boilerplate_key(line)) for line in lines[-edge_lines:]})
+    threshold = max(2, (len(pages) + 1) // 2)
+    repeated = {key for key, count in counts.items() if count >= threshold}
+    seen, cleaned = set(), []
+    for lines in page_lines:
+        kept = []
+        for i, line in enumerate(lines):
+            key = None
+            if i < edge_lines and ("top", _boilerplate_key(line)) in repeated:
+                key = ("top", _boilerplate_key(line))
+            elif i >= len(lines) - edge_lines and ("bottom", _boilerplate_key(line)) in repeated:
+                key = ("bottom", _boilerplate_key(line))
+            if key is not None and (key in seen or _PAGE_NUMBER.match(line.strip())):
+                continue
+            if key is not None:
+                seen.add(key)
+            kept.append(line)
+        cleaned.append("\n".join(kept))
+    return cleaned
+
+
+def _is_date_like(candidate):
+    """True for digit runs made only of years and one- or two-digit day/month parts."""
+    groups = _DIGITS.findall(candidate)
+    return any(_YEAR.fullmatch(group) for group in groups) and all(
+        _YEAR.fullmatch(group) or len(group) <= 2 for group in groups
+    )
+
+
+def _find_phone(text):
+    for match in PHONE_RE.finditer(text):
+        phone = match.group(0).strip()
+        digits = sum(c.isdigit() for c in phone)
+        if not 8 <= digits <= 15 or _is_date_like(phone):
+            continue
+        line_start = text.rfind("\n", 0, match.start()) + 1
+        if (
+            phone.startswith("+")
+            or _PHONE_LABEL.search(text[line_start:match.start()])
+            or _PHONE_GROUPING.fullmatch(phone)
+        ):
+            return phone
+    return None
+
+
+def extract_contact_fields(text):
+    """
+    Pull contact details out of CV text with regexes.
+    Returns a dict with the first "email" and "phone" found and any LinkedIn or
+    GitHub "links"; fields not found are left out. A phone number is only
+    reported when it is unambiguous (international prefix, a phone/tel/mobile
+    label, or a common grouping such as 555-123-4567), since it overrides the
+    LLM's answer; other digit runs (date ranges, ISBNs) are left to the LLM.
+    """
+    text = text or ""
+    fields = {}
+    email = EMAIL_RE.search(text)
+    if email:
+        fields["email"] = email.group(0)
+    phone = _find_phone(text)
+    if phone:
+        fields["phone"] = phone
+    links = list(dict.fromkeys(match.group(0) for match in URL_RE.finditer(text)))
+    if links:
+        fields["links"] = links
+    return fields
+
+
+def preprocess_cv_pages(pages):
+    """
+    Compact extracted CV text before it goes to the LLM: strip headers and
+    footers repeated across pages, then normalize the text (see
+    normalize_text). pages is a list of page texts.
+
+    Returns a dict with the compacted "text" and "tokens_before",
+    "tokens_after" and "tokens_saved" (estimated LLM tokens). Contact details
+    are pulled from the text when it is structured (see
+    cv_chunking.extract_cv_structure), as the text may come from the
+    extraction cache.
+    """
+    pages = [page for page in pages if page]
+    with metrics.span("preprocess"):
+        tokens_before = estimate_tokens("\n".join(pages))
+        text = normalize_text("\n".join(strip_repeated_lines(pages)))
+        tokens_after = estimate_tokens(text)
+        result = {
+            "text": text,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_before - tokens_after,
+        }
+    PREPROCESS_TOKENS_SAVED.observe(max(0, result["tokens_saved"]))
+    return result
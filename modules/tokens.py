@@ -0,0 +1,34 @@
+import re
+
+_WORD = re.compile(r"\w+")
+_SYMBOL = re.compile(r"[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    Approximate the number of LLM tokens in a text without loading a tokenizer.
+    Mimics Llama-style BPE: short words are one token, longer words split every
+    ~4 characters, and each punctuation mark is a token of its own.
+    """
+    text = text or ""
+    words = sum(1 + (len(word) - 1) // 4 for word in _WORD.findall(text))
+    return words + len(_SYMBOL.findall(text))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text down to roughly max_tokens tokens, marking the cut with an ellipsis."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) + 1 <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low].rstrip() + "…"
+
+
+def message_tokens(message):
+    """Approximate tokens of a chat message, including its role/formatting overhead."""
+    return estimate_tokens(message.get("content", "")) + 4
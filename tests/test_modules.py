@@ -41,6 +41,17 @@ def test_send_message_empty(client):
     assert b"Empty message" in response.data
 
 
+def test_send_message_stream_rejects_bad_body(client):
+    """
+    Test that the streaming endpoint answers a missing, non-JSON or empty
+    message with a JSON error 400.
+    """
+    for kwargs in ({}, {"data": "hello"}, {"json": ["hello"]}, {"json": {"message": ""}}):
+        response = client.post("/send_message_stream", **kwargs)
+        assert response.status_code == 400
+        assert "error" in response.get_json()
+
+
 def test_upload_cv_no_file(client):
     """
     Test uploading a CV with no file provided returns error 400.
@@ -48,3 +59,1299 @@ def test_upload_cv_no_file(client):
     response = client.post("/upload_cv", data={})
     assert response.status_code == 400
     assert b"No file uploaded" in response.data
+
+
+def _fake_ocr(image):
+    """
+    Stand-in for tesseract: echo the image size, fail on 13x13 pages.
+    """
+    if image.size == (13, 13):
+        raise RuntimeError("tesseract crashed")
+    return f"page {image.size[0]}"
+
+
+def test_parallel_ocr_keeps_page_order_and_reports_errors(monkeypatch):
+    """
+    Test that parallel OCR returns results in page order with per-page errors.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from PIL import Image
+    from modules import document_processor
+
+    # The stub is not visible in the real pool's worker processes, so the
+    # shared pool is replaced by threads (see test_ocr_pool_is_shared_and_not_forked).
+    monkeypatch.setattr(document_processor, "perform_ocr_on_image", _fake_ocr)
+    monkeypatch.setattr(document_processor, "get_ocr_pool", lambda: ThreadPoolExecutor(2))
+    images = [Image.new("L", (size, size)) for size in (10, 11, 13, 12)]
+
+    results = document_processor.perform_ocr_on_images_parallel(images, max_workers=2)
+
+    assert [r["page"] for r in results] == [1, 2, 3, 4]
+    assert [r["text"] for r in results] == ["page 10", "page 11", "", "page 12"]
+    assert results[2]["error"] == "tesseract crashed"
+    assert document_processor.perform_ocr_on_images(images, max_workers=1)[3] == "page 12"
+
+
+def test_ocr_pool_is_shared_and_not_forked():
+    """
+    Test that OCR uses one long-lived process pool whose workers are not
+    forked from the (multi-threaded) parent.
+    """
+    from PIL import Image
+    from modules import document_processor
+
+    pool = document_processor.get_ocr_pool()
+    assert document_processor.get_ocr_pool() is pool
+    assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+
+    images = [Image.new("L", (10, 10)), Image.new("L", (11, 11))]
+    for _ in range(2):
+        results = document_processor.perform_ocr_on_images_parallel(images, max_workers=2)
+        assert [r["page"] for r in results] == [1, 2]
+    assert document_processor.get_ocr_pool() is pool
+
+
+def test_streaming_ocr_pipeline_yields_pages_in_order(monkeypatch):
+    """
+    Test that the streaming OCR pipeline rasterizes one page at a time and
+    reports rasterization failures per page.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from PIL import Image
+    from modules import document_processor
+
+    rasterized = []
+
+    def fake_convert(file_path, dpi, first_page, last_page, poppler_path):
+        assert first_page == last_page
+        rasterized.append(first_page)
+        if first_page == 2:
+            raise RuntimeError("poppler failed")
+        return [Image.new("RGB", (20 + first_page, 20 + first_page))]
+
+    # Page cleanup is covered by test_ocr_page_cleanup_deskews_crops_and_skips_blank_pages.
+    monkeypatch.setattr(document_processor, "OCR_CLEANUP", False)
+    monkeypatch.setattr(document_processor, "get_pdf_page_count", lambda path: 3)
+    monkeypatch.setattr(document_processor, "convert_from_path", fake_convert)
+    monkeypatch.setattr(document_processor, "perform_ocr_on_image", _fake_ocr)
+    monkeypatch.setattr(document_processor, "get_ocr_pool", lambda: ThreadPoolExecutor(2))
+
+    for workers in (1, 2):
+        rasterized.clear()
+        results = list(
+            document_processor.ocr_pdf_pages("scan.pdf", max_workers=workers)
+        )
+        assert rasterized == [1, 2, 3]
+        assert [r["text"] for r in results] == ["page 21", "", "page 23"]
+        assert results[1]["error"] == "poppler failed"
+
+
+STRUCTURED_CV = {
+    "Name": "Jane Roe",
+    "Contact Information": {"email": "jane@example.com", "phone": "555", "address": "x"},
+    "Professional Summary": "Platform engineer.",
+    "Experience": [
+        {
+            "title": "SRE",
+            "company": "Acme",
+            "start_date": "2018-01-01",
+            "end_date": "2024-01-01",
+            "description": "Ran Kubernetes clusters.",
+        }
+    ],
+    "Education": [
+        {
+            "degree": "B.Sc. Computer Science",
+            "institution": "State University",
+            "start_date": "2014-09-01",
+            "end_date": "2017-06-01",
+            "description": "",
+        }
+    ],
+    "Skills": ["Python", "Kubernetes"],
+    "Certifications": "not mentioned",
+    "Languages": ["English"],
+}
+
+
+@pytest.fixture
+def cv_store(tmp_path, monkeypatch):
+    """
+    Pytest fixture pointing the CV parser at a temporary database and upload
+    directory, with text extraction and the LLM replaced by stubs.
+    """
+    from modules import cv_parser
+
+    monkeypatch.setattr(cv_parser, "DB_PATH", tmp_path / "cv_data.db")
+    monkeypatch.setattr(cv_parser, "UPLOAD_DIR", tmp_path)
+    calls = {"extract": 0, "llm": 0}
+
+    def fake_extract(path):
+        calls["extract"] += 1
+        return "Jane Roe\nSRE at Acme\nPython, Kubernetes"
+
+    def fake_llm(raw_text, *args, **kwargs):
+        calls["llm"] += 1
+        return dict(STRUCTURED_CV)
+
+    monkeypatch.setattr(cv_parser, "extract_raw_text", fake_extract)
+    monkeypatch.setattr(cv_parser, "extract_cv_structure", fake_llm)
+    cv_parser.init_db()
+    return calls
+
+
+def test_duplicate_upload_is_served_from_cache(cv_store, tmp_path):
+    """
+    Test that uploading the same bytes twice reuses the first extraction and
+    creates neither a second file nor a second cv_records row.
+    """
+    import io
+    from modules import cv_parser
+
+    first = cv_parser.process_and_save_cv(io.BytesIO(b"%PDF-1.4 cv"), "a.pdf")
+    second = cv_parser.process_and_save_cv(io.BytesIO(b"%PDF-1.4 cv"), "b.pdf")
+
+    assert first["cache_hit"] is False
+    assert second["cache_hit"] is True
+    assert second["file_path"] == first["file_path"]
+    assert cv_store == {"extract": 1, "llm": 1}
+    assert len(cv_parser.get_all_cv_data()) == 1
+    assert len(list(tmp_path.glob("*.pdf"))) == 1
+
+
+def test_hybrid_pdf_extraction_ocrs_only_pages_without_text(monkeypatch):
+    """
+    Test that a mixed PDF keeps its text-layer pages and OCRs only the others.
+    """
+    from modules import document_processor
+
+    class FakePage:
+        def __init__(self, text):
+            self.text = text
+
+        def extract_text(self):
+            return self.text
+
+    class FakeReader:
+        def __init__(self, file_path):
+            self.pages = [FakePage("Jane Roe - Senior Platform Engineer"), FakePage("")]
+
+    ocr_requests = []
+
+    def fake_ocr_pdf_pages(file_path, dpi, pages, max_workers):
+        ocr_requests.append(list(pages))
+        for page in pages:
+            yield {"page": page, "text": "Certificate", "error": None, "seconds": 1.0}
+
+    monkeypatch.setattr(document_processor, "PdfReader", FakeReader)
+    monkeypatch.setattr(document_processor, "ocr_pdf_pages", fake_ocr_pdf_pages)
+
+    pages = document_processor.extract_pdf_pages("mixed.pdf")
+
+    assert ocr_requests == [[2]]
+    assert [p["method"] for p in pages] == ["text", "ocr"]
+    assert pages[1]["text"] == "Certificate"
+    assert pages[1]["seconds"] >= 1.0
+
+
+def test_upload_cv_returns_job_and_reports_progress(client, monkeypatch, tmp_path):
+    """
+    Test that /upload_cv queues the CV and /jobs/<id> reports its stages, and
+    that the job state is visible to other workers sharing the job store.
+    """
+    import io
+    import time
+    from modules import ingestion_queue
+
+    def fake_process(file_obj, filename, progress):
+        progress("save")
+        progress("llm")
+        return {"file_path": filename, "cache_hit": False, "body": file_obj.read().decode()}
+
+    monkeypatch.setattr(ingestion_queue, "process_and_save_cv", fake_process)
+    store = ingestion_queue.SQLiteJobStore(tmp_path / "jobs.db")
+    monkeypatch.setattr(ingestion_queue, "_queue", ingestion_queue.IngestionQueue(1, 4, store=store))
+
+    response = client.post(
+        "/upload_cv", data={"file": (io.BytesIO(b"cv bytes"), "cv.pdf")}
+    )
+    assert response.status_code == 202
+    job_url = response.get_json()["status_url"]
+
+    for _ in range(100):
+        job = client.get(job_url).get_json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.01)
+
+    assert job["status"] == "done"
+    assert job["result"]["body"] == "cv bytes"
+    assert set(job["stages"]) == {"save", "llm"}
+    assert all(stage["status"] == "done" for stage in job["stages"].values())
+    assert client.get("/jobs/unknown").status_code == 404
+
+    other_worker = ingestion_queue.IngestionQueue(
+        1, 4, store=ingestion_queue.SQLiteJobStore(tmp_path / "jobs.db")
+    )
+    shared = other_worker.get(job["id"])
+    assert (shared["status"], shared["result"], shared["stages"]) == (
+        "done", job["result"], job["stages"]
+    )
+    other_worker.shutdown()
+
+
+def test_ingestion_queue_rejects_jobs_beyond_depth(monkeypatch):
+    """
+    Test that the ingestion queue refuses work once its depth limit is reached.
+    """
+    import threading
+    from modules import ingestion_queue
+
+    release = threading.Event()
+    monkeypatch.setattr(
+        ingestion_queue, "process_and_save_cv", lambda *args, **kwargs: release.wait()
+    )
+    queue = ingestion_queue.IngestionQueue(
+        max_workers=1, max_queue_depth=2, store=ingestion_queue.MemoryJobStore()
+    )
+    queue.submit(b"a", "a.pdf")
+    queue.submit(b"b", "b.pdf")
+    with pytest.raises(ingestion_queue.QueueFullError):
+        queue.submit(b"c", "c.pdf")
+    assert queue.depth() == 2
+    release.set()
+    queue.shutdown()
+    assert queue.depth() == 0
+
+
+def test_batch_ingest_is_resumable(cv_store, tmp_path, monkeypatch):
+    """
+    Test that batch ingestion inserts each distinct CV once, that a second
+    run over the same directory skips everything already stored, and that
+    extraction processes are not forked.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from modules import batch_ingest, cv_parser
+
+    with batch_ingest.make_extract_pool(2) as pool:
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+    # The stubs are not visible in those workers, so extraction uses threads here.
+    monkeypatch.setattr(batch_ingest, "make_extract_pool", ThreadPoolExecutor)
+    monkeypatch.setattr(batch_ingest, "extract_raw_text", cv_parser.extract_raw_text)
+    monkeypatch.setattr(batch_ingest, "extract_cv_structure", cv_parser.extract_cv_structure)
+    source_dir = tmp_path / "incoming"
+    source_dir.mkdir()
+    (source_dir / "a.pdf").write_bytes(b"cv a")
+    (source_dir / "b.docx").write_bytes(b"cv b")
+    (source_dir / "copy_of_a.pdf").write_bytes(b"cv a")
+    (source_dir / "notes.txt").write_bytes(b"ignored")
+
+    first = batch_ingest.ingest_batch(
+        batch_ingest.iter_sources(source_dir), cpu_workers=2, llm_workers=2, batch_size=1
+    )
+    second = batch_ingest.ingest_batch(
+        batch_ingest.iter_sources(source_dir), cpu_workers=1, llm_workers=2
+    )
+
+    assert (first["inserted"], first["skipped"], first["failed"]) == (2, 1, 0)
+    assert first["stages"]["extract"]["count"] == 2
+    assert first["stages"]["llm"]["count"] == 2
+    assert first["stages"]["db"]["count"] == 2
+    assert (second["inserted"], second["skipped"]) == (0, 3)
+    assert cv_store["llm"] == 2
+    assert len(cv_parser.get_all_cv_data()) == 2
+    assert "docs/sec" in batch_ingest.format_summary(first)
+
+
+def test_repository_readers_do_not_block_on_open_write(tmp_path):
+    """
+    Test that the repository uses WAL mode so a reader on another thread sees
+    committed rows while a write transaction is still open.
+    """
+    import threading
+    from modules.cv_repository import CVRepository
+
+    repository = CVRepository(tmp_path / "cv.db")
+    repository.init_schema()
+    repository.insert_many([{"file_path": "a.pdf", "content_hash": "a"}])
+    assert repository.connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    seen = []
+    with repository.transaction() as conn:
+        conn.execute(
+            "INSERT INTO cv_records (file_path, content_hash) VALUES ('b.pdf', 'b')"
+        )
+        reader = threading.Thread(target=lambda: seen.extend(repository.get_all()))
+        reader.start()
+        reader.join(timeout=2)
+
+    assert [record["content_hash"] for record in seen] == ["a"]
+    assert len(repository.get_all()) == 2
+    repository.close()
+
+
+def test_repository_closes_connections_of_finished_threads(tmp_path):
+    """
+    Test that per-thread connections are released when their threads exit,
+    as with a thread-per-request server.
+    """
+    import gc
+    import threading
+    from modules.cv_repository import CVRepository
+
+    repository = CVRepository(tmp_path / "cv.db")
+    repository.init_schema()
+    for _ in range(50):
+        thread = threading.Thread(target=repository.get_all)
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    assert len(repository._connections) == 1
+    repository.close()
+
+
+def test_normalized_tables_answer_skill_and_experience_queries(tmp_path):
+    """
+    Test that legacy rows are backfilled into the normalized tables and that
+    skill/experience queries are answered from them.
+    """
+    import json
+    import sqlite3
+    from modules.cv_parser import build_cv_record
+    from modules.cv_repository import CVRepository
+
+    db_path = tmp_path / "legacy.db"
+    legacy = sqlite3.connect(db_path)
+    legacy.execute(
+        "CREATE TABLE cv_records (id INTEGER PRIMARY KEY AUTOINCREMENT, file_path TEXT, "
+        "personal_information TEXT, education_history TEXT, work_experience TEXT, "
+        "skills TEXT, projects TEXT, certifications TEXT, raw_text TEXT)"
+    )
+    senior = build_cv_record(STRUCTURED_CV, "senior.pdf", "")
+    legacy.execute(
+        "INSERT INTO cv_records (file_path, skills, work_experience, education_history) "
+        "VALUES (?, ?, ?, ?)",
+        (senior["file_path"], senior["skills"], senior["work_experience"], senior["education_history"]),
+    )
+    legacy.commit()
+    legacy.close()
+
+    junior_cv = dict(STRUCTURED_CV, Skills=["kubernetes ", "Go"])
+    junior_cv["Experience"] = [
+        dict(STRUCTURED_CV["Experience"][0], start_date="2022-01-01", end_date="2024-01-01")
+    ]
+    repository = CVRepository(db_path)
+    repository.insert(build_cv_record(junior_cv, "junior.pdf", "", "junior"))
+
+    assert repository.find_candidate_ids(skills=["Kubernetes"]) == [1, 2]
+    assert repository.find_candidate_ids(skills=["KUBERNETES"], min_experience_years=5) == [1]
+    assert repository.find_candidate_ids(skills=["go"], company="ACME") == [2]
+    assert repository.find_candidate_ids(degree="computer science") == [1, 2]
+    plan = repository.connection().execute(
+        "EXPLAIN QUERY PLAN SELECT cv_id FROM cv_skills WHERE normalized_name = 'python'"
+    ).fetchall()
+    assert "idx_cv_skills_name" in json.dumps(plan)
+    repository.close()
+
+
+def test_cv_index_selects_relevant_records_within_budget(tmp_path):
+    """
+    Test that the BM25 index picks the CVs matching a query, respects the
+    token budget, and that the context cache picks up new inserts incrementally.
+    """
+    from modules.cv_parser import build_cv_record
+    from modules.cv_repository import CVRepository
+    from modules.context_cache import CVContextCache
+
+    repository = CVRepository(tmp_path / "cv.db")
+    profiles = {
+        "k8s": ["Kubernetes", "Terraform"],
+        "web": ["React", "CSS"],
+        "data": ["Pandas", "SQL"],
+    }
+    for name, skills in profiles.items():
+        repository.insert(build_cv_record(dict(STRUCTURED_CV, Skills=skills), name, "", name))
+    cache = CVContextCache()
+    assert cache.sync(repository) == 3
+
+    top = cache.select("Who knows kubernetes?", k=1)
+    assert [record["id"] for record in top] == [1]
+    assert "raw_text" not in top[0]
+    assert cache.select("react", token_budget=1) == []
+    assert len(cache.select("nothing matches this", k=10)) == 3
+
+    repository.insert(build_cv_record(dict(STRUCTURED_CV, Skills=["Rust"]), "rs", "", "rs"))
+    assert cache.sync(repository) == 1
+    assert [r["id"] for r in cache.select("rust", k=2)] == [4]
+    repository.close()
+
+
+def test_aggregated_prompt_is_compact_and_budgeted():
+    """
+    Test that instructions appear once, empty fields are dropped, and a token
+    budget shrinks the per-CV blocks.
+    """
+    from modules.cv_parser import build_cv_record
+    from modules.llm_integration import build_cv_context, estimate_tokens
+
+    long_job = dict(STRUCTURED_CV["Experience"][0], description="Operated clusters. " * 200)
+    records = [
+        dict(build_cv_record(dict(STRUCTURED_CV, Experience=[long_job]), f"{n}.pdf", ""), id=n)
+        for n in range(1, 4)
+    ]
+
+    prompt, stats = build_cv_context(records)
+    assert prompt.count("Your Task:") == 1
+    assert prompt.count("--- CV") == 3
+    assert "Certifications:" not in prompt
+    assert "SRE @ Acme (2018-01–2024-01)" in prompt
+    assert [item["id"] for item in stats["per_cv"]] == [1, 2, 3]
+
+    budgeted, budget_stats = build_cv_context(records, token_budget=600)
+    assert budget_stats["total_tokens"] <= 600
+    assert budget_stats["total_tokens"] == estimate_tokens(budgeted)
+    assert "Python, Kubernetes" in budgeted
+
+
+def test_context_cache_tracks_db_version(tmp_path):
+    """
+    Test that the context cache re-renders only changed CVs, sees writes made
+    through another connection, and only reads the version when nothing changed.
+    """
+    import sqlite3
+    from modules.context_cache import CVContextCache
+    from modules.cv_parser import build_cv_record
+    from modules.cv_repository import CVRepository
+
+    repository = CVRepository(tmp_path / "cv.db")
+    for name in ("a", "b"):
+        repository.insert(build_cv_record(STRUCTURED_CV, name, "", name))
+    cache = CVContextCache()
+    assert cache.sync(repository) == 2
+
+    statements = []
+    repository.connection().set_trace_callback(statements.append)
+    assert cache.sync(repository) == 0
+    assert len(statements) == 1 and "cv_changes" in statements[0]
+    repository.connection().set_trace_callback(None)
+
+    repository.insert(build_cv_record(dict(STRUCTURED_CV, Skills=["Elixir"]), "c", "", "c"))
+    assert cache.sync(repository) == 1
+    assert "Elixir" in cache.bodies[3]
+
+    other_process = sqlite3.connect(tmp_path / "cv.db")
+    other_process.execute("UPDATE cv_records SET skills = '[\"Haskell\"]' WHERE id = 1")
+    other_process.execute("DELETE FROM cv_records WHERE id = 2")
+    other_process.commit()
+    other_process.close()
+
+    assert cache.sync(repository) == 1
+    assert sorted(cache.bodies) == [1, 3]
+    assert "Haskell" in cache.bodies[1]
+    assert [r["id"] for r in cache.select("haskell", k=1)] == [1]
+    repository.close()
+
+
+def test_cursor_reads_project_columns_and_paginate(tmp_path):
+    """
+    Test that the streaming read API loads only the requested columns and
+    walks the table with keyset cursors.
+    """
+    from modules.cv_parser import build_cv_record
+    from modules.cv_repository import CVRepository
+
+    repository = CVRepository(tmp_path / "cv.db")
+    repository.insert_many(
+        [build_cv_record(STRUCTURED_CV, f"{n}.pdf", "x" * 1000, str(n)) for n in range(5)]
+    )
+
+    page, cursor = repository.get_page(fields=["skills"], limit=2)
+    assert [record.id for record in page] == [1, 2]
+    assert page[0].keys() == ("id", "skills")
+    assert "raw_text" not in page[0]
+    assert page[0]["skills"] == page[0].get("skills") == '["Python", "Kubernetes"]'
+    assert cursor == 2
+
+    page, cursor = repository.get_page(fields=["skills"], after_id=4, limit=2)
+    assert [record.id for record in page] == [5] and cursor is None
+
+    records = repository.iter_records(fields=["file_path"], batch_size=2)
+    assert not isinstance(records, list)
+    assert [dict(record) for record in records][-1] == {"id": 5, "file_path": "4.pdf"}
+    with pytest.raises(ValueError):
+        repository.get_page(fields=["password"])
+    repository.close()
+
+
+def test_history_keeps_recent_turns_and_summarizes_older_ones():
+    """
+    Test that old turns are folded in batches into a rolling summary, system
+    messages are kept, and the token ceiling is enforced.
+    """
+    from modules.history import SUMMARY_PREFIX, compact_history
+    from modules.tokens import message_tokens
+
+    history = [
+        {"role": "system", "content": "your goal is to help the user about cvs query"},
+        {"role": "system", "content": "CV Context: --- CV 1 ---"},
+    ]
+    for n in range(10):
+        history.append({"role": "user", "content": f"question {n} " + "word " * 50})
+        history.append({"role": "assistant", "content": f"answer {n} " + "word " * 50})
+    history.append({"role": "user", "content": "latest question"})
+    folded = []
+
+    def summarizer(previous, messages):
+        folded.append(len(messages))
+        return (previous + " | " if previous else "") + f"{len(messages)} messages"
+
+    compacted = compact_history(
+        history, max_turns=3, token_ceiling=10_000, summarizer=summarizer
+    )
+    assert compacted[:2] == history[:2]
+    assert compacted[2] == {"role": "system", "content": SUMMARY_PREFIX + "16 messages"}
+    assert compacted[3]["content"].startswith("question 8")
+    assert compacted[-1]["content"] == "latest question"
+
+    follow_up = [
+        {"role": "assistant", "content": "ok"},
+        {"role": "user", "content": "next"},
+    ]
+    again = compact_history(compacted + follow_up, max_turns=3, summarizer=summarizer)
+    # Turns are folded in batches: nothing more until there are over 2 * 3 turns.
+    assert again == compacted + follow_up
+    assert folded == [16]
+    for n in range(3):
+        again.append({"role": "user", "content": f"more {n}"})
+        again.append({"role": "assistant", "content": f"reply {n}"})
+    again = compact_history(again, max_turns=3, summarizer=summarizer)
+    assert again[2]["content"] == SUMMARY_PREFIX + "16 messages | 7 messages"
+    assert [m["content"] for m in again[3:]] == [
+        "more 0", "reply 0", "more 1", "reply 1", "more 2", "reply 2"
+    ]
+
+    tight = compact_history(history, max_turns=3, token_ceiling=150)
+    assert sum(message_tokens(m) for m in tight) <= 150
+    assert tight[-1]["content"] == "latest question"
+    assert tight[2]["content"].startswith(SUMMARY_PREFIX)
+
+    # Turns folded to fit the ceiling go to the summarizer in the same single call.
+    folded.clear()
+    tight = compact_history(
+        history[:9], max_turns=3, token_ceiling=300, summarizer=summarizer
+    )
+    assert folded == [6]
+    assert sum(message_tokens(m) for m in tight) <= 300
+
+
+class _FakeStreamingClient:
+    """
+    Minimal stand-in for the Groq client's streaming chat completions.
+    """
+
+    def __init__(self, pieces):
+        from types import SimpleNamespace
+
+        def create(**kwargs):
+            assert kwargs["stream"] is True
+            return iter(
+                SimpleNamespace(
+                    choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))]
+                )
+                for piece in pieces
+            )
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+def test_send_message_stream_emits_tokens_and_saves_history(client, monkeypatch):
+    """
+    Test that /send_message_stream forwards tokens as SSE events and stores
+    the full reply in the session once the stream completes.
+    """
+    from modules import chatbot, llm_integration
+    from modules.llm_gateway import LLMGateway
+
+    gateway = LLMGateway(client=_FakeStreamingClient(["Jane ", None, "knows Go."]))
+    monkeypatch.setattr(llm_integration, "get_gateway", lambda: gateway)
+    monkeypatch.setattr(llm_integration, "get_response_cache", lambda: None)
+    monkeypatch.setattr(chatbot, "build_cv_context_for_query", lambda message: None)
+    saved = []
+    interface = client.application.session_interface
+    original_save = interface.save_session
+
+    def spy_save(app, session, response):
+        saved.append(list(session.get("conversation_history", [])))
+        return original_save(app, session, response)
+
+    monkeypatch.setattr(interface, "save_session", spy_save)
+
+    response = client.post("/send_message_stream", json={"message": "Who knows Go?"})
+    body = response.get_data(as_text=True)
+
+    assert response.mimetype == "text/event-stream"
+    assert body.count("event: token") == 2
+    assert body.endswith("event: done\ndata: {}\n\n")
+    assert saved[-1][-1] == {"role": "assistant", "content": "Jane knows Go."}
+    assert saved[-1][-2] == {"role": "user", "content": "Who knows Go?"}
+
+
+def test_llm_gateway_limits_rate_and_concurrency():
+    """
+    Test that the gateway's token buckets delay callers over quota and that
+    sync and async calls never exceed the in-flight limit.
+    """
+    import asyncio
+    import threading
+    import time
+    from types import SimpleNamespace
+    from modules.llm_gateway import LLMGateway, TokenBucket
+
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    bucket.adjust(30)
+    assert bucket.reserve(1) == 0.0
+
+    # A request larger than the whole token quota is still admitted.
+    small = LLMGateway(client=object(), tokens_per_minute=100)
+    huge = small._estimate([{"role": "user", "content": "word " * 1000}], {}, "complete")
+    assert huge == 100
+    assert small._reserve(huge) == 0.0
+    assert 0 < small._reserve(huge) <= 60
+
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def reply():
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(total_tokens=10),
+        )
+
+    def create(**kwargs):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        return reply()
+
+    async def acreate(**kwargs):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        return reply()
+
+    gateway = LLMGateway(
+        client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))),
+        async_client=SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=acreate))
+        ),
+        requests_per_minute=6000,
+        tokens_per_minute=10**7,
+        max_in_flight=2,
+    )
+    messages = [{"role": "user", "content": "hi"}]
+    threads = [
+        threading.Thread(target=gateway.complete, args=(messages,)) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+
+    async def run_async():
+        return await asyncio.gather(*(gateway.acomplete(messages) for _ in range(4)))
+
+    results = asyncio.run(run_async())
+    for thread in threads:
+        thread.join()
+
+    assert [r.choices[0].message.content for r in results] == ["ok"] * 4
+    assert state["peak"] <= 2
+
+
+def test_retry_llm_response_repairs_missing_sections(monkeypatch):
+    """
+    Test that transport errors are retried after a backoff and that a reply
+    missing sections is completed by asking only for the missing keys.
+    """
+    import httpx
+    import json
+    from groq import APIConnectionError
+    from modules import llm_integration
+
+    partial = {k: v for k, v in STRUCTURED_CV.items() if k != "Languages"}
+    prompts = []
+    replies = iter(
+        [
+            APIConnectionError(request=httpx.Request("POST", "https://llm.invalid")),
+            "```json\n" + json.dumps(partial) + "\n```",
+            json.dumps({"Languages": ["English"]}),
+        ]
+    )
+
+    def fake_llm(prompt, use_cache=True, store=True):
+        prompts.append(prompt)
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    sleeps = []
+    monkeypatch.setattr(llm_integration, "get_LLM_response", fake_llm)
+    monkeypatch.setattr(llm_integration.time, "sleep", sleeps.append)
+    before = llm_integration.get_retry_metrics()
+
+    cv_text = "Jane Roe, SRE. Speaks English."
+    result = llm_integration.retry_llm_response(
+        llm_integration.construct_cv_prompt(cv_text), source_text=cv_text
+    )
+    after = llm_integration.get_retry_metrics()
+
+    assert result == {**partial, "Languages": ["English"]}
+    assert len(sleeps) == 1
+    assert '"Languages"' in prompts[2] and '"Skills"' not in prompts[2]
+    assert "Example JSON Structure" not in prompts[2]
+    assert after["salvage"]["count"] == before["salvage"]["count"] + 1
+    assert after["repair"]["count"] == before["repair"]["count"] + 1
+    assert after["repair"]["tokens_saved"] > before["repair"]["tokens_saved"]
+    assert after["backoff"]["count"] == before["backoff"]["count"] + 1
+
+
+def test_llm_response_cache_tiers_and_bypass(tmp_path, monkeypatch):
+    """
+    Test that identical deterministic requests are served from the response
+    cache (memory, then disk after a restart) and that use_cache=False and
+    expired entries go back to the provider.
+    """
+    from types import SimpleNamespace
+    from modules import llm_integration
+    from modules.llm_cache import LLMResponseCache
+    from modules.llm_gateway import LLMGateway
+
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"n": %d}' % len(calls)))]
+        )
+
+    gateway = LLMGateway(
+        client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    )
+    cache = LLMResponseCache(tmp_path / "llm_cache.db", max_memory_entries=1)
+    monkeypatch.setattr(llm_integration, "get_gateway", lambda: gateway)
+    monkeypatch.setattr(llm_integration, "get_response_cache", lambda: cache)
+
+    assert llm_integration.get_LLM_response("parse cv") == '{"n": 1}'
+    assert llm_integration.get_LLM_response("parse cv") == '{"n": 1}'
+    assert llm_integration.get_LLM_response("parse cv", use_cache=False) == '{"n": 2}'
+    assert len(calls) == 2
+    assert cache.stats()["memory_hits"] == 1
+
+    # Evict "parse cv" from memory; a fresh instance still finds it on disk.
+    llm_integration.get_LLM_response("other cv")
+    restarted = LLMResponseCache(tmp_path / "llm_cache.db")
+    monkeypatch.setattr(llm_integration, "get_response_cache", lambda: restarted)
+    assert llm_integration.get_LLM_response("parse cv") == '{"n": 1}'
+    assert restarted.stats()["disk_hits"] == 1
+    assert len(calls) == 3
+
+    restarted.ttl = -1
+    assert llm_integration.get_LLM_response("parse cv") == '{"n": 4}'
+
+
+def test_rejected_llm_reply_is_not_replayed_from_cache(tmp_path, monkeypatch):
+    """
+    Test that retry_llm_response caches only a reply that validated, so a
+    rejected first reply is not served again on the next call.
+    """
+    import json
+    from types import SimpleNamespace
+    from modules import llm_integration
+    from modules.llm_cache import LLMResponseCache
+    from modules.llm_gateway import LLMGateway
+
+    replies = iter(["not json", json.dumps(STRUCTURED_CV)])
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=next(replies)))]
+        )
+
+    gateway = LLMGateway(
+        client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    )
+    cache = LLMResponseCache(tmp_path / "llm_cache.db")
+    monkeypatch.setattr(llm_integration, "get_gateway", lambda: gateway)
+    monkeypatch.setattr(llm_integration, "get_response_cache", lambda: cache)
+
+    prompt = llm_integration.construct_cv_prompt("Jane Roe, SRE.")
+    assert llm_integration.retry_llm_response(prompt) == STRUCTURED_CV
+    assert llm_integration.retry_llm_response(prompt) == STRUCTURED_CV
+    assert len(calls) == 2
+
+
+def test_fake_llm_server_backs_the_gateway(monkeypatch):
+    """
+    Test that the gateway can point at the local fake Groq server for CV
+    structuring (JSON mode) and streamed chat, and that injected failures
+    surface as provider errors.
+    """
+    from groq import InternalServerError
+    from modules import llm_integration
+    from modules.llm_gateway import LLMGateway
+    from tools.fake_llm_server import CANNED_CV, start_fake_llm_server
+
+    server = start_fake_llm_server()
+    try:
+        gateway = LLMGateway(base_url=server.base_url)
+        monkeypatch.setattr(llm_integration, "get_gateway", lambda: gateway)
+        monkeypatch.setattr(llm_integration, "get_response_cache", lambda: None)
+
+        structured = llm_integration.retry_llm_response(
+            llm_integration.construct_cv_prompt("Jane Roe, SRE")
+        )
+        streamed = [
+            chunk.choices[0].delta.content
+            for chunk in gateway.stream([{"role": "user", "content": "Who knows Go?"}])
+        ]
+        server.error_rate = 1.0
+        with pytest.raises(InternalServerError):
+            gateway.complete([{"role": "user", "content": "Who knows Go?"}])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert structured == CANNED_CV
+    assert "".join(piece for piece in streamed if piece) == "Fake answer to: Who knows Go?"
+    assert server.requests == 3
+
+
+def test_benchmark_baseline_flags_regressions(tmp_path):
+    """
+    Test that synthetic CVs are extractable and that benchmark results are
+    saved as a baseline and compared against it, flagging only slowdowns
+    beyond the threshold.
+    """
+    from benchmarks.harness import compare, load_results, measure, save_results
+    from modules.document_processor import extract_text_from_pdf, extract_text_from_word
+    from tools.synthetic_cvs import make_docx, make_text_pdf, synthetic_cv_lines
+
+    pages = synthetic_cv_lines(7, pages=2)
+    (tmp_path / "cv.pdf").write_bytes(make_text_pdf(pages))
+    (tmp_path / "cv.docx").write_bytes(make_docx(pages))
+    assert pages[0][0] in extract_text_from_pdf(str(tmp_path / "cv.pdf"))
+    assert pages[1][-1] in extract_text_from_word(str(tmp_path / "cv.docx"))
+
+    stats = measure(lambda: None, repeat=3)
+    assert stats["repeat"] == 3 and stats["min"] <= stats["median"] <= stats["max"]
+
+    baseline_path = tmp_path / "baseline.json"
+    save_results({"fast": {"median": 1.0}, "slow": {"median": 1.0}}, baseline_path)
+    baseline = load_results(baseline_path)
+    current = {
+        "fast": {"median": 1.1},
+        "slow": {"median": 1.5},
+        "new": {"median": 9.0},
+        "ocr": {"skipped": "tesseract not installed"},
+    }
+    regressions = compare(current, baseline, threshold=0.2)
+    assert [item["name"] for item in regressions] == ["slow"]
+    assert regressions[0]["change"] == pytest.approx(0.5)
+
+
+def test_metrics_endpoint_and_request_timing(client):
+    """
+    Test the Prometheus exposition of stage spans, cache lookups and queue
+    depth, and the Server-Timing header returned for X-Profile: timing.
+    """
+    from modules import metrics
+
+    registry = metrics.Registry()
+    latency = registry.register(metrics.Histogram("demo_seconds", "Demo.", ["stage"], buckets=(0.1, 1)))
+    latency.observe(0.05, stage="ocr_page")
+    latency.observe(0.5, stage="ocr_page")
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="ocr_page",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="ocr_page",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{stage="ocr_page"} 2' in text
+
+    before = metrics.STAGE_SECONDS.snapshot(stage="test_stage")["count"]
+    with metrics.span("test_stage"):
+        pass
+    assert metrics.STAGE_SECONDS.snapshot(stage="test_stage")["count"] == before + 1
+
+    # A stream closed by its consumer is timed but is not an error.
+    def stream():
+        with metrics.span("test_stream"):
+            yield 1
+            yield 2
+
+    errors = metrics.STAGE_ERRORS.value(stage="test_stream")
+    tokens = stream()
+    next(tokens)
+    tokens.close()
+    assert metrics.STAGE_SECONDS.snapshot(stage="test_stream")["count"] >= 1
+    assert metrics.STAGE_ERRORS.value(stage="test_stream") == errors
+    metrics.record_cache_lookup("test_cache", True)
+    metrics.record_cache_lookup("test_cache", False)
+
+    response = client.get("/metrics")
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'cv_stage_duration_seconds_count{stage="test_stage"}' in body
+    assert 'cache_lookups_total{cache="test_cache",result="hit"}' in body
+    assert "cache_hit_ratio{cache=\"test_cache\"}" in body
+    assert "ingestion_queue_depth" in body
+
+    response = client.post("/send_message", json={"message": ""}, headers={"X-Profile": "timing"})
+    assert "total;dur=" in response.headers["Server-Timing"]
+    assert "Server-Timing" not in client.post("/send_message", json={"message": ""}).headers
+
+
+def test_create_app_is_lazy_and_keeps_sessions(tmp_path, monkeypatch):
+    """
+    Test that importing the web modules loads none of the heavy OCR/PDF/LLM
+    libraries, and that sessions in the session store survive create_app().
+    """
+    import subprocess
+    import app as app_module
+    from modules import cv_parser
+    from modules.session_store import SQLiteSessionStore
+    from tools.cold_start import HEAVY_MODULES, PROJECT_ROOT
+
+    probe = (
+        "import sys, app, modules.chatbot; "
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    loaded = subprocess.run(
+        [sys.executable, "-c", probe], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert loaded == "[]"
+
+    session_db = tmp_path / "sessions.db"
+    SQLiteSessionStore(session_db).set("other_worker_session", b"{}", 4102444800)
+    monkeypatch.setattr(cv_parser, "DB_PATH", tmp_path / "cv.db")
+    monkeypatch.setattr(app_module, "_process_setup_done", False)
+
+    flask_app = app_module.create_app({"SESSION_DB_PATH": str(session_db)})
+
+    assert flask_app.session_interface.store.get("other_worker_session") == b"{}"
+    assert (tmp_path / "cv.db").exists()
+    assert flask_app.config["COLD_START_SECONDS"] > 0
+    assert flask_app.test_client().get("/chatbot").status_code == 200
+
+
+def test_compact_session_stores_only_turns(monkeypatch):
+    """
+    Test that chat sessions are stored server-side as small records holding
+    the turns and the CV context version but not the CV context itself, that
+    unchanged sessions are not rewritten, and that the memory store evicts
+    and expires entries.
+    """
+    import time
+    from modules import chatbot, llm_integration
+    from modules.session_store import (
+        CompactSessionInterface,
+        MemorySessionStore,
+        serialize_session,
+    )
+
+    cv_context = "--- CV 1 ---\nName: Jane Doe\nSkills: Go, Python\n" * 50
+    sent = []
+
+    def fake_complete(messages, use_cache=True, **params):
+        sent.append(list(messages))
+        return "Jane knows Go."
+
+    monkeypatch.setattr(llm_integration, "_complete", fake_complete)
+    monkeypatch.setattr(chatbot, "build_cv_context_for_query", lambda message: cv_context)
+    monkeypatch.setattr(chatbot, "get_context_version", lambda: 7)
+
+    store = MemorySessionStore(max_entries=2)
+    flask_app = Flask(__name__)
+    flask_app.secret_key = "test_secret_key"
+    flask_app.session_interface = CompactSessionInterface(store, ttl=60)
+    flask_app.register_blueprint(chat_bp)
+    test_client = flask_app.test_client()
+
+    for question in ["Who knows Go?", "And Python?"]:
+        response = test_client.post("/send_message", json={"message": question})
+        assert response.get_json() == {"answer": "Jane knows Go."}
+
+    # The CV context reaches the LLM but not the session record.
+    assert any(m["content"].endswith(cv_context) for m in sent[-1] if m["role"] == "system")
+    assert [m["content"] for m in sent[-1] if m["role"] != "system"] == [
+        "Who knows Go?", "Jane knows Go.", "And Python?"
+    ]
+    (sid, (payload, _)), = store._entries.items()
+    assert len(payload) < 300
+    assert b"Jane Doe" not in payload and b"cv_context_version" in payload
+
+    test_client.get("/chatbot")
+    assert store._entries[sid][0] is payload
+
+    # Oversized sessions drop their oldest turns.
+    history = [{"role": "user", "content": "x" * 100}] * 20
+    assert len(serialize_session({"conversation_history": history}, max_bytes=500)) <= 500
+
+    store.set("a", b"1", time.time() + 60)
+    store.set("b", b"2", time.time() - 1)
+    assert store.get(sid) is None
+    assert store.get("a") == b"1"
+    assert store.get("b") is None
+
+
+def test_streamed_reply_of_new_session_sets_cookie(monkeypatch):
+    """
+    Test that a first streamed message with no CVs uploaded issues the
+    session cookie with the headers and stores the reply under that session.
+    """
+    import json
+    from types import SimpleNamespace
+    from modules import chatbot, llm_integration
+    from modules.session_store import CompactSessionInterface, MemorySessionStore
+
+    def stream(messages):
+        for token in ("No CVs ", "yet."):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    monkeypatch.setattr(llm_integration, "get_gateway", lambda: SimpleNamespace(stream=stream))
+    monkeypatch.setattr(llm_integration, "get_response_cache", lambda: None)
+    monkeypatch.setattr(chatbot, "build_cv_context_for_query", lambda message: "")
+
+    store = MemorySessionStore()
+    flask_app = Flask(__name__)
+    flask_app.secret_key = "test_secret_key"
+    flask_app.session_interface = CompactSessionInterface(store, ttl=60)
+    flask_app.register_blueprint(chat_bp)
+    test_client = flask_app.test_client()
+
+    response = test_client.post("/send_message_stream", json={"message": "Hi"})
+    assert b"event: done" in response.get_data()
+    assert "session=" in response.headers.get("Set-Cookie", "")
+
+    (sid, (payload, _)), = store._entries.items()
+    assert [m["content"] for m in json.loads(payload)["conversation_history"]] == [
+        "Hi", "No CVs yet."
+    ]
+
+
+def test_long_cv_is_extracted_in_parallel_chunks(monkeypatch):
+    """
+    Test that a long CV is split at section headings, its chunks are
+    extracted concurrently, and the partial results are merged in chunk
+    order with duplicate entries folded and skills unioned.
+    """
+    import threading
+    import time
+    from modules import cv_chunking, metrics
+
+    jobs = "\n".join(f"Engineer {i} at Company {i}, 2010-2020, built systems." for i in range(60))
+    text = (
+        "Jane Roe\njane@example.com\n\nExperience\n" + jobs
+        + "\n\nEducation\nPhD Physics, MIT, 2005-2010\n\nSkills\nPython, Go"
+    )
+    chunks = cv_chunking.chunk_cv_text(text, max_tokens=300)
+    assert len(chunks) > 2
+    assert chunks[0].startswith("Jane Roe")
+    assert chunks[-1].endswith("Skills\nPython, Go")
+    assert all(c.startswith("Experience") for c in chunks[1:-1] if "Engineer" in c)
+
+    in_flight, peak, lock = [0], [0], threading.Lock()
+    job = {"title": "SRE", "company": "Acme", "start_date": "2020-01-01", "end_date": "not mentioned"}
+
+    def fake_retry(prompt, retries=3, source_text=None):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        first = source_text == chunks[0]
+        return {
+            "Name": "Jane Roe" if first else "not mentioned",
+            "Contact Information": {"email": "jane@example.com"} if first else "not mentioned",
+            "Professional Summary": "not mentioned",
+            "Experience": [dict(job, end_date="2023-01-01" if first else "not mentioned")],
+            "Education": "not mentioned",
+            "Skills": ["Python", "go"] if first else ["Go", "Rust"],
+            "Certifications": [],
+            "Languages": "not mentioned",
+        }
+
+    monkeypatch.setattr(cv_chunking, "retry_llm_response", fake_retry)
+    prompt_builds = metrics.STAGE_SECONDS.snapshot(stage="prompt_build")["count"]
+    result = cv_chunking.extract_cv_structure(text, threshold=100, max_tokens=300, workers=4)
+
+    assert peak[0] > 1
+    assert metrics.STAGE_SECONDS.snapshot(stage="prompt_build")["count"] == prompt_builds + len(
+        chunks
+    )
+    assert result["Name"] == "Jane Roe"
+    assert result["Contact Information"] == {"email": "jane@example.com"}
+    assert result["Experience"] == [dict(job, end_date="2023-01-01")]
+    assert result["Skills"] == ["Python", "go", "Rust"]
+    assert result["Certifications"] == "not mentioned"
+
+
+def test_preprocessing_compacts_text_and_extracts_contacts():
+    """
+    Test that preprocessing removes repeated page headers/footers and page
+    numbers, hyphenation breaks, noise and duplicate lines, keeps bare numbers
+    in the body, reports the tokens saved, and that contact details are found
+    with regexes.
+    """
+    from modules.llm_integration import construct_cv_prompt
+    from modules.text_preprocessing import extract_contact_fields, preprocess_cv_pages
+
+    pages = [
+        "Jane Roe - Curriculum Vitae\nJane Roe\njane.roe@example.com | +1 (555) 123-4567\n"
+        "Experience\nSenior devel-\nopment engineer at Acme, June 2019 - 2021\n•  •\n"
+        "Years of experience:\n12\nReferences\nPage 1 of 2",
+        "Jane Roe - Curriculum Vitae\nSkills\nPython,   Go\nPython,   Go\n"
+        "github.com/janeroe\nPage 2 of 2",
+    ]
+    result = preprocess_cv_pages(pages)
+
+    assert result["text"] == (
+        "Jane Roe - Curriculum Vitae\nJane Roe\njane.roe@example.com | +1 (555) 123-4567\n"
+        "Experience\n"
+        "Senior development engineer at Acme, June 2019 - 2021\nYears of experience:\n12\n"
+        "References\nSkills\nPython, Go\ngithub.com/janeroe"
+    )
+    assert result["tokens_saved"] == result["tokens_before"] - result["tokens_after"] > 0
+    contact = extract_contact_fields(result["text"])
+    assert contact == {
+        "email": "jane.roe@example.com",
+        "phone": "+1 (555) 123-4567",
+        "links": ["github.com/janeroe"],
+    }
+    prompt = construct_cv_prompt(result["text"], contact)
+    assert '"Contact Information" (Object with keys: "address")' in prompt
+
+
+def test_preprocessing_keeps_first_copy_of_contact_header():
+    """
+    Test that a page header carrying the name and contact details is kept
+    once rather than stripped from every page.
+    """
+    from modules.text_preprocessing import extract_contact_fields, preprocess_cv_pages
+
+    header = "John Doe | john.doe@example.com | Phone: 555-987-6543"
+    pages = [
+        f"{header}\nExperience\nEngineer at Acme",
+        f"{header}\nEducation\nBSc Physics",
+        f"{header}\nSkills\nPython",
+    ]
+    result = preprocess_cv_pages(pages)
+
+    assert result["text"].count("John Doe") == 1
+    assert result["text"].startswith(header)
+    contact = extract_contact_fields(result["text"])
+    assert contact["email"] == "john.doe@example.com"
+    assert contact["phone"] == "555-987-6543"
+
+
+def test_ocr_cleanup_falls_back_without_numpy(monkeypatch):
+    """
+    Test that a missing NumPy falls back to the plain grayscale preprocessing
+    without changing the OCR_CLEANUP setting.
+    """
+    import sys
+    from PIL import Image
+    from modules import document_processor
+
+    monkeypatch.setitem(sys.modules, "modules.image_preprocessing", None)
+    monkeypatch.setattr(document_processor, "_numpy_available", True)
+    monkeypatch.setattr(document_processor, "OCR_CLEANUP", True)
+
+    page = document_processor.preprocess_image(Image.new("RGB", (20, 20), "white"))
+
+    assert page.mode == "L" and page.size == (20, 20)
+    assert document_processor.OCR_CLEANUP is True
+    assert document_processor._numpy_available is False
+
+
+def test_contact_extraction_ignores_dates_and_isbns():
+    """
+    Test that date ranges, year lists and ISBNs are not taken for phone
+    numbers, while labelled, international and grouped numbers are.
+    """
+    from modules.text_preprocessing import extract_contact_fields
+
+    for text in (
+        "Engineer, Acme 06.2019 - 08.2021",
+        "Awards: 2015 - 2019 - 2021",
+        "Grants 2019-2021 2022",
+        "ISBN 978-3-16-148410-0",
+    ):
+        assert "phone" not in extract_contact_fields(text), text
+    assert extract_contact_fields("Tel. 020 7946 0958")["phone"] == "020 7946 0958"
+    assert extract_contact_fields("+44 20 7946 0958")["phone"] == "+44 20 7946 0958"
+    assert extract_contact_fields("Call (555) 123-4567")["phone"] == "(555) 123-4567"
+    assert extract_contact_fields("2019 - 2021\nMobile: 0612345678")["phone"] == "0612345678"
+
+
+def test_ocr_page_cleanup_deskews_crops_and_skips_blank_pages(monkeypatch):
+    """
+    Test that page cleanup straightens a skewed scan, crops its margins,
+    rescales it for its text size, and that blank (including noisy blank)
+    pages skip OCR.
+    """
+    pytest.importorskip("numpy")
+    import numpy as np
+    from PIL import Image
+    from modules import document_processor, image_preprocessing
+    from tools.synthetic_cvs import scanned_page_image, synthetic_cv_lines
+
+    lines = synthetic_cv_lines(3, pages=1)[0]
+    page = scanned_page_image(lines, skew=2.5)
+    cleaned, info = image_preprocessing.clean_page(page, dpi=300)
+
+    assert abs(info["skew"] - 2.5) <= 0.2
+    assert abs(image_preprocessing.estimate_skew(np.asarray(cleaned) < 128)) <= 0.2
+    assert cleaned.width < page.width and cleaned.height < page.height
+    assert image_preprocessing.OCR_MIN_DPI <= info["dpi"] < 300
+
+    blank = Image.new("L", page.size, 255)
+    assert image_preprocessing.clean_page(blank)[0] is None
+    # Scanner noise on an empty page is not text, with either binarization.
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, 6, (page.height, page.width))
+    noisy_blank = Image.fromarray(np.clip(235 + noise, 0, 255).astype(np.uint8))
+    for method in ("otsu", "adaptive"):
+        assert image_preprocessing.clean_page(noisy_blank, method=method)[0] is None
+    noisy_page = np.asarray(page.convert("L")) * 0.9 + 20 + noise
+    noisy_page = Image.fromarray(np.clip(noisy_page, 0, 255).astype(np.uint8))
+    assert image_preprocessing.clean_page(noisy_page)[0] is not None
+
+    ocr_sizes = []
+
+    def fake_ocr(image):
+        ocr_sizes.append(image.size)
+        return "text"
+
+    monkeypatch.setattr(document_processor, "get_pdf_page_count", lambda path: 2)
+    monkeypatch.setattr(
+        document_processor,
+        "convert_from_path",
+        lambda path, dpi, first_page, last_page, poppler_path: [[page, blank][first_page - 1]],
+    )
+    monkeypatch.setattr(document_processor, "perform_ocr_on_image", fake_ocr)
+    results = list(document_processor.ocr_pdf_pages("scan.pdf", max_workers=1))
+
+    assert [r["text"] for r in results] == ["text", ""]
+    assert results[1]["error"] is None
+    assert ocr_sizes == [cleaned.size]
@@ -0,0 +1,73 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Libraries that should only be imported when a CV is processed or the LLM is called.
+HEAVY_MODULES = ["pdf2image", "pytesseract", "PyPDF2", "docx", "PIL", "numpy", "groq", "httpx"]
+
+# Runs in a fresh interpreter: time create_app() and the first request.
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+created = time.perf_counter()
+app.test_client().get("/chatbot")
+first_request = time.perf_counter()
+print(json.dumps({
+    "create_app": created - started,
+    "first_request": first_request - created,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def measure_cold_start(runs=5):
+    """
+    Start runs fresh interpreters and time importing and creating the app,
+    then serving the first /chatbot request. Returns a report dict.
+    """
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE % (HEAVY_MODULES,)],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "create_app_median": statistics.median(s["create_app"] for s in samples),
+        "create_app_max": max(s["create_app"] for s in samples),
+        "first_request_median": statistics.median(s["first_request"] for s in samples),
+        "heavy_modules_loaded": sorted({m for s in samples for m in s["loaded"]}),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the web app's cold-start time.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+    report = measure_cold_start(args.runs)
+    print(
+        f"create_app: median {report['create_app_median'] * 1000:.0f} ms, "
+        f"max {report['create_app_max'] * 1000:.0f} ms over {report['runs']} runs; "
+        f"first request {report['first_request_median'] * 1000:.0f} ms"
+    )
+    print(f"Heavy modules loaded at startup: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules.tokens import estimate_tokens, message_tokens
+
+CHAT_COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+# Returned for every JSON-mode request, i.e. CV structuring and repairs.
+CANNED_CV = {
+    "Name": "Jane Roe",
+    "Contact Information": {
+        "email": "jane.roe@example.com",
+        "phone": "+1 555 0100",
+        "address": "1 Main St, Anytown",
+    },
+    "Professional Summary": "Platform engineer with 8 years of experience.",
+    "Experience": [
+        {
+            "title": "Site Reliability Engineer",
+            "company": "Acme",
+            "start_date": "2018-01-01",
+            "end_date": "2024-01-01",
+            "description": "Ran Kubernetes clusters and on-call rotations.",
+        }
+    ],
+    "Education": [
+        {
+            "degree": "B.Sc. in Computer Science",
+            "institution": "State University",
+            "start_date": "2012-09-01",
+            "end_date": "2016-06-01",
+            "description": "not mentioned",
+        }
+    ],
+    "Skills": ["Python", "Go", "Kubernetes", "SQL"],
+    "Certifications": [],
+    "Languages": ["English"],
+}
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    Groq-compatible chat completions server for load tests and CI.
+
+    Each request waits latency seconds (+/- jitter), fails with error_status
+    at error_rate, and otherwise answers JSON-mode requests with CANNED_CV
+    and chat requests with a short text reply, streamed as server-sent
+    events when the request asks for stream=True.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        error_status=500,
+        token_latency=0.0,
+        seed=None,
+    ):
+        super().__init__(address, FakeLLMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_latency = token_latency
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_request(self):
+        """Count a request and return (delay in seconds, whether it should fail)."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            return delay, self._random.random() < self.error_rate
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != CHAT_COMPLETIONS_PATH:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        delay, fail = self.server.next_request()
+        time.sleep(delay)
+        if fail:
+            status = self.server.error_status
+            headers = {"retry-after": "1"} if status == 429 else None
+            self._send_json(
+                status,
+                {"error": {"message": "Injected failure", "type": "server_error"}},
+                headers,
+            )
+            return
+
+        content = self._reply(request)
+        model = request.get("model", "fake")
+        if request.get("stream"):
+            self._stream(model, content)
+            return
+        prompt_tokens = sum(message_tokens(m) for m in request.get("messages", []))
+        completion_tokens = estimate_tokens(content)
+        self._send_json(
+            200,
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+        )
+
+    @staticmethod
+    def _reply(request):
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps(CANNED_CV)
+        question = next(
+            (
+                m.get("content", "")
+                for m in reversed(request.get("messages", []))
+                if m.get("role") == "user"
+            ),
+            "",
+        )
+        return f"Fake answer to: {' '.join(question.split())[:80]}"
+
+    def _stream(self, model, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = content.split(" ")
+        pieces = [word + " " for word in words[:-1]] + words[-1:]
+        for piece, finish in [(p, None) for p in pieces] + [("", "stop")]:
+            chunk = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": piece} if piece else {},
+                        "finish_reason": finish,
+                    }
+                ],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if self.server.token_latency:
+                time.sleep(self.server.token_latency)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_fake_llm_server(host="127.0.0.1", port=0, **options):
+    """Start a FakeLLMServer on a background thread and return it."""
+    server = FakeLLMServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve fake Groq chat completions for load tests and CI."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds of latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of failed requests")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failures")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per streamed chunk")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(
+        (args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        token_latency=args.token_latency,
+        seed=args.seed,
+    )
+    print(f"Fake LLM server listening on {server.base_url} (set LLM_BASE_URL to this URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import itertools
+import json
+import threading
+import time
+
+import httpx
+
+from modules.batch_ingest import percentile
+from tools.synthetic_cvs import make_text_pdf, synthetic_cv_lines
+
+CHAT_QUESTIONS = [
+    "Who knows Python?",
+    "Which candidates have a master's degree?",
+    "Who has worked at Acme?",
+    "List candidates with Kubernetes and Go experience.",
+    "Who is the best fit for a senior data analyst role?",
+]
+
+
+class LoadTest:
+    """
+    Drive concurrent chat and upload traffic against a running app.
+
+    Chat users post /send_message in a loop, each with its own session.
+    Upload users post a distinct synthetic PDF to /upload_cv and poll the
+    returned job until it finishes. Latencies are recorded per operation:
+    "chat", "upload" (time to 202) and "ingest" (upload to job done).
+    """
+
+    def __init__(self, base_url, chat_users=4, upload_users=1, duration=30.0, timeout=120.0):
+        self.base_url = base_url.rstrip("/")
+        self.chat_users = chat_users
+        self.upload_users = upload_users
+        self.duration = duration
+        self.timeout = timeout
+        self.latencies = {"chat": [], "upload": [], "ingest": []}
+        self.errors = {"chat": 0, "upload": 0, "ingest": 0}
+        self._seeds = itertools.count(int(time.time()))
+        self._lock = threading.Lock()
+
+    def _record(self, operation, seconds=None, ok=True):
+        with self._lock:
+            if ok:
+                self.latencies[operation].append(seconds)
+            else:
+                self.errors[operation] += 1
+
+    def _chat_user(self, user, deadline):
+        with httpx.Client(base_url=self.base_url, timeout=self.timeout) as client:
+            for turn in itertools.count():
+                if time.monotonic() >= deadline:
+                    return
+                question = CHAT_QUESTIONS[(user + turn) % len(CHAT_QUESTIONS)]
+                start = time.perf_counter()
+                try:
+                    response = client.post("/send_message", json={"message": question})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                self._record("chat", time.perf_counter() - start, ok)
+
+    def _upload_user(self, deadline):
+        with httpx.Client(base_url=self.base_url, timeout=self.timeout) as client:
+            while time.monotonic() < deadline:
+                seed = next(self._seeds)
+                pdf = make_text_pdf(synthetic_cv_lines(seed))
+                start = time.perf_counter()
+                try:
+                    response = client.post(
+                        "/upload_cv",
+                        files={"file": (f"cv_{seed}.pdf", pdf, "application/pdf")},
+                    )
+                except httpx.HTTPError:
+                    self._record("upload", ok=False)
+                    continue
+                if response.status_code != 202:
+                    self._record("upload", ok=False)
+                    # Back off while the ingestion queue is full.
+                    time.sleep(0.5)
+                    continue
+                self._record("upload", time.perf_counter() - start)
+                self._wait_for_job(client, response.json()["status_url"], start)
+
+    def _wait_for_job(self, client, status_url, start):
+        while time.perf_counter() - start < self.timeout:
+            try:
+                job = client.get(status_url).json()
+            except (httpx.HTTPError, ValueError):
+                break
+            if job.get("status") == "done":
+                self._record("ingest", time.perf_counter() - start)
+                return
+            if job.get("status") == "failed":
+                break
+            time.sleep(0.2)
+        self._record("ingest", ok=False)
+
+    def run(self):
+        """Run the load for duration seconds and return the report dict."""
+        deadline = time.monotonic() + self.duration
+        threads = [
+            threading.Thread(target=self._chat_user, args=(user, deadline))
+            for user in range(self.chat_users)
+        ] + [
+            threading.Thread(target=self._upload_user, args=(deadline,))
+            for _ in range(self.upload_users)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - started)
+
+    def report(self, elapsed):
+        """Throughput and p50/p95/p99 latency per operation."""
+        return {
+            "seconds": elapsed,
+            "chat_users": self.chat_users,
+            "upload_users": self.upload_users,
+            "operations": {
+                operation: {
+                    "count": len(values),
+                    "errors": self.errors[operation],
+                    "per_sec": len(values) / elapsed if elapsed else 0.0,
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "p99": percentile(values, 99),
+                }
+                for operation, values in self.latencies.items()
+            },
+        }
+
+
+def format_report(report):
+    """Render a load test report as a short plain-text table."""
+    lines = [
+        f"{report['chat_users']} chat users, {report['upload_users']} upload users, "
+        f"{report['seconds']:.1f}s"
+    ]
+    for operation, stats in report["operations"].items():
+        if not stats["count"] and not stats["errors"]:
+            continue
+        latency = (
+            f"p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s p99={stats['p99']:.3f}s"
+            if stats["count"]
+            else "no successful requests"
+        )
+        lines.append(
+            f"  {operation:<7} n={stats['count']:<6} errors={stats['errors']:<4} "
+            f"{stats['per_sec']:.2f}/s {latency}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Drive concurrent chat and upload traffic against the CV app."
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--chat-users", type=int, default=4)
+    parser.add_argument("--upload-users", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = LoadTest(args.url, args.chat_users, args.upload_users, args.duration).run()
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
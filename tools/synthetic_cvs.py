@@ -0,0 +1,226 @@
+import sys
+import os
+
+# Add the project root directory to the sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import io
+import random
+import argparse
+from pathlib import Path
+
+FIRST_NAMES = ["Jane", "Omar", "Lina", "Carlos", "Mei", "Sami", "Anna", "Yusuf", "Priya", "Tom"]
+LAST_NAMES = ["Roe", "Haddad", "Novak", "Silva", "Chen", "Khalil", "Berg", "Demir", "Rao", "Hart"]
+TITLES = ["Software Engineer", "Data Analyst", "DevOps Engineer", "Product Manager", "QA Engineer"]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries"]
+SKILLS = ["Python", "SQL", "Go", "Kubernetes", "Flask", "React", "AWS", "Docker", "Spark", "Excel"]
+DEGREES = ["B.Sc. Computer Science", "M.Sc. Data Science", "B.A. Economics", "B.Eng. Software"]
+
+
+def synthetic_cv_lines(seed, pages=1, lines_per_page=40):
+    """
+    Deterministic plain-text CV for the given seed, as a list of pages,
+    each a list of lines.
+    """
+    rng = random.Random(seed)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [
+        name,
+        f"{name.lower().replace(' ', '.')}{seed}@example.com | +1 555 {seed % 10000:04d}",
+        "Professional Summary",
+        f"{rng.choice(TITLES)} with {rng.randint(1, 20)} years of experience.",
+        "Skills",
+        ", ".join(rng.sample(SKILLS, 4)),
+        "Education",
+        f"{rng.choice(DEGREES)}, State University, {rng.randint(2000, 2020)}",
+        "Experience",
+    ]
+    while len(lines) < pages * lines_per_page:
+        start = rng.randint(2005, 2022)
+        lines.append(
+            f"{rng.choice(TITLES)} at {rng.choice(COMPANIES)}, {start}-{start + rng.randint(1, 4)}"
+        )
+        lines.append(
+            f"Built and operated {rng.choice(SKILLS)} services used by {rng.randint(2, 90)} teams."
+        )
+    return [lines[i : i + lines_per_page] for i in range(0, pages * lines_per_page, lines_per_page)]
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_text_pdf(pages):
+    """
+    Build a minimal PDF with a text layer (Helvetica, one line per Tj) from a
+    list of pages, each a list of lines. Returns the PDF bytes.
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # the page tree, filled in once the page ids are known
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+        for line in lines:
+            ops.append(f"({_pdf_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream.decode('latin-1')}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    ).encode("latin-1")
+    return bytes(out)
+
+
+def scanned_page_image(lines, dpi=300, skew=0.0):
+    """
+    Draw one page's lines on a white A4 bitmap at dpi, like a scanned CV,
+    rotated counter-clockwise by skew degrees as if fed into the scanner askew.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    scale = dpi / 150
+    try:
+        font = ImageFont.load_default(size=round(22 * scale))
+    except TypeError:
+        font = ImageFont.load_default()
+    image = Image.new("L", (round(8.27 * dpi), round(11.69 * dpi)), 255)
+    draw = ImageDraw.Draw(image)
+    for row, line in enumerate(lines):
+        draw.text((100 * scale, (100 + row * 36) * scale), line, fill=0, font=font)
+    if skew:
+        image = image.rotate(skew, resample=Image.BILINEAR, fillcolor=255)
+    return image
+
+
+def make_scanned_pdf(pages, dpi=150, skew=0.0):
+    """
+    Build an image-only PDF (no text layer) from scanned_page_image bitmaps of
+    each page's lines. Returns the PDF bytes.
+    """
+    images = [scanned_page_image(lines, dpi, skew) for lines in pages]
+    buffer = io.BytesIO()
+    images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    return buffer.getvalue()
+
+
+def make_docx(pages):
+    """Build a Word document with one paragraph per line and a page break between pages."""
+    import docx
+    from docx.enum.text import WD_BREAK
+
+    document = docx.Document()
+    for number, lines in enumerate(pages):
+        for line in lines:
+            document.add_paragraph(line)
+        if number < len(pages) - 1:
+            document.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def synthetic_structured_cv(seed):
+    """Deterministic LLM-style structured CV (the retry_llm_response output format)."""
+    rng = random.Random(seed)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    experience = []
+    for _ in range(rng.randint(1, 4)):
+        start = rng.randint(2005, 2022)
+        experience.append(
+            {
+                "title": rng.choice(TITLES),
+                "company": rng.choice(COMPANIES),
+                "start_date": f"{start}-01-01",
+                "end_date": f"{start + rng.randint(1, 4)}-01-01",
+                "description": (
+                    f"Built {rng.choice(SKILLS)} services used by {rng.randint(2, 90)} teams."
+                ),
+            }
+        )
+    return {
+        "Name": name,
+        "Contact Information": {
+            "email": f"{name.lower().replace(' ', '.')}{seed}@example.com",
+            "phone": f"+1 555 {seed % 10000:04d}",
+            "address": "not mentioned",
+        },
+        "Professional Summary": (
+            f"{rng.choice(TITLES)} with {rng.randint(1, 20)} years of experience."
+        ),
+        "Experience": experience,
+        "Education": [
+            {
+                "degree": rng.choice(DEGREES),
+                "institution": "State University",
+                "start_date": "2010-09-01",
+                "end_date": "2014-06-01",
+                "description": "not mentioned",
+            }
+        ],
+        "Skills": rng.sample(SKILLS, 4),
+        "Certifications": [],
+        "Languages": ["English"],
+    }
+
+
+WRITERS = {
+    "text_pdf": (".pdf", make_text_pdf),
+    "scanned_pdf": (".pdf", make_scanned_pdf),
+    "docx": (".docx", make_docx),
+}
+
+
+def write_corpus(out_dir, count=10, kinds=("text_pdf", "docx"), pages=1, seed=0):
+    """
+    Write count synthetic CVs of each kind to out_dir and return their paths.
+    Files are named <kind>_<pages>p_<n><ext>.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for kind in kinds:
+        ext, writer = WRITERS[kind]
+        for n in range(count):
+            path = out_dir / f"{kind}_{pages}p_{n}{ext}"
+            path.write_bytes(writer(synthetic_cv_lines(seed + n, pages=pages)))
+            paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a directory of synthetic CVs.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--count", type=int, default=10, help="CVs per kind")
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument(
+        "--kinds", nargs="+", default=["text_pdf", "docx"], choices=sorted(WRITERS)
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    paths = write_corpus(args.out_dir, args.count, args.kinds, args.pages, args.seed)
+    print(f"Wrote {len(paths)} CVs to {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())